@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
@@ -47,11 +48,10 @@ class UserAdmin(BaseUserAdmin):
     
     def unlock_accounts(self, request, queryset):
         """Admin action to unlock user accounts"""
-        count = 0
-        for user in queryset:
-            if user.is_account_locked():
-                user.unlock_account()
-                count += 1
+        count = queryset.filter(locked_until__gt=timezone.now()).update(
+            locked_until=None,
+            failed_login_attempts=0
+        )
         self.message_user(request, f'{count} accounts were unlocked.')
     unlock_accounts.short_description = "Unlock selected accounts"
     
@@ -6,4 +6,7 @@ class AccountsConfig(AppConfig):
     name = 'accounts'
     
     def ready(self):
-        import accounts.signals
\ No newline at end of file
+        import accounts.signals
+        from django_blog.caching import require_shared_cache
+        # Cached users and blacklisted JTIs are invalidated through the cache
+        require_shared_cache('JWT user and blacklist caching')
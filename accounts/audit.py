@@ -0,0 +1,198 @@
+"""
+Buffered audit logging
+
+Audit rows (``SecurityAuditLog``, ``dashboard.ActivityLog``) are not
+written inside the request. ``record_audit_event`` queues them, after the
+current transaction commits, in an in-process buffer that is written with
+one ``bulk_create`` per model when it reaches ``MAX_BATCH_SIZE`` entries or
+``FLUSH_INTERVAL`` seconds after the first queued event, whichever comes
+first. The buffer is also flushed at process exit. With ``FLUSH_INTERVAL``
+0 rows are written synchronously when the transaction commits, on the
+caller's connection (the test runner uses this; see
+``django_blog.test_runner``).
+
+If the database rejects a batch, its rows are appended to a JSON Lines
+spool file so they are not lost; ``manage.py flush_audit_log`` replays it.
+
+Receivers of ``audit_logs_flushed`` get the saved instances of each batch
+(e.g. to notify live dashboards once the rows exist).
+"""
+import atexit
+import json
+import logging
+import threading
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.dispatch import Signal
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Sent with sender=<model class> and instances=<list of saved rows>
+audit_logs_flushed = Signal()
+
+
+def get_audit_settings():
+    audit_settings = getattr(settings, 'AUDIT_LOG_SETTINGS', {})
+    return (
+        audit_settings.get('FLUSH_INTERVAL', 2.0),
+        audit_settings.get('MAX_BATCH_SIZE', 100),
+        Path(audit_settings.get('SPOOL_PATH', Path(settings.BASE_DIR) / 'logs' / 'audit_spool.jsonl')),
+    )
+
+
+class AuditLogBuffer:
+    """
+    Process-wide buffer of pending audit rows
+    """
+
+    _lock = threading.Lock()
+    _pending = []
+    _timer = None
+
+    @classmethod
+    def enqueue(cls, model, fields):
+        interval, max_batch_size, _ = get_audit_settings()
+        if not interval:
+            write_audit_rows(model, [fields])
+            return
+        with cls._lock:
+            cls._pending.append((model, fields))
+            if len(cls._pending) >= max_batch_size:
+                # Write in the background right away, not in this request
+                interval = 0
+                if cls._timer is not None:
+                    cls._timer.cancel()
+                    cls._timer = None
+            if cls._timer is None:
+                cls._timer = threading.Timer(interval, cls._flush_in_background)
+                cls._timer.daemon = True
+                cls._timer.start()
+
+    @classmethod
+    def _flush_in_background(cls):
+        try:
+            cls.flush()
+        finally:
+            # The timer thread owns its own connections
+            connections.close_all()
+
+    @classmethod
+    def flush(cls):
+        """
+        Write every pending row
+
+        Returns:
+            Number of rows written to the database
+        """
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+                cls._timer = None
+            pending, cls._pending = cls._pending, []
+
+        batches = {}
+        for model, fields in pending:
+            batches.setdefault(model, []).append(fields)
+
+        written = 0
+        for model, rows in batches.items():
+            written += write_audit_rows(model, rows)
+        return written
+
+    @classmethod
+    def pending_count(cls):
+        with cls._lock:
+            return len(cls._pending)
+
+
+def write_audit_rows(model, rows):
+    """
+    ``bulk_create`` one batch, spooling it to disk if the database fails
+
+    Returns:
+        Number of rows written to the database
+    """
+    try:
+        instances = model.objects.bulk_create([model(**fields) for fields in rows])
+    except Exception as e:
+        logger.error(f"Could not write {len(rows)} {model.__name__} rows, spooling them: {str(e)}")
+        spool_audit_rows(model, rows)
+        return 0
+
+    try:
+        audit_logs_flushed.send(sender=model, instances=instances)
+    except Exception as e:
+        logger.error(f"Error in audit_logs_flushed receiver: {str(e)}")
+    return len(instances)
+
+
+def spool_audit_rows(model, rows):
+    """Append rows to the spool file (durable fallback)"""
+    _, _, spool_path = get_audit_settings()
+    label = model._meta.label
+    try:
+        spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with spool_path.open('a', encoding='utf-8') as spool:
+            for fields in rows:
+                spool.write(json.dumps({'model': label, 'fields': fields}, cls=DjangoJSONEncoder) + '\n')
+    except OSError as e:
+        logger.critical(f"Audit rows lost, spool file not writable: {str(e)}")
+
+
+def replay_audit_spool():
+    """
+    Write the spooled rows to the database and truncate the spool
+
+    Returns:
+        Number of rows replayed
+    """
+    _, max_batch_size, spool_path = get_audit_settings()
+    if not spool_path.exists():
+        return 0
+
+    processing_path = spool_path.with_suffix('.replaying')
+    spool_path.replace(processing_path)
+
+    batches = {}
+    with processing_path.open(encoding='utf-8') as spool:
+        for line in spool:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            model = apps.get_model(entry['model'])
+            fields = entry['fields']
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.DateTimeField) and isinstance(fields.get(field.attname), str):
+                    fields[field.attname] = parse_datetime(fields[field.attname])
+            batches.setdefault(model, []).append(fields)
+
+    replayed = 0
+    for model, rows in batches.items():
+        for start in range(0, len(rows), max_batch_size):
+            # Rows that fail again go back to the spool
+            replayed += write_audit_rows(model, rows[start:start + max_batch_size])
+    processing_path.unlink()
+    return replayed
+
+
+def record_audit_event(model, **fields):
+    """
+    Queue an audit row once the current transaction commits
+
+    Args:
+        model: Audit model class (``SecurityAuditLog``, ``ActivityLog``)
+        **fields: Field values; use ``<fk>_id`` for foreign keys
+    """
+    transaction.on_commit(lambda: AuditLogBuffer.enqueue(model, fields))
+
+
+def flush_audit_logs():
+    """Write the pending audit rows now"""
+    return AuditLogBuffer.flush()
+
+
+atexit.register(AuditLogBuffer.flush)
@@ -0,0 +1,92 @@
+"""
+JWT authentication with a cached user lookup
+
+``JWTAuthentication`` loads the user row on every authenticated request.
+``CachedJWTAuthentication`` keeps the loaded user in the cache, keyed by
+user id, for at most the remaining lifetime of the token being validated.
+Entries are dropped when the user row is saved or deleted (deactivation,
+password change; see ``accounts.signals``) and by ``invalidate_cached_user``
+for bulk updates that bypass signals. Invalidation only reaches every
+worker through a shared cache (see ``django_blog.caching``).
+"""
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+logger = logging.getLogger(__name__)
+
+USER_KEY_PREFIX = 'jwt_user'
+
+
+def get_user_cache_timeout():
+    """Upper bound for cached users, in seconds"""
+    return getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 300)
+
+
+def _user_key(user_id):
+    return f'{USER_KEY_PREFIX}:{user_id}'
+
+
+def get_cached_user(user_id, token_exp=None):
+    """
+    Load a user through the cache
+
+    Args:
+        user_id: Primary key from the token claims
+        token_exp: Token expiry (epoch); bounds how long the user is cached
+
+    Returns:
+        User instance, or None if it does not exist
+    """
+    from .models import User
+
+    key = _user_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None:
+            return None
+        timeout = get_user_cache_timeout()
+        if token_exp:
+            timeout = max(1, min(timeout, int(token_exp - time.time())))
+        cache.set(key, user, timeout)
+    return user
+
+
+def invalidate_cached_user(*user_ids):
+    """Drop cached users after their rows change"""
+    try:
+        cache.delete_many([_user_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Error invalidating cached JWT users: {str(e)}")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that resolves the user through the cache
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id, validated_token.get('exp'))
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
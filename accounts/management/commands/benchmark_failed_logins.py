@@ -0,0 +1,74 @@
+import time
+import uuid
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from accounts.models import User
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Rollback(Exception):
+    pass
+
+
+def count_writes(queries):
+    return sum(1 for query in queries if query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS))
+
+
+class Command(BaseCommand):
+    help = 'Measure database queries and writes per failed login (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=10, help='Failed logins to simulate')
+
+    def handle(self, *args, **options):
+        attempts = options['attempts']
+        results = {}
+
+        try:
+            with transaction.atomic():
+                suffix = uuid.uuid4().hex[:8]
+                user = User.objects.create_user(
+                    username=f'benchmark-{suffix}',
+                    email=f'benchmark-{suffix}@example.com',
+                    password=uuid.uuid4().hex
+                )
+
+                # Full login path: backend lookup, password check, signal receivers
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    for _ in range(attempts):
+                        authenticate(username=user.email, password='wrong-password')
+                    elapsed = time.perf_counter() - start
+                results['failed login'] = (context.captured_queries, elapsed)
+
+                # Counter bookkeeping alone, against a full-row save for comparison
+                user.refresh_from_db()
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    for _ in range(attempts):
+                        user.increment_failed_attempts()
+                    elapsed = time.perf_counter() - start
+                results['increment_failed_attempts'] = (context.captured_queries, elapsed)
+
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    for _ in range(attempts):
+                        user.failed_login_attempts += 1
+                        user.save()
+                    elapsed = time.perf_counter() - start
+                results['full save() (before)'] = (context.captured_queries, elapsed)
+
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'{attempts} attempts per scenario (audit rows are batched and not counted)')
+        for name, (queries, elapsed) in results.items():
+            self.stdout.write(
+                f'  {name:<28} {len(queries) / attempts:5.1f} queries  '
+                f'{count_writes(queries) / attempts:5.1f} writes  '
+                f'{elapsed * 1000 / attempts:8.2f} ms per attempt'
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from accounts.audit import flush_audit_logs, replay_audit_spool
+
+
+class Command(BaseCommand):
+    help = 'Write pending audit rows and replay the audit spool file'
+    
+    def handle(self, *args, **options):
+        flushed = flush_audit_logs()
+        replayed = replay_audit_spool()
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {flushed} buffered and {replayed} spooled audit rows')
+        )
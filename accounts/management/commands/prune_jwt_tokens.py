@@ -0,0 +1,33 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWTs in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per query')
+        parser.add_argument('--grace-hours', type=int, default=0, help='Keep tokens expired less than this')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired tokens')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        expired = OutstandingToken.objects.filter(expires_at__lte=cutoff)
+
+        if options['dry_run']:
+            blacklisted = BlacklistedToken.objects.filter(token__expires_at__lte=cutoff).count()
+            self.stdout.write(f'{expired.count()} expired tokens ({blacklisted} blacklisted) would be deleted')
+            return
+
+        # Small batches keep each DELETE (and the blacklist cascade) short
+        deleted = 0
+        while True:
+            ids = list(expired.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            deleted += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired tokens'))
@@ -1,10 +1,17 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Case, F, Value, When
 from django.utils import timezone
 from datetime import timedelta
 import uuid
 
 
+def _invalidate_cached_user(user_id):
+    # Imported here: accounts.authentication loads the models lazily too
+    from .authentication import invalidate_cached_user
+    invalidate_cached_user(user_id)
+
+
 class User(AbstractUser):
     """Extended User model with email verification and security features"""
     email = models.EmailField(unique=True)
@@ -18,11 +25,29 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    # Lock the account after this many consecutive failed logins
+    MAX_FAILED_LOGIN_ATTEMPTS = 5
+    LOCKOUT_MINUTES = 30
+    
+    def _update_fields(self, **values):
+        """
+        Write only the given columns with a queryset update
+
+        Does not fire post_save (profile save, dashboard permission and
+        registration receivers), so security bookkeeping costs one UPDATE.
+        The cached JWT user is dropped here instead of by the signal.
+        """
+        type(self).objects.filter(pk=self.pk).update(**values)
+        for field, value in values.items():
+            setattr(self, field, value)
+        _invalidate_cached_user(self.pk)
+    
     def generate_verification_token(self):
         """Generate a unique verification token"""
-        self.email_verification_token = str(uuid.uuid4())
-        self.email_verification_sent_at = timezone.now()
-        self.save()
+        self._update_fields(
+            email_verification_token=str(uuid.uuid4()),
+            email_verification_sent_at=timezone.now()
+        )
         return self.email_verification_token
     
     def is_verification_token_valid(self):
@@ -38,28 +63,59 @@ class User(AbstractUser):
             return False
         return timezone.now() < self.locked_until
     
-    def lock_account(self, duration_minutes=30):
+    def lock_account(self, duration_minutes=LOCKOUT_MINUTES):
         """Lock account for specified duration"""
-        self.locked_until = timezone.now() + timedelta(minutes=duration_minutes)
-        self.save()
+        self._update_fields(locked_until=timezone.now() + timedelta(minutes=duration_minutes))
     
     def unlock_account(self):
         """Unlock account and reset failed attempts"""
-        self.locked_until = None
-        self.failed_login_attempts = 0
-        self.save()
+        self._update_fields(locked_until=None, failed_login_attempts=0)
+    
+    @classmethod
+    def record_failed_attempt(cls, **lookup):
+        """
+        Count a failed login and lock the account at the threshold
+        
+        One atomic UPDATE: concurrent attempts are all counted and the lock
+        is decided on the stored counter, not on a stale instance.
+        
+        Args:
+            **lookup: Unique lookup of the user (``pk=...`` or ``email=...``)
+        
+        Returns:
+            Tuple ``(pk, failed_login_attempts, locked_until)`` after the
+            update, or None if no user matches
+        """
+        locked_until = timezone.now() + timedelta(minutes=cls.LOCKOUT_MINUTES)
+        users = cls.objects.filter(**lookup)
+        updated = users.update(
+            failed_login_attempts=F('failed_login_attempts') + 1,
+            # Conditions see the value before the increment
+            locked_until=Case(
+                When(failed_login_attempts__gte=cls.MAX_FAILED_LOGIN_ATTEMPTS - 1, then=Value(locked_until)),
+                default=F('locked_until')
+            )
+        )
+        if not updated:
+            return None
+        result = users.values_list('pk', 'failed_login_attempts', 'locked_until').first()
+        if result:
+            _invalidate_cached_user(result[0])
+        return result
     
     def increment_failed_attempts(self):
         """Increment failed login attempts and lock if threshold reached"""
-        self.failed_login_attempts += 1
-        if self.failed_login_attempts >= 5:  # Lock after 5 failed attempts
-            self.lock_account()
-        self.save()
+        result = self.record_failed_attempt(pk=self.pk)
+        if result:
+            _, self.failed_login_attempts, self.locked_until = result
     
     def reset_failed_attempts(self):
         """Reset failed login attempts on successful login"""
-        self.failed_login_attempts = 0
-        self.save()
+        # Nothing to write on the usual path (no previous failures)
+        if self.failed_login_attempts:
+            type(self).objects.filter(pk=self.pk, failed_login_attempts__gt=0).update(failed_login_attempts=0)
+            self.failed_login_attempts = 0
+            _invalidate_cached_user(self.pk)
 
 
 class UserProfile(models.Model):
@@ -208,7 +264,8 @@ class SecurityAuditLog(models.Model):
     user_agent = models.TextField(blank=True)
     success = models.BooleanField(default=True)
     details = models.JSONField(default=dict, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the buffered row is written
+    timestamp = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         username = self.user.username if self.user else 'Anonymous'
@@ -0,0 +1,153 @@
+"""
+Effective permission resolution
+
+A user's effective permissions are the dashboard flags of their
+``DashboardPermission`` row plus the codenames granted by their active
+roles (``UserRole`` -> ``Role`` -> ``RolePermission``), minus codenames a
+role explicitly denies. Resolving them takes two queries, so the result is:
+
+* memoized on the user object, which lives for one request, so every
+  permission class, middleware and serializer of a request shares it,
+* cached per user in the cache layer. Keys embed a global version that is
+  bumped when roles or permissions change. Per-user entries are dropped
+  when that user's roles or dashboard flags change.
+
+Checks are set lookups::
+
+    get_effective_permissions(request.user).has('dashboard.manage_posts')
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'permissions:version'
+
+# DashboardPermission flag -> effective codename
+DASHBOARD_FLAGS = {
+    'can_manage_posts': 'dashboard.manage_posts',
+    'can_manage_users': 'dashboard.manage_users',
+    'can_manage_comments': 'dashboard.manage_comments',
+    'can_view_stats': 'dashboard.view_stats',
+}
+DASHBOARD_CODENAMES = frozenset(DASHBOARD_FLAGS.values())
+
+
+def get_cache_timeout():
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+class EffectivePermissions:
+    """
+    Immutable set of permission codenames with O(1) checks
+    """
+
+    __slots__ = ('codenames', 'is_superuser')
+
+    def __init__(self, codenames=(), is_superuser=False):
+        self.codenames = frozenset(codenames)
+        self.is_superuser = is_superuser
+
+    def has(self, codename):
+        """Check a single codename (superusers have every permission)"""
+        return self.is_superuser or codename in self.codenames
+
+    def has_any(self, *codenames):
+        return self.is_superuser or not self.codenames.isdisjoint(codenames)
+
+    @property
+    def dashboard_access(self):
+        """Any dashboard flag grants access to the dashboard"""
+        return self.has_any(*DASHBOARD_CODENAMES)
+
+    def dashboard_flags(self):
+        """Dashboard flags as booleans, keyed like ``DashboardPermission``"""
+        return {flag: self.has(codename) for flag, codename in DASHBOARD_FLAGS.items()}
+
+    def __contains__(self, codename):
+        return self.has(codename)
+
+    def __repr__(self):
+        return f"<EffectivePermissions superuser={self.is_superuser} {sorted(self.codenames)}>"
+
+
+NO_PERMISSIONS = EffectivePermissions()
+
+
+def _get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def _cache_key(user_id, version=None):
+    return f'permissions:v{version or _get_version()}:user:{user_id}'
+
+
+def compute_codenames(user_id):
+    """
+    Resolve the permission codenames of a user from the database
+
+    Returns:
+        Frozenset of codenames (two queries)
+    """
+    from dashboard.models import DashboardPermission
+    from .models import RolePermission
+
+    codenames = set()
+    flags = DashboardPermission.objects.filter(user_id=user_id).values(*DASHBOARD_FLAGS).first()
+    if flags:
+        codenames.update(DASHBOARD_FLAGS[flag] for flag, enabled in flags.items() if enabled)
+
+    denied = set()
+    role_permissions = RolePermission.objects.filter(
+        role__is_active=True,
+        role__user_assignments__user_id=user_id,
+        role__user_assignments__is_active=True,
+    ).values_list('permission__codename', 'granted')
+    for codename, granted in role_permissions:
+        (codenames if granted else denied).add(codename)
+
+    # An explicit deny in any role wins over grants
+    return frozenset(codenames - denied)
+
+
+def get_effective_permissions(user):
+    """
+    Effective permissions of a user, resolved at most once per request
+
+    Args:
+        user: User instance (anonymous users get no permissions)
+
+    Returns:
+        EffectivePermissions
+    """
+    if user is None or not getattr(user, 'is_authenticated', False) or not user.is_active:
+        return NO_PERMISSIONS
+
+    resolved = getattr(user, '_effective_permissions', None)
+    if resolved is not None:
+        return resolved
+
+    key = _cache_key(user.pk)
+    codenames = cache.get(key)
+    if codenames is None:
+        codenames = compute_codenames(user.pk)
+        cache.set(key, codenames, get_cache_timeout())
+
+    resolved = EffectivePermissions(codenames, is_superuser=user.is_superuser)
+    user._effective_permissions = resolved
+    return resolved
+
+
+def invalidate_user_permissions(user_id):
+    """Drop the cached permissions of one user (role or flag change)"""
+    cache.delete(_cache_key(user_id))
+
+
+def bump_permissions_version():
+    """Invalidate every cached permission set (role/permission definitions changed)"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_login_failed
-from .models import User, UserProfile, SecurityAuditLog
+from django.utils import timezone
+from django_blog.client_ip import get_client_ip
+from .audit import record_audit_event
+from .authentication import invalidate_cached_user
+from .models import Permission, Role, RolePermission, User, UserProfile, UserRole, SecurityAuditLog
+from .permissions import bump_permissions_version, invalidate_user_permissions
 
 
 @receiver(post_save, sender=User)
@@ -18,11 +23,18 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
 
 
+@receiver([post_save, post_delete], sender=User)
+def invalidate_jwt_user(sender, instance, **kwargs):
+    """Deactivation or password change must reach JWT-authenticated requests"""
+    invalidate_cached_user(instance.pk)
+
+
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     """Log successful user login"""
-    SecurityAuditLog.objects.create(
-        user=user,
+    record_audit_event(
+        SecurityAuditLog,
+        user_id=user.pk,
         action='login',
         ip_address=get_client_ip(request),
         user_agent=request.META.get('HTTP_USER_AGENT', ''),
@@ -30,7 +42,8 @@ def log_user_login(sender, request, user, **kwargs):
         details={
             'login_method': 'standard',
             'session_key': request.session.session_key
-        }
+        },
+        timestamp=timezone.now()
     )
     
     # Reset failed login attempts on successful login
@@ -41,21 +54,22 @@ def log_user_login(sender, request, user, **kwargs):
 def log_failed_login(sender, credentials, request, **kwargs):
     """Log failed login attempt"""
     email = credentials.get('username', '')  # Using email as username
-    user = None
+    now = timezone.now()
     
-    try:
-        user = User.objects.get(email=email)
-        user.increment_failed_attempts()
-    except User.DoesNotExist:
-        pass
+    # Targeted counter update: no read-modify-write of the whole row
+    result = User.record_failed_attempt(email=email) if email else None
+    user_id, attempts, _ = result or (None, 0, None)
+    # Counter updates are atomic: exactly one attempt reaches the threshold
+    locked = attempts == User.MAX_FAILED_LOGIN_ATTEMPTS
     
     # Get user agent safely
     user_agent = ''
     if request and hasattr(request, 'META'):
         user_agent = request.META.get('HTTP_USER_AGENT', '')
     
-    SecurityAuditLog.objects.create(
-        user=user,
+    record_audit_event(
+        SecurityAuditLog,
+        user_id=user_id,
         action='login_failed',
         ip_address=get_client_ip(request),
         user_agent=user_agent,
@@ -63,18 +77,31 @@ def log_failed_login(sender, credentials, request, **kwargs):
         details={
             'attempted_email': email,
             'reason': 'invalid_credentials'
-        }
+        },
+        timestamp=now
     )
+    if locked:
+        record_audit_event(
+            SecurityAuditLog,
+            user_id=user_id,
+            action='account_locked',
+            ip_address=get_client_ip(request),
+            user_agent=user_agent,
+            success=False,
+            details={'reason': 'too_many_failed_attempts'},
+            timestamp=now
+        )
 
 
-def get_client_ip(request):
-    """Get client IP address from request"""
-    if not request or not hasattr(request, 'META'):
-        return '127.0.0.1'  # Default IP for tests or when request is None
-    
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '127.0.0.1')
-    return ip
\ No newline at end of file
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=Permission)
+@receiver([post_save, post_delete], sender=RolePermission)
+def invalidate_role_permissions(sender, **kwargs):
+    """Role definitions affect many users: invalidate every cached permission set"""
+    bump_permissions_version()
+
+
+@receiver([post_save, post_delete], sender=UserRole)
+def invalidate_user_role_permissions(sender, instance, **kwargs):
+    """Role assignments only affect the assigned user"""
+    invalidate_user_permissions(instance.user_id)
@@ -1,11 +1,25 @@
-from django.test import TestCase
+import tempfile
+from unittest.mock import patch
+from io import StringIO
+from pathlib import Path
+from django.contrib.auth import authenticate
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from .models import (
     UserProfile, Role, Permission, RolePermission, 
     UserRole, SecurityAuditLog, PasswordResetToken
 )
+from .authentication import CachedJWTAuthentication
+from .audit import AuditLogBuffer, flush_audit_logs, record_audit_event, replay_audit_spool
+from .permissions import get_effective_permissions
+from .tokens import UserClaimsRefreshToken, _blacklist_key, is_jti_blacklisted
 
 User = get_user_model()
 
@@ -71,6 +85,37 @@ class UserModelTest(TestCase):
         self.user.increment_failed_attempts()
         self.assertEqual(self.user.failed_login_attempts, 5)
         self.assertTrue(self.user.is_account_locked())
+    
+    def test_security_updates_skip_save_signals(self):
+        """Test security bookkeeping writes one UPDATE without post_save receivers"""
+        with self.assertNumQueries(1):
+            self.user.lock_account()
+        with self.assertNumQueries(1):
+            self.user.unlock_account()
+        with self.assertNumQueries(1):
+            self.user.generate_verification_token()
+        # Update + read back of the counter
+        with self.assertNumQueries(2):
+            self.user.increment_failed_attempts()
+        with self.assertNumQueries(1):
+            self.user.reset_failed_attempts()
+        with self.assertNumQueries(0):
+            self.user.reset_failed_attempts()
+        
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 0)
+        self.assertTrue(self.user.email_verification_token)
+    
+    def test_failed_attempts_counted_on_stale_instances(self):
+        """Test concurrent attempts are all counted from the stored value"""
+        stale = User.objects.get(pk=self.user.pk)
+        for _ in range(3):
+            self.user.increment_failed_attempts()
+        stale.increment_failed_attempts()
+        self.assertEqual(stale.failed_login_attempts, 4)
+        
+        stale.increment_failed_attempts()
+        self.assertTrue(stale.is_account_locked())
 
 
 class UserProfileTest(TestCase):
@@ -163,6 +208,79 @@ class RolePermissionTest(TestCase):
         self.assertTrue(user_role.is_active)
 
 
+class EffectivePermissionsTest(TestCase):
+    """Test the cached, per-request permission resolver"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='editor',
+            email='editor@example.com',
+            password='testpass123'
+        )
+        self.role = Role.objects.create(name='Editor')
+        self.publish = Permission.objects.create(codename='posts.publish_post', name='Publish', category='posts')
+        self.delete = Permission.objects.create(codename='posts.delete_post', name='Delete', category='posts')
+        RolePermission.objects.create(role=self.role, permission=self.publish)
+        UserRole.objects.create(user=self.user, role=self.role)
+    
+    def fresh_user(self):
+        """A new instance, as a new request would load"""
+        return User.objects.get(pk=self.user.pk)
+    
+    def test_dashboard_flags_and_roles(self):
+        """Dashboard flags and role grants form one set"""
+        permissions = get_effective_permissions(self.fresh_user())
+        
+        self.assertTrue(permissions.has('posts.publish_post'))
+        self.assertTrue(permissions.has('dashboard.view_stats'))
+        self.assertFalse(permissions.has('dashboard.manage_posts'))
+        self.assertFalse(permissions.has('posts.delete_post'))
+        self.assertTrue(permissions.dashboard_access)
+    
+    def test_memoized_per_request_and_cached(self):
+        """Resolved once per user object, then served from the cache"""
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            get_effective_permissions(user)
+            get_effective_permissions(user).has('posts.publish_post')
+        
+        next_request_user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(get_effective_permissions(next_request_user).has('posts.publish_post'))
+    
+    def test_role_changes_invalidate(self):
+        """Grants, denies and assignments take effect on the next request"""
+        get_effective_permissions(self.fresh_user())
+        
+        RolePermission.objects.create(role=self.role, permission=self.delete)
+        self.assertTrue(get_effective_permissions(self.fresh_user()).has('posts.delete_post'))
+        
+        # An explicit deny from another role wins
+        restricted = Role.objects.create(name='Restricted')
+        RolePermission.objects.create(role=restricted, permission=self.delete, granted=False)
+        UserRole.objects.create(user=self.user, role=restricted)
+        self.assertFalse(get_effective_permissions(self.fresh_user()).has('posts.delete_post'))
+        
+        self.role.is_active = False
+        self.role.save()
+        self.assertFalse(get_effective_permissions(self.fresh_user()).has('posts.publish_post'))
+    
+    def test_dashboard_flag_changes_invalidate(self):
+        """Editing DashboardPermission drops the cached set of that user"""
+        get_effective_permissions(self.fresh_user())
+        
+        dashboard_permission = self.user.dashboard_permission
+        dashboard_permission.can_manage_posts = True
+        dashboard_permission.save()
+        self.assertTrue(get_effective_permissions(self.fresh_user()).has('dashboard.manage_posts'))
+    
+    def test_superuser_has_everything(self):
+        """Superusers pass every check without any grant"""
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='testpass123')
+        self.assertTrue(get_effective_permissions(admin).has('anything.at_all'))
+
+
 class SecurityAuditLogTest(TestCase):
     """Test SecurityAuditLog model"""
     
@@ -190,6 +308,173 @@ class SecurityAuditLogTest(TestCase):
         self.assertEqual(log.details['test'], 'data')
 
 
+class AuditLogBufferTest(TestCase):
+    """Test buffered audit logging"""
+    
+    def setUp(self):
+        # The test runner writes synchronously; buffer here, flushed explicitly
+        self.spool_path = Path(tempfile.mkdtemp()) / 'audit_spool.jsonl'
+        buffered = override_settings(AUDIT_LOG_SETTINGS={'FLUSH_INTERVAL': 3600, 'SPOOL_PATH': self.spool_path})
+        buffered.enable()
+        self.addCleanup(buffered.disable)
+        self.addCleanup(flush_audit_logs)
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        flush_audit_logs()
+    
+    def record(self, count, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(count):
+                record_audit_event(
+                    SecurityAuditLog,
+                    user_id=self.user.pk,
+                    action='login',
+                    ip_address='127.0.0.1',
+                    details={'index': index},
+                    **fields
+                )
+    
+    def test_events_written_in_one_batch(self):
+        """Events wait in the buffer and are written with one query"""
+        self.record(3)
+        self.assertEqual(SecurityAuditLog.objects.count(), 0)
+        self.assertEqual(AuditLogBuffer.pending_count(), 3)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_audit_logs(), 3)
+        self.assertEqual(SecurityAuditLog.objects.count(), 3)
+    
+    def test_rolled_back_events_are_dropped(self):
+        """Only events of committed transactions are queued"""
+        record_audit_event(SecurityAuditLog, user_id=self.user.pk, action='login', ip_address='127.0.0.1')
+        self.assertEqual(AuditLogBuffer.pending_count(), 0)
+    
+    def test_failed_batch_is_spooled_and_replayed(self):
+        """Rows the database rejects go to the spool file and can be replayed"""
+        spool_path = self.spool_path
+        self.record(1, timestamp=timezone.now() - timedelta(hours=1))
+        self.record(1, nonexistent_field=True)
+        flush_audit_logs()
+        self.assertEqual(SecurityAuditLog.objects.count(), 0)
+        self.assertEqual(len(spool_path.read_text().splitlines()), 2)
+        
+        # The broken row is spooled again, the valid one is written
+        self.assertEqual(replay_audit_spool(), 0)
+        lines = spool_path.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        spool_path.write_text(lines[0] + '\n')
+        self.assertEqual(replay_audit_spool(), 1)
+        
+        log = SecurityAuditLog.objects.get()
+        self.assertLess(log.timestamp, timezone.now() - timedelta(minutes=59))
+        self.assertFalse(spool_path.exists())
+    
+    def test_failed_logins_update_counters(self):
+        """Failed logins increment the counter in place and lock the account"""
+        # Backend lookup, counter update and read back: a single write
+        with self.assertNumQueries(3):
+            authenticate(username='test@example.com', password='wrong')
+        with self.captureOnCommitCallbacks(execute=True):
+            # One attempt past the threshold: the lock is audited once
+            for _ in range(User.MAX_FAILED_LOGIN_ATTEMPTS):
+                authenticate(username='test@example.com', password='wrong')
+        flush_audit_logs()
+        
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, User.MAX_FAILED_LOGIN_ATTEMPTS + 1)
+        self.assertTrue(self.user.is_account_locked())
+        actions = list(SecurityAuditLog.objects.filter(user=self.user).values_list('action', flat=True))
+        self.assertEqual(actions.count('login_failed'), User.MAX_FAILED_LOGIN_ATTEMPTS)
+        self.assertEqual(actions.count('account_locked'), 1)
+
+
+class JWTCacheTest(TestCase):
+    """Test cached JWT user lookups, JTI blacklist cache and token pruning"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.refresh = UserClaimsRefreshToken.for_user(self.user)
+    
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+    
+    def test_user_cached_between_requests(self):
+        """The user row is loaded once and invalidated when it changes"""
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().pk, self.user.pk)
+        
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+    
+    def test_security_updates_invalidate_cached_user(self):
+        """Targeted updates that skip post_save still drop the cached user"""
+        self.authenticate()
+        self.user.lock_account()
+        self.assertTrue(self.authenticate().is_account_locked())
+        
+        self.user.unlock_account()
+        self.assertFalse(self.authenticate().is_account_locked())
+        
+        self.user.increment_failed_attempts()
+        self.assertEqual(self.authenticate().failed_login_attempts, 1)
+        self.user.reset_failed_attempts()
+        self.assertEqual(self.authenticate().failed_login_attempts, 0)
+        
+        token = self.user.generate_verification_token()
+        self.assertEqual(self.authenticate().email_verification_token, token)
+    
+    def test_blacklist_lookups_cached(self):
+        """JTI checks hit the blacklist table once and blacklisting writes through"""
+        with self.assertNumQueries(1):
+            UserClaimsRefreshToken(str(self.refresh))
+        with self.assertNumQueries(0):
+            UserClaimsRefreshToken(str(self.refresh))
+        
+        UserClaimsRefreshToken(str(self.refresh)).blacklist()
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                UserClaimsRefreshToken(str(self.refresh))
+    
+    def test_blacklist_not_overwritten_by_stale_lookup(self):
+        """A lookup that read the table before blacklist() cannot cache a stale 0"""
+        jti = self.refresh['jti']
+        self.refresh.blacklist()
+        
+        # The racing lookup missed the cache and read the table before the commit
+        with patch('accounts.tokens.cache.get', return_value=None), \
+                patch.object(BlacklistedToken.objects, 'filter', return_value=BlacklistedToken.objects.none()):
+            self.assertFalse(is_jti_blacklisted(jti, 3600))
+        
+        self.assertEqual(cache.get(_blacklist_key(jti)), 1)
+        with self.assertRaises(TokenError):
+            UserClaimsRefreshToken(str(self.refresh))
+    
+    def test_prune_expired_tokens(self):
+        """Expired outstanding tokens and their blacklist rows are deleted"""
+        self.refresh.blacklist()
+        expired = UserClaimsRefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        
+        call_command('prune_jwt_tokens', batch_size=1, stdout=StringIO())
+        
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [self.refresh['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
 class PasswordResetTokenTest(TestCase):
     """Test PasswordResetToken model"""
     
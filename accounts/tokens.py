@@ -0,0 +1,96 @@
+"""
+JWT helpers
+
+Refresh tokens carry the user flags needed for stateless checks, and the
+``token_blacklist`` lookups are fronted by a compact cache of JTIs.
+Blacklisted JTIs are cached (1) until the token expires; JTIs found not
+blacklisted (0) only for ``JWT_BLACKLIST_NEGATIVE_TIMEOUT`` seconds.
+Misses are filled with ``cache.add`` so a lookup that raced with
+``blacklist()`` cannot overwrite the 1 it wrote through, and the short
+negative timeout bounds staleness for rows blacklisted elsewhere (admin,
+``token_blacklist`` views).
+
+The write-through only reaches other processes through a shared cache;
+``AccountsConfig.ready`` enforces one (``SHARED_CACHE_REQUIRED``).
+"""
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY_PREFIX = 'jwt_blacklist'
+
+
+def _blacklist_key(jti):
+    return f'{BLACKLIST_KEY_PREFIX}:{jti}'
+
+
+def _remaining_lifetime(payload):
+    """Seconds until the token expires (at least 1)"""
+    return max(1, int(payload.get('exp', 0) - time.time()))
+
+
+def get_negative_timeout():
+    """Seconds a "not blacklisted" answer is cached"""
+    return getattr(settings, 'JWT_BLACKLIST_NEGATIVE_TIMEOUT', 60)
+
+
+def is_jti_blacklisted(jti, exp_timeout=None):
+    """
+    Check a JTI against the cache, falling back to the blacklist table
+
+    Args:
+        jti: Token identifier
+        exp_timeout: Seconds to cache the answer (token remaining lifetime)
+
+    Returns:
+        True if the token is blacklisted
+    """
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    key = _blacklist_key(jti)
+    cached = cache.get(key)
+    if cached is not None:
+        return bool(cached)
+
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    timeout = exp_timeout if blacklisted else get_negative_timeout()
+    if exp_timeout is not None:
+        timeout = min(timeout, exp_timeout)
+    # add, not set: never replace a 1 written by a concurrent blacklist()
+    cache.add(key, int(blacklisted), timeout)
+    return blacklisted
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh token that carries the user flags needed for stateless checks"""
+
+    @classmethod
+    def for_user(cls, user):
+        """Add username and role flags as signed claims (copied to access tokens)"""
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        return token
+
+    def check_blacklist(self):
+        """Blacklist check served from the JTI cache"""
+        if is_jti_blacklisted(self.payload[api_settings.JTI_CLAIM], _remaining_lifetime(self.payload)):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """Blacklist in the database and write through to the JTI cache"""
+        result = super().blacklist()
+        try:
+            cache.set(_blacklist_key(self.payload[api_settings.JTI_CLAIM]), 1, _remaining_lifetime(self.payload))
+        except Exception as e:
+            # The table is the source of truth; a stale 0 expires with the token
+            logger.warning(f"Could not cache blacklisted JTI: {str(e)}")
+        return result
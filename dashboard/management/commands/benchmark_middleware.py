@@ -0,0 +1,77 @@
+import logging
+import time
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+# Pila anterior a APIGatewayMiddleware, para comparar
+LEGACY_MIDDLEWARE = [
+    'django_blog.middleware.MetricsMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django_blog.middleware.SecurityHeadersMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django_blog.middleware.RateLimitMiddleware',
+    'django_blog.middleware.ProfilingMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django_blog.middleware.RequestLoggingMiddleware',
+    'django_blog.middleware.APIErrorHandlingMiddleware',
+    'django_blog.middleware.ResponseTimeMiddleware',
+    'django_blog.middleware.APIVersionMiddleware',
+]
+
+# Los logs de acceso escribirían en disco en cada iteración
+QUIET_LOGGERS = ('django_blog.access', 'django_blog.middleware', 'django.request')
+
+
+class Command(BaseCommand):
+    help = 'Mide el coste por petición de la pila de middlewares (anterior frente a actual)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Peticiones por medición')
+        parser.add_argument('--path', default='/api/v1/health/', help='Ruta a pedir (vista barata, sin base de datos)')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = {
+            'jwt': lambda: factory.get(options['path'], HTTP_AUTHORIZATION='Bearer benchmark'),
+            'anónima': lambda: factory.get(options['path']),
+        }
+        stacks = {
+            'anterior': LEGACY_MIDDLEWARE,
+            'actual': settings.MIDDLEWARE,
+        }
+
+        levels = {name: logging.getLogger(name).level for name in QUIET_LOGGERS}
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.ERROR)
+        try:
+            self.stdout.write(f"{'petición':<10} {'pila':<10} {'µs/petición':>12} {'sobrecoste µs':>14}")
+            for request_name, make_request in requests.items():
+                baseline = self.measure([], make_request, options['iterations'])
+                for stack_name, middleware in stacks.items():
+                    elapsed = self.measure(middleware, make_request, options['iterations'])
+                    self.stdout.write(
+                        f"{request_name:<10} {stack_name:<10} {elapsed:>12.1f} {elapsed - baseline:>14.1f}"
+                    )
+        finally:
+            for name, level in levels.items():
+                logging.getLogger(name).setLevel(level)
+
+    def measure(self, middleware, make_request, iterations):
+        """Microsegundos por petición con la pila indicada"""
+        with override_settings(MIDDLEWARE=middleware):
+            handler = BaseHandler()
+            handler.load_middleware()
+            # Calentamiento: resolución de URLs, imports perezosos
+            for _ in range(min(100, iterations)):
+                handler.get_response(make_request())
+            start = time.perf_counter()
+            for _ in range(iterations):
+                handler.get_response(make_request())
+            return (time.perf_counter() - start) / iterations * 1e6
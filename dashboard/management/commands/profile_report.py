@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django_blog.profiling import aggregate_profiles
+
+
+class Command(BaseCommand):
+    help = 'Percentiles por ruta a partir del log de perfilado de peticiones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=str(settings.BASE_DIR / 'logs' / 'profiling.log'),
+            help='Log con los registros de django_blog.profiling'
+        )
+        parser.add_argument('--min-count', type=int, default=1, help='Ignorar rutas con menos muestras')
+        parser.add_argument('--limit', type=int, default=20, help='Número de rutas a mostrar')
+    
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], encoding='utf-8') as log_file:
+                report = aggregate_profiles(log_file)
+        except FileNotFoundError:
+            raise CommandError(f"No existe el log de perfilado: {options['file']}")
+        
+        report = [row for row in report if row['count'] >= options['min_count']][:options['limit']]
+        if not report:
+            self.stdout.write('Sin registros de perfilado')
+            return
+        
+        self.stdout.write(
+            f"{'ruta':<50} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'sql':>6} {'sql ms':>8} {'ser ms':>8}"
+        )
+        for row in report:
+            self.stdout.write(
+                f"{row['route'][:50]:<50} {row['count']:>6} "
+                f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f} "
+                f"{row['avg_sql_count']:>6.1f} {row['avg_sql_ms']:>8.1f} {row['avg_serializer_ms']:>8.1f}"
+            )
@@ -3,6 +3,7 @@ from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
 from django.urls import resolve
 from rest_framework import status
+from django_blog.middleware import RateLimitMiddleware
 from .utils import log_activity, get_client_ip, validate_dashboard_access
 
 
@@ -149,36 +150,14 @@ class DashboardAuthenticationMiddleware(MiddlewareMixin):
         return None
 
 
-class DashboardRateLimitMiddleware(MiddlewareMixin):
+class DashboardRateLimitMiddleware(RateLimitMiddleware):
     """
-    Middleware básico de rate limiting para el dashboard
+    Rate limiting del dashboard
+
+    Aplica solo los grupos ``dashboard`` y ``auth`` de RATE_LIMIT_SETTINGS
+    con contadores atómicos en la caché compartida (ver
+    ``django_blog.ratelimit``). No es necesario si ``RateLimitMiddleware``
+    ya está activo para todas las rutas.
     """
     
-    def __init__(self, get_response):
-        self.get_response = get_response
-        self.request_counts = {}  # En producción usar Redis
-        super().__init__(get_response)
-    
-    def process_request(self, request):
-        """
-        Aplicar rate limiting básico
-        """
-        # Solo aplicar a rutas del dashboard
-        if not request.path.startswith('/dashboard/'):
-            return None
-        
-        # Rate limiting básico por IP
-        client_ip = get_client_ip(request)
-        current_time = timezone.now()
-        
-        # Limpiar contadores antiguos (implementación básica)
-        # En producción usar Redis con TTL
-        
-        # Por ahora solo logear para monitoreo
-        logger.debug(f"Dashboard request from IP: {client_ip} - Path: {request.path}")
-        
-        return None
-
-
-# Importar timezone para el rate limiting
-from django.utils import timezone
\ No newline at end of file
+    groups = ('dashboard', 'auth')
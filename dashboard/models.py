@@ -44,7 +44,8 @@ class ActivityLog(models.Model):
     target_model = models.CharField(max_length=50, help_text='Modelo afectado (Post, User, etc.)')
     target_id = models.IntegerField(null=True, blank=True, help_text='ID del objeto afectado')
     description = models.TextField(help_text='Descripción detallada de la acción')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Momento de la acción, no de la escritura del lote (accounts.audit)
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
     
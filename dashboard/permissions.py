@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from .models import DashboardPermission
+from accounts.permissions import get_effective_permissions
 
 
 class IsDashboardUser(permissions.BasePermission):
@@ -12,19 +12,8 @@ class IsDashboardUser(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        # Los superusuarios siempre tienen acceso
-        if request.user.is_superuser:
-            return True
-        
-        # Verificar si el usuario tiene permisos de dashboard
-        try:
-            dashboard_permission = request.user.dashboard_permission
-            return (dashboard_permission.can_view_stats or 
-                   dashboard_permission.can_manage_posts or
-                   dashboard_permission.can_manage_users or
-                   dashboard_permission.can_manage_comments)
-        except DashboardPermission.DoesNotExist:
-            return False
+        # Cualquier permiso de dashboard (o ser superusuario) da acceso
+        return get_effective_permissions(request.user).dashboard_access
 
 
 class CanManagePosts(permissions.BasePermission):
@@ -37,13 +26,7 @@ class CanManagePosts(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        if request.user.is_superuser:
-            return True
-        
-        try:
-            return request.user.dashboard_permission.can_manage_posts
-        except DashboardPermission.DoesNotExist:
-            return False
+        return get_effective_permissions(request.user).has('dashboard.manage_posts')
 
 
 class CanManageUsers(permissions.BasePermission):
@@ -56,13 +39,7 @@ class CanManageUsers(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        if request.user.is_superuser:
-            return True
-        
-        try:
-            return request.user.dashboard_permission.can_manage_users
-        except DashboardPermission.DoesNotExist:
-            return False
+        return get_effective_permissions(request.user).has('dashboard.manage_users')
 
 
 class CanManageComments(permissions.BasePermission):
@@ -75,13 +52,7 @@ class CanManageComments(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        if request.user.is_superuser:
-            return True
-        
-        try:
-            return request.user.dashboard_permission.can_manage_comments
-        except DashboardPermission.DoesNotExist:
-            return False
+        return get_effective_permissions(request.user).has('dashboard.manage_comments')
 
 
 class CanViewStats(permissions.BasePermission):
@@ -94,19 +65,19 @@ class CanViewStats(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
         
-        if request.user.is_superuser:
-            return True
-        
-        try:
-            return request.user.dashboard_permission.can_view_stats
-        except DashboardPermission.DoesNotExist:
-            return False
+        return get_effective_permissions(request.user).has('dashboard.view_stats')
 
 
 class IsOwnerOrCanManage(permissions.BasePermission):
     """
     Permiso que permite al propietario o a usuarios con permisos de gestión
     """
+    MODEL_PERMISSIONS = {
+        'Post': 'dashboard.manage_posts',
+        'User': 'dashboard.manage_users',
+        'Comentario': 'dashboard.manage_comments',
+    }
+    
     def has_object_permission(self, request, view, obj):
         # Los superusuarios siempre pueden
         if request.user.is_superuser:
@@ -120,17 +91,5 @@ class IsOwnerOrCanManage(permissions.BasePermission):
             return True
         
         # Verificar permisos específicos según el tipo de objeto
-        try:
-            dashboard_permission = request.user.dashboard_permission
-            
-            if obj.__class__.__name__ == 'Post':
-                return dashboard_permission.can_manage_posts
-            elif obj.__class__.__name__ == 'User':
-                return dashboard_permission.can_manage_users
-            elif obj.__class__.__name__ == 'Comentario':
-                return dashboard_permission.can_manage_comments
-                
-        except DashboardPermission.DoesNotExist:
-            pass
-        
-        return False
\ No newline at end of file
+        codename = self.MODEL_PERMISSIONS.get(obj.__class__.__name__)
+        return bool(codename) and get_effective_permissions(request.user).has(codename)
@@ -0,0 +1,126 @@
+"""
+Publicación de métricas en vivo para los dashboards abiertos
+
+Los cambios (post publicado, comentario pendiente, usuario registrado,
+actividad registrada) se acumulan en memoria como deltas sobre los
+contadores de get_dashboard_stats() y se envían al grupo "dashboard_users"
+como un único mensaje "dashboard_update" por intervalo, de modo que los
+dashboards se mantienen al día sin consultas periódicas.
+"""
+import logging
+import threading
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_blog.metrics import CHANNEL_SEND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_GROUP = 'dashboard_users'
+
+
+def _get_publisher_settings():
+    websocket_settings = getattr(settings, 'WEBSOCKET_SETTINGS', {})
+    return (
+        websocket_settings.get('DASHBOARD_FLUSH_INTERVAL', 1.0),
+        websocket_settings.get('DASHBOARD_MAX_EVENTS', 20),
+    )
+
+
+class DashboardMetricsPublisher:
+    """
+    Agrupa y limita los deltas de métricas enviados a DashboardConsumer
+    """
+
+    _lock = threading.Lock()
+    _deltas = {}
+    _events = []
+    _refresh = False
+    _timer = None
+
+    @classmethod
+    def publish(cls, deltas=None, event=None):
+        """
+        Encolar un delta tras el commit de la transacción actual
+
+        Args:
+            deltas: Diccionario contador -> incremento (p. ej. {'total_posts': 1})
+            event: Evento compacto para el feed en vivo (opcional)
+        """
+        transaction.on_commit(lambda: cls._enqueue(deltas, event))
+
+    @classmethod
+    def request_refresh(cls):
+        """
+        Pedir a los dashboards que recarguen las estadísticas una vez
+
+        Se usa tras actualizaciones en lote (queryset.update) que no
+        disparan señales y por tanto no generan deltas exactos.
+        """
+        transaction.on_commit(lambda: cls._enqueue(refresh=True))
+
+    @classmethod
+    def _enqueue(cls, deltas=None, event=None, refresh=False):
+        interval, max_events = _get_publisher_settings()
+        with cls._lock:
+            for key, value in (deltas or {}).items():
+                cls._deltas[key] = cls._deltas.get(key, 0) + value
+            if event:
+                cls._events.append(event)
+                del cls._events[:-max_events]
+            cls._refresh = cls._refresh or refresh
+
+            if cls._timer is None:
+                cls._timer = threading.Timer(interval, cls.flush)
+                cls._timer.daemon = True
+                cls._timer.start()
+
+    @classmethod
+    def flush(cls):
+        """Enviar los cambios acumulados en un único mensaje"""
+        with cls._lock:
+            if cls._timer is not None:
+                cls._timer.cancel()
+                cls._timer = None
+            deltas = {key: value for key, value in cls._deltas.items() if value}
+            events = cls._events
+            refresh = cls._refresh
+            cls._deltas = {}
+            cls._events = []
+            cls._refresh = False
+
+        if not deltas and not events and not refresh:
+            return
+
+        channel_layer = get_channel_layer()
+        if not channel_layer:
+            return
+
+        try:
+            with CHANNEL_SEND_LATENCY.time('dashboard'):
+                async_to_sync(channel_layer.group_send)(
+                    DASHBOARD_GROUP,
+                    {
+                        'type': 'dashboard_update',
+                        'data': {
+                            'deltas': deltas,
+                            'events': events,
+                            'refresh': refresh,
+                            'timestamp': timezone.now().isoformat(),
+                        }
+                    }
+                )
+        except Exception as e:
+            logger.error(f"Error publicando métricas del dashboard: {str(e)}")
+
+
+def post_status_deltas(status, sign=1):
+    """Deltas de contadores para un post con el estado dado"""
+    deltas = {}
+    if status == 'published':
+        deltas['published_posts'] = sign
+    elif status == 'draft':
+        deltas['draft_posts'] = sign
+    return deltas
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
+from accounts.permissions import get_effective_permissions
 from posts.models import Post, Categoria, Comentario
 from .models import DashboardPermission, ActivityLog
 
@@ -184,11 +185,7 @@ class DashboardPostDetailSerializer(serializers.ModelSerializer):
             return True
         
         # Usuarios con permisos de gestión pueden editar cualquier post
-        try:
-            return (request.user.is_superuser or 
-                   request.user.dashboard_permission.can_manage_posts)
-        except:
-            return False
+        return get_effective_permissions(request.user).has('dashboard.manage_posts')
 
 
 class BulkPostActionSerializer(serializers.Serializer):
@@ -4,7 +4,10 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 from posts.models import Post, Comentario
-from .models import DashboardPermission
+from accounts.audit import audit_logs_flushed
+from accounts.permissions import invalidate_user_permissions
+from .models import ActivityLog, DashboardPermission
+from .realtime import DashboardMetricsPublisher, post_status_deltas
 from .utils import log_activity
 
 
@@ -15,6 +18,100 @@ def create_dashboard_permission(sender, instance, created, **kwargs):
         DashboardPermission.objects.get_or_create(user=instance)
 
 
+@receiver([post_save, post_delete], sender=DashboardPermission)
+def invalidate_dashboard_permission(sender, instance, **kwargs):
+    """Invalidar los permisos efectivos en caché del usuario"""
+    invalidate_user_permissions(instance.user_id)
+
+
+# ============================================================================
+# MÉTRICAS EN VIVO
+# ============================================================================
+
+@receiver(audit_logs_flushed, sender=ActivityLog)
+def publish_logged_activities(sender, instances, **kwargs):
+    """Enviar al feed en vivo las actividades de un lote ya guardado"""
+    usernames = dict(User.objects.filter(
+        pk__in={activity.user_id for activity in instances}
+    ).values_list('pk', 'username'))
+    for activity in instances:
+        DashboardMetricsPublisher.publish(event={
+            'type': 'activity_logged',
+            'id': activity.id,
+            'user': usernames.get(activity.user_id),
+            'action': activity.action,
+            'description': activity.description,
+            'timestamp': activity.timestamp.isoformat(),
+        })
+
+
+@receiver(post_save, sender=User)
+def publish_user_registered(sender, instance, created, **kwargs):
+    """Publicar el alta de usuarios a los dashboards abiertos"""
+    if created:
+        DashboardMetricsPublisher.publish(
+            deltas={'total_users': 1},
+            event={'type': 'user_registered', 'id': instance.id, 'username': instance.username}
+        )
+
+
+@receiver(post_save, sender=Post)
+def publish_post_metrics(sender, instance, created, **kwargs):
+    """Publicar cambios en los contadores de posts"""
+    if created:
+        deltas = post_status_deltas(instance.status)
+        deltas['total_posts'] = 1
+    else:
+        # Estado leído de la base de datos (Post.from_db); se actualiza
+        # después de post_save, así que aquí sigue siendo el anterior
+        previous_status = getattr(instance, '_loaded_status', instance.status)
+        if previous_status == instance.status:
+            return
+        deltas = post_status_deltas(previous_status, -1)
+        deltas.update(post_status_deltas(instance.status))
+    
+    event = None
+    if instance.status == 'published':
+        event = {'type': 'post_published', 'id': instance.id, 'title': instance.titulo}
+    DashboardMetricsPublisher.publish(deltas=deltas, event=event)
+
+
+@receiver(post_delete, sender=Post)
+def publish_post_deleted(sender, instance, **kwargs):
+    """Publicar la eliminación de posts"""
+    deltas = post_status_deltas(instance.status, -1)
+    deltas['total_posts'] = -1
+    DashboardMetricsPublisher.publish(deltas=deltas)
+
+
+@receiver(post_save, sender=Comentario)
+def publish_comment_metrics(sender, instance, created, **kwargs):
+    """Publicar cambios en los contadores de comentarios"""
+    if created:
+        deltas = {'total_comments': 1}
+        event = None
+        if not instance.approved:
+            deltas['pending_comments'] = 1
+            event = {'type': 'comment_pending', 'id': instance.id, 'post_id': instance.post_id}
+        DashboardMetricsPublisher.publish(deltas=deltas, event=event)
+        return
+    
+    previous_approved = getattr(instance, '_loaded_approved', instance.approved)
+    if previous_approved != instance.approved:
+        DashboardMetricsPublisher.publish(
+            deltas={'pending_comments': -1 if instance.approved else 1}
+        )
+
+
+@receiver(post_delete, sender=Comentario)
+def publish_comment_deleted(sender, instance, **kwargs):
+    """Publicar la eliminación de comentarios"""
+    deltas = {'total_comments': -1}
+    if not instance.approved:
+        deltas['pending_comments'] = -1
+    DashboardMetricsPublisher.publish(deltas=deltas)
+
+
 @receiver(post_save, sender=Post)
 def log_post_activity(sender, instance, created, **kwargs):
     """Registrar actividad cuando se crea o actualiza un post"""
@@ -1,8 +1,15 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from accounts.audit import flush_audit_logs
 
 User = get_user_model()
+from posts.models import Post, Comentario
 from .models import DashboardPermission, ActivityLog
+from .realtime import DASHBOARD_GROUP, DashboardMetricsPublisher
 from .utils import log_activity, get_dashboard_stats, create_dashboard_admin_user
 
 
@@ -38,13 +45,15 @@ class ActivityLogTestCase(TestCase):
     
     def test_log_activity(self):
         """Test que se puede registrar actividad correctamente"""
-        log_activity(
-            user=self.user,
-            action='created_post',
-            target_model='Post',
-            target_id=1,
-            description='Test post created'
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            log_activity(
+                user=self.user,
+                action='created_post',
+                target_model='Post',
+                target_id=1,
+                description='Test post created'
+            )
+        flush_audit_logs()
         
         log = ActivityLog.objects.get(user=self.user)
         self.assertEqual(log.action, 'created_post')
@@ -88,4 +97,92 @@ class DashboardUtilsTestCase(TestCase):
         ]
         
         for key in required_keys:
-            self.assertIn(key, stats)
\ No newline at end of file
+            self.assertIn(key, stats)
+
+
+class DashboardMetricsPublisherTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        DashboardMetricsPublisher.flush()
+        self.channel_layer = get_channel_layer()
+        self.channel_name = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(DASHBOARD_GROUP, self.channel_name)
+    
+    def tearDown(self):
+        async_to_sync(self.channel_layer.group_discard)(DASHBOARD_GROUP, self.channel_name)
+    
+    def receive_update(self):
+        DashboardMetricsPublisher.flush()
+        message = async_to_sync(self.channel_layer.receive)(self.channel_name)
+        self.assertEqual(message['type'], 'dashboard_update')
+        return message['data']
+    
+    def test_post_and_comment_changes_are_batched(self):
+        """Test los cambios se agrupan en un único mensaje con deltas"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                titulo='Post en vivo',
+                contenido='Contenido',
+                autor=self.user,
+                status='draft'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'published'
+            post.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Comentario.objects.create(
+                post=post,
+                usuario=self.user,
+                contenido='Comentario',
+                approved=False
+            )
+        
+        data = self.receive_update()
+        self.assertEqual(data['deltas'], {
+            'total_posts': 1,
+            'published_posts': 1,
+            'total_comments': 1,
+            'pending_comments': 1,
+        })
+        event_types = [event['type'] for event in data['events']]
+        self.assertIn('post_published', event_types)
+        self.assertIn('comment_pending', event_types)
+        self.assertFalse(data['refresh'])
+    
+    def test_changes_on_loaded_instances_skip_extra_queries(self):
+        """Test los deltas usan el estado leído, sin consultar antes de guardar"""
+        post = Post.objects.create(titulo='Post cargado', contenido='Contenido', autor=self.user)
+        comment = Comentario.objects.create(post=post, usuario=self.user, contenido='Comentario')
+        post = Post.objects.get(pk=post.pk)
+        comment = Comentario.objects.get(pk=comment.pk)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                post.status = 'draft'
+                post.save()
+                comment.approved = False
+                comment.save()
+                # Guardar otra vez sin cambios no genera deltas
+                comment.save()
+        
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in selects if 'FROM "posts_post" ' in sql or 'FROM "posts_comentario" ' in sql])
+        data = self.receive_update()
+        self.assertEqual(data['deltas'], {
+            'published_posts': -1,
+            'draft_posts': 1,
+            'pending_comments': 1,
+        })
+    
+    def test_bulk_update_requests_refresh(self):
+        """Test las actualizaciones en lote piden recargar las estadísticas"""
+        with self.captureOnCommitCallbacks(execute=True):
+            DashboardMetricsPublisher.request_refresh()
+        
+        data = self.receive_update()
+        self.assertTrue(data['refresh'])
+        self.assertEqual(data['deltas'], {})
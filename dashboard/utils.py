@@ -4,21 +4,12 @@ User = get_user_model()
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+from accounts.audit import record_audit_event
+from django_blog.client_ip import get_client_ip
+from accounts.permissions import get_effective_permissions
 from posts.models import Post, Comentario
 from .models import ActivityLog
-
-
-def get_client_ip(request):
-    """Obtener la IP del cliente"""
-    if not request or not hasattr(request, 'META'):
-        return '127.0.0.1'  # IP por defecto para pruebas
-    
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '127.0.0.1')
-    return ip
+from .realtime import DashboardMetricsPublisher
 
 
 def log_activity(user, action, target_model=None, target_id=None, description='', request=None):
@@ -33,21 +24,19 @@ def log_activity(user, action, target_model=None, target_id=None, description=''
         if hasattr(request, 'META'):
             user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]  # Limitar longitud
     
-    try:
-        ActivityLog.objects.create(
-            user=user,
-            action=action,
-            target_model=target_model or '',
-            target_id=target_id,
-            description=description[:1000] if description else '',  # Limitar longitud de descripción
-            ip_address=ip_address or '127.0.0.1',
-            user_agent=user_agent or 'Unknown'
-        )
-    except Exception as e:
-        # Si falla el logging, no debe interrumpir la operación principal
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error logging activity: {str(e)}")
+    # Se escribe en lote fuera de la petición (accounts.audit); el feed en
+    # vivo se notifica al guardarse (dashboard.signals)
+    record_audit_event(
+        ActivityLog,
+        user_id=user.pk,
+        action=action,
+        target_model=target_model or '',
+        target_id=target_id,
+        description=description[:1000] if description else '',  # Limitar longitud de descripción
+        ip_address=ip_address or '127.0.0.1',
+        user_agent=user_agent or 'Unknown',
+        timestamp=timezone.now()
+    )
 
 
 def validate_dashboard_access(user):
@@ -63,22 +52,9 @@ def validate_dashboard_access(user):
     if user.is_superuser:
         return True, "Superusuario"
     
-    try:
-        dashboard_permission = user.dashboard_permission
-        has_access = (
-            dashboard_permission.can_view_stats or
-            dashboard_permission.can_manage_posts or
-            dashboard_permission.can_manage_users or
-            dashboard_permission.can_manage_comments
-        )
-        
-        if has_access:
-            return True, "Usuario con permisos de dashboard"
-        else:
-            return False, "Sin permisos de dashboard"
-            
-    except Exception:
-        return False, "Permisos de dashboard no encontrados"
+    if get_effective_permissions(user).dashboard_access:
+        return True, "Usuario con permisos de dashboard"
+    return False, "Sin permisos de dashboard"
 
 
 def check_specific_permission(user, permission_type):
@@ -91,19 +67,7 @@ def check_specific_permission(user, permission_type):
     if user.is_superuser:
         return True
     
-    try:
-        dashboard_permission = user.dashboard_permission
-        permission_map = {
-            'manage_posts': dashboard_permission.can_manage_posts,
-            'manage_users': dashboard_permission.can_manage_users,
-            'manage_comments': dashboard_permission.can_manage_comments,
-            'view_stats': dashboard_permission.can_view_stats,
-        }
-        
-        return permission_map.get(permission_type, False)
-        
-    except Exception:
-        return False
+    return get_effective_permissions(user).has(f'dashboard.{permission_type}')
 
 
 def get_user_dashboard_permissions(user):
@@ -122,17 +86,17 @@ def get_user_dashboard_permissions(user):
             'is_superuser': True
         }
     
-    try:
-        dashboard_permission = user.dashboard_permission
-        return {
-            'manage_posts': dashboard_permission.can_manage_posts,
-            'manage_users': dashboard_permission.can_manage_users,
-            'manage_comments': dashboard_permission.can_manage_comments,
-            'view_stats': dashboard_permission.can_view_stats,
-            'is_superuser': False
-        }
-    except Exception:
+    permissions = get_effective_permissions(user)
+    if not permissions.codenames:
         return None
+    flags = permissions.dashboard_flags()
+    return {
+        'manage_posts': flags['can_manage_posts'],
+        'manage_users': flags['can_manage_users'],
+        'manage_comments': flags['can_manage_comments'],
+        'view_stats': flags['can_view_stats'],
+        'is_superuser': False
+    }
 
 
 def validate_password_strength(password):
@@ -420,6 +384,7 @@ def bulk_update_post_status(post_ids, new_status, user):
     """
     posts = Post.objects.filter(id__in=post_ids)
     updated_count = posts.update(status=new_status)
+    DashboardMetricsPublisher.request_refresh()
     
     # Registrar la actividad
     log_activity(
@@ -437,6 +402,7 @@ def bulk_approve_comments(comment_ids, user):
     """
     comments = Comentario.objects.filter(id__in=comment_ids)
     updated_count = comments.update(approved=True)
+    DashboardMetricsPublisher.request_refresh()
     
     # Registrar la actividad
     log_activity(
@@ -454,6 +420,7 @@ def bulk_reject_comments(comment_ids, user):
     """
     comments = Comentario.objects.filter(id__in=comment_ids)
     updated_count = comments.update(approved=False)
+    DashboardMetricsPublisher.request_refresh()
     
     # Registrar la actividad
     log_activity(
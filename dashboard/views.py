@@ -3,7 +3,8 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.authentication import get_cached_user, invalidate_cached_user
+from accounts.tokens import UserClaimsRefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import authenticate
@@ -21,6 +22,7 @@ from .serializers import (
     DashboardUserSerializer, DashboardPostCreateUpdateSerializer
 )
 from .utils import log_activity, get_client_ip, get_dashboard_stats, get_top_performing_content
+from .realtime import DashboardMetricsPublisher
 from .api_utils import DashboardResponse
 from django_blog.api_utils import DashboardAPIResponse, BaseDashboardAPIView, HTTPStatus, ErrorMessages
 from django_blog.pagination import DashboardPagination
@@ -79,7 +81,7 @@ class DashboardTokenObtainPairView(TokenObtainPairView):
             return DashboardAPIResponse.permission_denied('No tienes permisos para acceder al dashboard')
         
         # Generar tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         access_token = refresh.access_token
         
         # Actualizar last_login
@@ -126,12 +128,14 @@ class DashboardTokenRefreshView(BaseDashboardAPIView):
         
         try:
             # Validar y refrescar el token
-            refresh = RefreshToken(refresh_token)
+            refresh = UserClaimsRefreshToken(refresh_token)
             user_id = refresh.payload.get('user_id')
             
             # Verificar que el usuario existe y está activo
             try:
-                user = User.objects.get(id=user_id)
+                user = get_cached_user(user_id, refresh.payload.get('exp'))
+                if user is None:
+                    raise User.DoesNotExist
                 if not user.is_active:
                     return self.unauthorized_response('Usuario desactivado')
                 
@@ -197,7 +201,7 @@ class DashboardLogoutView(BaseDashboardAPIView):
             # Intentar hacer blacklist del refresh token
             if refresh_token:
                 try:
-                    token = RefreshToken(refresh_token)
+                    token = UserClaimsRefreshToken(refresh_token)
                     token.blacklist()
                 except TokenError:
                     # Token ya está en blacklist o es inválido
@@ -1463,6 +1467,8 @@ class DashboardUserViewSet(viewsets.ModelViewSet):
         try:
             users = User.objects.filter(id__in=user_ids)
             updated_count = users.update(is_active=True)
+            # update() no dispara señales: invalidar los usuarios en caché
+            invalidate_cached_user(*user_ids)
             usernames = [user.username for user in users]
             
             # Registrar actividad
@@ -1507,6 +1513,8 @@ class DashboardUserViewSet(viewsets.ModelViewSet):
             )
             
             updated_count = users.update(is_active=False)
+            # update() no dispara señales: invalidar los usuarios en caché
+            invalidate_cached_user(*user_ids)
             usernames = [user.username for user in users]
             
             # Registrar actividad
@@ -2264,6 +2272,9 @@ class DashboardPostViewSet(viewsets.ModelViewSet):
                     status_code=HTTPStatus.BAD_REQUEST
                 )
             
+            # queryset.update() no dispara señales: pedir recarga de métricas
+            DashboardMetricsPublisher.request_refresh()
+            
             # Registrar actividad
             log_activity(
                 user=request.user,
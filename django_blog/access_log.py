@@ -0,0 +1,141 @@
+"""
+Structured access log
+
+``RequestLoggingMiddleware`` writes one JSON line per request to the
+``django_blog.access`` logger. Nothing is built unless the logger is
+enabled for INFO and the request is sampled (``ACCESS_LOG['SAMPLE_RATE']``);
+errors and slow requests are always logged.
+
+``QueuedFileHandler`` keeps file I/O off the request thread: records are
+put on a bounded queue and formatted and written by a listener thread.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from django.conf import settings
+from .client_ip import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+
+def get_access_log_settings():
+    return getattr(settings, 'ACCESS_LOG', {})
+
+
+class JSONMessage:
+    """Log message argument serialised only when a handler formats it"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return json.dumps(self.data, separators=(',', ':'), default=str)
+
+
+def should_log(status_code, duration_ms, access_settings=None):
+    """
+    Sampling decision for one request
+
+    Args:
+        status_code: Response status
+        duration_ms: Request duration in milliseconds
+        access_settings: ACCESS_LOG settings (read when omitted)
+
+    Returns:
+        True if the request must be logged
+    """
+    if access_settings is None:
+        access_settings = get_access_log_settings()
+    if status_code >= 400 or duration_ms >= access_settings.get('SLOW_REQUEST_MS', 1000):
+        return True
+    sample_rate = access_settings.get('SAMPLE_RATE', 1.0)
+    return sample_rate >= 1.0 or random.random() < sample_rate
+
+
+def build_access_record(request, response, duration_ms):
+    """One access log record (a plain dict, serialised by the handler)"""
+    match = getattr(request, 'resolver_match', None)
+    user = getattr(request, 'user', None)
+    if response.has_header('Content-Length'):
+        size = int(response['Content-Length'])
+    elif not response.streaming:
+        size = len(response.content)
+    else:
+        size = None
+    return {
+        'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'method': request.method,
+        'path': request.path,
+        'route': match.route if match else None,
+        'status': response.status_code,
+        'duration_ms': round(duration_ms, 2),
+        'bytes': size,
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        'ip': get_client_ip(request),
+    }
+
+
+class QueuedFileHandler(logging.handlers.QueueHandler):
+    """
+    File handler writing from a background thread
+
+    Records are queued as-is and formatted by the listener thread, so the
+    caller only pays for ``put_nowait``. When the queue is full records are
+    dropped (and counted) rather than blocking requests.
+
+    Args:
+        filename: Log file path
+        max_queue_size: Records buffered before dropping
+    """
+
+    def __init__(self, filename, max_queue_size=10000):
+        super().__init__(queue.Queue(max_queue_size))
+        self.target = logging.FileHandler(filename, delay=True)
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Formatting happens in the listener thread
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        # Started lazily, and again in forked workers: threads do not survive fork
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.listener = logging.handlers.QueueListener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def flush(self):
+        """Wait until queued records are written"""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+        self.target.flush()
+
+    def close(self):
+        self.flush()
+        self.target.close()
+        super().close()
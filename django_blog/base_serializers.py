@@ -7,16 +7,27 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django_blog.api_utils import ErrorMessages
+from media_files.renditions import serialize_renditions
 import re
 
 User = get_user_model()
 
 
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+DANGEROUS_PATTERNS_RE = re.compile(
+    r'<script[^>]*>.*?</script>|javascript:|vbscript:|onload\s*=|onerror\s*=|onclick\s*=',
+    re.IGNORECASE | re.DOTALL
+)
+
+
 class BaseModelSerializer(serializers.ModelSerializer):
     """
     Base serializer with common functionality and validation
     """
     
+    # Rich-text fields sanitized by their renderer instead of the regexes below
+    html_fields = []
+    
     def validate(self, attrs):
         """Base validation with common checks"""
         attrs = super().validate(attrs)
@@ -30,7 +41,7 @@ class BaseModelSerializer(serializers.ModelSerializer):
         # Validate text fields for XSS and basic security
         text_fields = ['titulo', 'title', 'nombre', 'name', 'contenido', 'content']
         for field in text_fields:
-            if field in attrs and attrs[field]:
+            if field in attrs and attrs[field] and field not in self.html_fields:
                 attrs[field] = self._sanitize_text(attrs[field])
         
         return attrs
@@ -41,21 +52,10 @@ class BaseModelSerializer(serializers.ModelSerializer):
             return text
         
         # Remove null bytes and control characters
-        import re
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', str(text))
+        text = CONTROL_CHARS_RE.sub('', str(text))
         
         # Basic XSS protection for non-HTML fields
-        dangerous_patterns = [
-            r'<script[^>]*>.*?</script>',
-            r'javascript:',
-            r'vbscript:',
-            r'onload\s*=',
-            r'onerror\s*=',
-            r'onclick\s*='
-        ]
-        
-        for pattern in dangerous_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+        text = DANGEROUS_PATTERNS_RE.sub('', text)
         
         return text.strip()
     
@@ -183,6 +183,7 @@ class PostBasicSerializer(BaseModelSerializer, TimestampedSerializer):
     reading_time = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
     is_featured = serializers.BooleanField(source='featured', read_only=True)
     published_at = serializers.DateTimeField(source='fecha_publicacion', read_only=True)
     
@@ -190,11 +191,11 @@ class PostBasicSerializer(BaseModelSerializer, TimestampedSerializer):
         model = None  # Will be set by subclasses
         fields = [
             'id', 'titulo', 'slug', 'excerpt', 'author',
-            'image_url', 'is_featured', 'status', 'published_at',
+            'image_url', 'image_renditions', 'is_featured', 'status', 'published_at',
             'reading_time', 'comments_count', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'slug', 'excerpt', 'author', 'image_url',
+            'id', 'slug', 'excerpt', 'author', 'image_url', 'image_renditions',
             'reading_time', 'comments_count', 'created_at', 'updated_at'
         ]
         abstract = True
@@ -243,6 +244,10 @@ class PostBasicSerializer(BaseModelSerializer, TimestampedSerializer):
         if obj.imagen:
             return obj.imagen.url
         return None
+    
+    def get_image_renditions(self, obj):
+        """Get srcset-ready resized versions of the post image"""
+        return serialize_renditions(getattr(obj, 'imagen_renditions', None))
 
 
 class CommentBasicSerializer(BaseModelSerializer, TimestampedSerializer):
@@ -0,0 +1,56 @@
+"""
+Shared cache helpers
+
+Presence, the notification replay log, the JWT caches and the rate limiter
+keep state in the default cache that every process (gunicorn workers, the
+ASGI server, the media worker) must see. ``SHARED_CACHE_REQUIRED`` is True
+unless the whole site runs in one process (the development server).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+# Backends whose entries only exist inside the process that wrote them
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias='default'):
+    """True if the cache is visible to every process"""
+    backend = type(caches[alias])
+    return f'{backend.__module__}.{backend.__qualname__}' not in PROCESS_LOCAL_BACKENDS
+
+
+def cache_state_is_reliable(alias='default'):
+    """
+    Whether cache-held state written by other processes can be trusted
+
+    Returns:
+        True for a shared cache, or for a process-local cache when the site
+        runs in a single process (``SHARED_CACHE_REQUIRED = False``)
+    """
+    return is_shared_cache(alias) or not getattr(settings, 'SHARED_CACHE_REQUIRED', True)
+
+
+def require_shared_cache(feature, alias='default'):
+    """
+    Refuse to start a feature that needs cross-process cache state without it
+
+    Args:
+        feature: Name of the feature, used in the error message
+        alias: Cache alias the feature uses
+
+    Raises:
+        ImproperlyConfigured: If SHARED_CACHE_REQUIRED is set and the cache
+            is process-local
+    """
+    if not cache_state_is_reliable(alias):
+        backend = type(caches[alias])
+        raise ImproperlyConfigured(
+            f"{feature} needs a cache shared by every process, but CACHES['{alias}'] "
+            f"uses {backend.__module__}.{backend.__qualname__}. Configure a shared backend "
+            f"(e.g. RedisCache via REDIS_URL) or set SHARED_CACHE_REQUIRED = False for a "
+            f"single-process deployment."
+        )
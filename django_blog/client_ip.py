@@ -0,0 +1,46 @@
+"""
+Client IP resolution
+
+``X-Forwarded-For`` is sent by the client and can hold anything; only the
+entries appended by our own reverse proxies are trustworthy. Each proxy
+appends the address it received the connection from, so with
+``TRUSTED_PROXY_COUNT`` proxies in front of the application the client is
+the N-th entry from the right. With no proxies (the default) the header is
+ignored and ``REMOTE_ADDR`` is used.
+"""
+from django.conf import settings
+
+DEFAULT_CLIENT_IP = '127.0.0.1'
+
+
+def get_trusted_proxy_count():
+    return getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+
+
+def get_client_ip(request):
+    """
+    Get the client IP address, honouring only trusted proxies
+
+    Args:
+        request: Django request (None in tests and background jobs)
+
+    Returns:
+        Client IP address
+    """
+    if request is None or not hasattr(request, 'META'):
+        return DEFAULT_CLIENT_IP
+
+    remote_addr = request.META.get('REMOTE_ADDR') or DEFAULT_CLIENT_IP
+    proxies = get_trusted_proxy_count()
+    if not proxies:
+        return remote_addr
+
+    forwarded = [
+        address.strip()
+        for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+        if address.strip()
+    ]
+    if not forwarded:
+        return remote_addr
+    # Fewer entries than proxies: the furthest hop our proxies recorded
+    return forwarded[-min(proxies, len(forwarded))]
@@ -1,31 +1,81 @@
 """
 Custom CORS middleware for enhanced CORS handling
 Provides more granular control over CORS policies for different endpoints
+
+Policies are compiled into ready-to-send header tuples at startup and
+origin decisions are kept in a bounded LRU (CORS_DECISION_CACHE_SIZE), so
+a request only costs a prefix check, a cache lookup and a few header
+assignments. Preflight requests are answered here, before the view stack.
 """
 
 import re
+from functools import lru_cache
 from django.conf import settings
 from django.http import HttpResponse
 from django.utils.deprecation import MiddlewareMixin
-from django.urls import resolve, Resolver404
 import logging
 
 logger = logging.getLogger(__name__)
 
+PREFLIGHT_VARY = 'Origin, Access-Control-Request-Method, Access-Control-Request-Headers'
+
+
+class CompiledCORSPolicy:
+    """
+    Header tuples of one CORS policy, built once at startup
+    """
+    
+    def __init__(self, name, policy):
+        self.name = name
+        self.allowed_headers = frozenset(header.lower() for header in policy['allow_headers'])
+        self.default_allow_headers = ', '.join(policy['allow_headers'])
+        
+        credentials = (('Access-Control-Allow-Credentials', 'true'),) if policy['allow_credentials'] else ()
+        expose = ((
+            ('Access-Control-Expose-Headers', ', '.join(policy['expose_headers'])),
+        ) if policy['expose_headers'] else ())
+        
+        # Access-Control-Allow-Origin and Vary are set per request
+        self.response_headers = credentials + expose
+        self.preflight_headers = credentials + (
+            ('Access-Control-Allow-Methods', ', '.join(policy['allow_methods'])),
+            ('Access-Control-Max-Age', str(policy['max_age'])),
+            ('Vary', PREFLIGHT_VARY),
+        )
+        self.allow_headers_for = lru_cache(maxsize=128)(self._allow_headers_for)
+    
+    def _allow_headers_for(self, requested_headers):
+        """Access-Control-Allow-Headers for an Access-Control-Request-Headers value"""
+        if not requested_headers:
+            return self.default_allow_headers
+        
+        # Allow requested headers that are in our allowed list
+        allowed_requested_headers = [
+            header for header in (h.strip().lower() for h in requested_headers.split(','))
+            if header in self.allowed_headers
+        ]
+        # Fallback to default allowed headers
+        return ', '.join(allowed_requested_headers) or self.default_allow_headers
+
+
 class EnhancedCORSMiddleware(MiddlewareMixin):
     """
     Enhanced CORS middleware with endpoint-specific policies
+    
+    Put it first in MIDDLEWARE so preflight responses skip everything else.
     """
     
+    # (path prefix, policy) pairs, first match wins; otherwise 'default'
+    POLICY_PREFIXES = (
+        ('/api/v1/dashboard/', 'dashboard'),
+        ('/api/v1/users/auth/', 'auth'),
+        ('/api/', 'api'),
+        ('/media/', 'media'),
+    )
+    
     def __init__(self, get_response):
         self.get_response = get_response
         
-        # Compile regex patterns for better performance
-        self.api_pattern = re.compile(r'^/api/')
-        self.dashboard_pattern = re.compile(r'^/api/v1/dashboard/')
-        self.auth_pattern = re.compile(r'^/api/v1/users/auth/')
-        self.media_pattern = re.compile(r'^/media/')
-        
         # CORS policies for different endpoint types
         self.cors_policies = {
             'api': {
@@ -77,6 +127,20 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
                 'allow_methods': ['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'HEAD']
             }
         }
+        self.compiled_policies = {
+            name: CompiledCORSPolicy(name, policy) for name, policy in self.cors_policies.items()
+        }
+        
+        # Origin settings are read once; the decision only depends on the origin
+        self.allow_all_origins = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False)
+        self.allowed_origins = frozenset(getattr(settings, 'CORS_ALLOWED_ORIGINS', []))
+        self.allowed_origin_regexes = tuple(
+            re.compile(pattern) for pattern in getattr(settings, 'CORS_ALLOWED_ORIGIN_REGEXES', [])
+        )
+        self.allow_local_origins = settings.DEBUG
+        self.origin_decision = lru_cache(
+            maxsize=getattr(settings, 'CORS_DECISION_CACHE_SIZE', 1024)
+        )(self._check_origin)
         
         super().__init__(get_response)
     
@@ -85,17 +149,10 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         Determine the appropriate CORS policy based on the request path
         """
         path = request.path
-        
-        if self.dashboard_pattern.match(path):
-            return 'dashboard'
-        elif self.auth_pattern.match(path):
-            return 'auth'
-        elif self.api_pattern.match(path):
-            return 'api'
-        elif self.media_pattern.match(path):
-            return 'media'
-        else:
-            return 'default'
+        for prefix, policy_type in self.POLICY_PREFIXES:
+            if path.startswith(prefix):
+                return policy_type
+        return 'default'
     
     def is_origin_allowed(self, origin, policy_type):
         """
@@ -103,24 +160,24 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         """
         if not origin:
             return False
-        
+        return self.origin_decision(origin)
+    
+    def _check_origin(self, origin):
         # In development, allow all origins if configured
-        if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        if self.allow_all_origins:
             return True
         
         # Check against allowed origins
-        allowed_origins = getattr(settings, 'CORS_ALLOWED_ORIGINS', [])
-        if origin in allowed_origins:
+        if origin in self.allowed_origins:
             return True
         
         # Check against regex patterns if configured
-        allowed_regexes = getattr(settings, 'CORS_ALLOWED_ORIGIN_REGEXES', [])
-        for regex_pattern in allowed_regexes:
-            if re.match(regex_pattern, origin):
+        for regex in self.allowed_origin_regexes:
+            if regex.match(origin):
                 return True
         
         # Special handling for localhost in development
-        if settings.DEBUG and ('localhost' in origin or '127.0.0.1' in origin):
+        if self.allow_local_origins and ('localhost' in origin or '127.0.0.1' in origin):
             return True
         
         return False
@@ -130,7 +187,6 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         Add CORS headers to the response based on the policy type
         """
         origin = request.META.get('HTTP_ORIGIN')
-        policy = self.cors_policies[policy_type]
         
         # Check if origin is allowed
         if not self.is_origin_allowed(origin, policy_type):
@@ -139,13 +195,8 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         
         # Add CORS headers
         response['Access-Control-Allow-Origin'] = origin
-        
-        if policy['allow_credentials']:
-            response['Access-Control-Allow-Credentials'] = 'true'
-        
-        # Add exposed headers
-        if policy['expose_headers']:
-            response['Access-Control-Expose-Headers'] = ', '.join(policy['expose_headers'])
+        for header, value in self.compiled_policies[policy_type].response_headers:
+            response[header] = value
         
         # Add Vary header to indicate that the response varies by Origin
         vary_header = response.get('Vary', '')
@@ -159,7 +210,7 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         Handle CORS preflight requests
         """
         origin = request.META.get('HTTP_ORIGIN')
-        policy = self.cors_policies[policy_type]
+        policy = self.compiled_policies[policy_type]
         
         # Check if origin is allowed
         if not self.is_origin_allowed(origin, policy_type):
@@ -169,39 +220,11 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         # Create preflight response
         response = HttpResponse(status=200)
         response['Access-Control-Allow-Origin'] = origin
-        
-        if policy['allow_credentials']:
-            response['Access-Control-Allow-Credentials'] = 'true'
-        
-        # Add allowed methods
-        response['Access-Control-Allow-Methods'] = ', '.join(policy['allow_methods'])
-        
-        # Add allowed headers
-        requested_headers = request.META.get('HTTP_ACCESS_CONTROL_REQUEST_HEADERS', '')
-        if requested_headers:
-            # Check if requested headers are allowed
-            requested_headers_list = [h.strip().lower() for h in requested_headers.split(',')]
-            allowed_headers_lower = [h.lower() for h in policy['allow_headers']]
-            
-            # Allow requested headers that are in our allowed list
-            allowed_requested_headers = [
-                h for h in requested_headers_list 
-                if h in allowed_headers_lower
-            ]
-            
-            if allowed_requested_headers:
-                response['Access-Control-Allow-Headers'] = ', '.join(allowed_requested_headers)
-            else:
-                # Fallback to default allowed headers
-                response['Access-Control-Allow-Headers'] = ', '.join(policy['allow_headers'])
-        else:
-            response['Access-Control-Allow-Headers'] = ', '.join(policy['allow_headers'])
-        
-        # Add max age
-        response['Access-Control-Max-Age'] = str(policy['max_age'])
-        
-        # Add Vary header
-        response['Vary'] = 'Origin, Access-Control-Request-Method, Access-Control-Request-Headers'
+        for header, value in policy.preflight_headers:
+            response[header] = value
+        response['Access-Control-Allow-Headers'] = policy.allow_headers_for(
+            request.META.get('HTTP_ACCESS_CONTROL_REQUEST_HEADERS', '')
+        )
         
         logger.debug(f"CORS Preflight handled for {origin} with policy '{policy_type}'")
         return response
@@ -221,6 +244,7 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         if request.method == 'OPTIONS':
             # Check if this is a CORS preflight request
             if request.META.get('HTTP_ACCESS_CONTROL_REQUEST_METHOD'):
+                request._cors_preflight = True
                 return self.handle_preflight(request, policy_type)
         
         # Store policy type for response processing
@@ -236,6 +260,10 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         if not request.META.get('HTTP_ORIGIN'):
             return response
         
+        # Preflight responses are complete
+        if getattr(request, '_cors_preflight', False):
+            return response
+        
         # Get policy type from request (set in process_request)
         policy_type = getattr(request, '_cors_policy_type', 'default')
         
@@ -247,4 +275,4 @@ class EnhancedCORSMiddleware(MiddlewareMixin):
         Handle exceptions and ensure CORS headers are still added
         """
         # This ensures CORS headers are added even when exceptions occur
-        return None
\ No newline at end of file
+        return None
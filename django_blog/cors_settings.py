@@ -86,6 +86,7 @@ def configure_cors():
         'x-forwarded-for',
         'x-forwarded-proto',
         'x-forwarded-host',
+        'x-profile',
         'x-real-ip',
         
         # Caching and conditional request headers
@@ -233,6 +234,7 @@ def configure_cors():
         'x-query-count',
         'x-memory-usage',
         'x-execution-time',
+        'server-timing',
     ]
     
     # CORS regex patterns for dynamic subdomains
@@ -126,31 +126,26 @@ def validate_json_content_type(func):
 
 def rate_limit_by_user(max_requests=100, time_window=3600):
     """
-    Simple rate limiting decorator by user
+    Rate limiting decorator by user (sliding window, atomic counters)
     """
-    from django.core.cache import cache
+    from .ratelimit import check_rate_limit
     
     def decorator(func):
+        scope = f"view:{func.__module__}.{func.__name__}"
+        
         @functools.wraps(func)
         def wrapper(request, *args, **kwargs):
             if not request.user.is_authenticated:
                 return func(request, *args, **kwargs)
             
-            # Create cache key
-            cache_key = f"rate_limit_{request.user.id}_{func.__name__}"
-            
-            # Get current count
-            current_count = cache.get(cache_key, 0)
-            
-            if current_count >= max_requests:
-                return StandardAPIResponse.rate_limited(
+            result = check_rate_limit(scope, request.user.id, max_requests, time_window)
+            if not result.allowed:
+                response = StandardAPIResponse.rate_limited(
                     message=f"Rate limit exceeded. Max {max_requests} requests per {time_window} seconds"
                 )
+                return result.apply_headers(response)
             
-            # Increment counter
-            cache.set(cache_key, current_count + 1, time_window)
-            
-            return func(request, *args, **kwargs)
+            return result.apply_headers(func(request, *args, **kwargs))
         
         return wrapper
     return decorator
@@ -0,0 +1,454 @@
+"""
+In-process metrics in the Prometheus text format
+
+Metrics are module-level ``Counter``/``Gauge``/``Histogram`` objects
+recording into a process-wide registry: one dict update under a lock, so
+instrumented code pays microseconds.
+
+Multi-process (gunicorn workers, daphne, the media worker): when
+``METRICS['MULTIPROC_DIR']`` is set every process writes a snapshot of its
+registry to ``<dir>/metrics_<pid>.json`` at most every ``FLUSH_INTERVAL``
+seconds and at exit. ``/metrics`` merges the snapshots: counters and
+histograms are summed across all files, gauges only across live processes.
+Snapshots of finished processes are folded into ``aggregate.json`` and
+removed, so the directory does not grow with worker restarts and a reused
+pid never replaces the totals of the process that had it before. Without a
+directory ``/metrics`` reports the serving process alone.
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: development server only, one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_metrics_settings():
+    return getattr(settings, 'METRICS', {})
+
+
+class Registry:
+    """
+    Values of every metric of this process
+
+    ``_values`` maps ``(name, label values)`` to a number (counters,
+    gauges) or to ``[bucket counts, sum]`` (histograms).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._timer = None
+        self._snapshot_written = False
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add(self, name, labels, amount):
+        with self._lock:
+            key = (name, labels)
+            self._values[key] = self._values.get(key, 0) + amount
+        self._schedule_flush()
+
+    def set(self, name, labels, value):
+        with self._lock:
+            self._values[(name, labels)] = value
+        self._schedule_flush()
+
+    def observe(self, name, labels, index, value, bucket_count):
+        with self._lock:
+            entry = self._values.get((name, labels))
+            if entry is None:
+                entry = self._values[(name, labels)] = [[0] * (bucket_count + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+        self._schedule_flush()
+
+    def snapshot(self):
+        """JSON-serialisable copy of the values of this process"""
+        with self._lock:
+            samples = {}
+            for (name, labels), value in self._values.items():
+                if isinstance(value, list):
+                    value = [list(value[0]), value[1]]
+                samples.setdefault(name, []).append([list(labels), value])
+        return samples
+
+    def reset(self):
+        """Forget inherited values (forked worker)"""
+        self._lock = threading.Lock()
+        self._values = {}
+        self._timer = None
+        self._snapshot_written = False
+
+    # Multi-process snapshots
+
+    def _schedule_flush(self):
+        if self._timer is not None or not get_metrics_settings().get('MULTIPROC_DIR'):
+            return
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(get_metrics_settings().get('FLUSH_INTERVAL', 5.0), self.write_snapshot)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def write_snapshot(self):
+        """Write this process' values to the multi-process directory"""
+        self._timer = None
+        directory = get_metrics_settings().get('MULTIPROC_DIR')
+        if not directory:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = _snapshot_path(directory, os.getpid())
+            if not self._snapshot_written and os.path.exists(path):
+                # Left by a finished process with the same pid
+                with _directory_lock(directory):
+                    _fold_snapshots(directory, [path])
+            _write_json(directory, path, {'pid': os.getpid(), 'samples': self.snapshot()})
+            self._snapshot_written = True
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+
+registry = Registry()
+atexit.register(registry.write_snapshot)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        registry.add(self.name, labels, amount)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        registry.add(self.name, labels, amount)
+
+    def dec(self, *labels, amount=1):
+        registry.add(self.name, labels, -amount)
+
+    def set(self, value, *labels):
+        registry.set(self.name, labels, value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # Index len(buckets) is the +Inf bucket
+        index = bisect.bisect_left(self.buckets, value)
+        registry.observe(self.name, labels, index, value, len(self.buckets))
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+# ============================================================================
+# Application metrics
+# ============================================================================
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status')
+)
+DB_QUERIES = Counter('django_db_queries_total', 'Database queries executed by HTTP requests', ('route',))
+CACHE_REQUESTS = Counter('django_cache_requests_total', 'Default cache lookups by result', ('result',))
+WEBSOCKET_CONNECTIONS = Gauge('websocket_connections', 'Open WebSocket connections', ('consumer',))
+CHANNEL_SEND_LATENCY = Histogram(
+    'channel_layer_send_seconds', 'Channel layer group_send latency', ('source',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+NOTIFICATION_FANOUT = Histogram(
+    'notification_fanout_recipients', 'Recipients per group notification', ('group',),
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+)
+MEDIA_PROCESSING = Histogram(
+    'media_processing_seconds', 'Upload rendition processing time', ('kind', 'status'),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+
+def install_cache_metrics(cache_backend):
+    """Count hits and misses of a cache backend class (once per process)"""
+    backend_class = type(cache_backend)
+    if getattr(backend_class, '_metrics_installed', False):
+        return
+    original_get = backend_class.get
+    original_get_many = backend_class.get_many
+    missing = object()
+    in_get_many = threading.local()
+
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, missing, version=version)
+        if not getattr(in_get_many, 'active', False):
+            CACHE_REQUESTS.inc('miss' if value is missing else 'hit')
+        return default if value is missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        in_get_many.active = True
+        try:
+            values = original_get_many(self, keys, version=version)
+        finally:
+            in_get_many.active = False
+        if values:
+            CACHE_REQUESTS.inc('hit', amount=len(values))
+        if len(keys) > len(values):
+            CACHE_REQUESTS.inc('miss', amount=len(keys) - len(values))
+        return values
+
+    backend_class.get = get
+    backend_class.get_many = get_many
+    backend_class._metrics_installed = True
+
+
+# ============================================================================
+# Exposition
+# ============================================================================
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, f'metrics_{pid}.json')
+
+
+def _write_json(directory, path, data):
+    """Replace a file atomically"""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp:
+        json.dump(data, tmp)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+class _directory_lock:
+    """Exclusive lock serialising folds into the aggregate file"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _merge_samples(merged, samples, gauges=True):
+    """Add the samples of one snapshot to ``name -> {labels: value}``"""
+    for name, entries in samples.items():
+        metric = registry._metrics.get(name)
+        if metric is None or (metric.type == 'gauge' and not gauges):
+            continue
+        values = merged.setdefault(name, {})
+        for labels, value in entries:
+            labels = tuple(labels)
+            if metric.type == 'histogram':
+                current = values.get(labels)
+                if current is None:
+                    values[labels] = [list(value[0]), value[1]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+            else:
+                values[labels] = values.get(labels, 0) + value
+    return merged
+
+
+def _fold_snapshots(directory, paths):
+    """
+    Add the counters and histograms of finished processes to the aggregate
+
+    The caller holds the directory lock. Gauges of finished processes are
+    dropped, and each snapshot file is removed once it has been folded.
+    """
+    aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+    aggregate = _read_json(aggregate_path) or {'samples': {}}
+    merged = _merge_samples({}, aggregate['samples'])
+    folded = []
+    for path in paths:
+        data = _read_json(path)
+        if data is not None:
+            _merge_samples(merged, data['samples'], gauges=False)
+            folded.append(path)
+    if not folded:
+        return
+    _write_json(directory, aggregate_path, {'samples': {
+        name: [[list(labels), value] for labels, value in values.items()]
+        for name, values in merged.items()
+    }})
+    for path in folded:
+        os.remove(path)
+
+
+def _fold_dead_snapshots(directory):
+    """Fold the snapshots of processes that are no longer running"""
+    paths = []
+    for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+        pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+        if pid.isdigit() and int(pid) != os.getpid() and not _is_alive(int(pid)):
+            paths.append(path)
+    if not paths:
+        return
+    try:
+        with _directory_lock(directory):
+            # Another scraper may have folded them while we waited
+            _fold_snapshots(directory, [path for path in paths if os.path.exists(path)])
+    except OSError as e:
+        logger.warning(f"Could not fold finished metrics snapshots: {str(e)}")
+
+
+def collect_samples():
+    """
+    Merge the values of every process
+
+    Returns:
+        Dict ``name -> {label values tuple: value}``
+    """
+    merged = {}
+    directory = get_metrics_settings().get('MULTIPROC_DIR')
+    if directory:
+        _fold_dead_snapshots(directory)
+        aggregate = _read_json(os.path.join(directory, AGGREGATE_FILE))
+        if aggregate is not None:
+            _merge_samples(merged, aggregate['samples'], gauges=False)
+        for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+            data = _read_json(path)
+            if data is None or data.get('pid') == os.getpid():
+                continue
+            # A snapshot can outlive its process until the next fold
+            _merge_samples(merged, data['samples'], gauges=_is_alive(data['pid']))
+    return _merge_samples(merged, registry.snapshot())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format"""
+    merged = collect_samples()
+    lines = []
+    for name, metric in sorted(registry._metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for labels, value in sorted(merged.get(name, {}).items()):
+            if metric.type != 'histogram':
+                lines.append(f'{name}{_format_labels(metric.labelnames, labels)} {_format_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="{}"'.format('+Inf' if bound == float('inf') else _format_number(bound))
+                lines.append(f'{name}_bucket{_format_labels(metric.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(metric.labelnames, labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(metric.labelnames, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    ``/metrics`` for Prometheus scrapers
+
+    Allowed from ``METRICS['ALLOWED_IPS']`` or with
+    ``Authorization: Bearer <METRICS['TOKEN']>``.
+    """
+    from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+    from django.utils.crypto import constant_time_compare
+
+    metrics_settings = get_metrics_settings()
+    if not metrics_settings.get('ENABLED', False):
+        return HttpResponseNotFound()
+
+    token = metrics_settings.get('TOKEN')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and header.startswith('Bearer ') and constant_time_compare(header[7:], token)
+    if not authorized and request.META.get('REMOTE_ADDR') not in metrics_settings.get('ALLOWED_IPS', ()):
+        return HttpResponseForbidden()
+
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
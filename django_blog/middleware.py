@@ -1,9 +1,15 @@
 import json
 import logging
+import time
 import traceback
-from django.http import JsonResponse
-from django.core.exceptions import ValidationError, PermissionDenied
-from django.db import IntegrityError
+from django.conf import settings
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.http import Http404, JsonResponse
+from django.http.multipartparser import MultiPartParserError
+from django.core.exceptions import BadRequest, ValidationError, PermissionDenied, SuspiciousOperation
+from django.db import IntegrityError, connection
 from rest_framework import status
 from rest_framework.views import exception_handler
 from rest_framework.exceptions import (
@@ -17,46 +23,148 @@ from rest_framework.exceptions import (
     ParseError,
     UnsupportedMediaType
 )
+from .access_log import JSONMessage, build_access_record, get_access_log_settings, should_log
 from .api_utils import StandardAPIResponse, HTTPStatus, ErrorMessages
+from .metrics import DB_QUERIES, REQUEST_LATENCY, get_metrics_settings, install_cache_metrics
+from .profiling import install_serializer_hooks, log_profile, profile_request, should_profile
+from .ratelimit import check_rate_limit, get_rate_limit_settings, load_rate_limit_rules, match_group
 
 
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger('django_blog.access')
+
+# get_api_route() classifications
+API_ROUTE = 'api'
+API_ROUTE_JWT = 'jwt'  # Bearer token and no session cookie
+
+
+def get_gateway_settings():
+    return getattr(settings, 'API_GATEWAY', {})
+
+
+def get_api_route(request):
+    """
+    Classify a request once (the result is stored on the request)
+    
+    Returns:
+        None for non-API paths, API_ROUTE_JWT for pure-JWT calls under
+        ``API_GATEWAY['JWT_ONLY_PREFIX']``, API_ROUTE otherwise
+    """
+    try:
+        return request._api_route
+    except AttributeError:
+        pass
+    
+    gateway_settings = get_gateway_settings()
+    path = request.path
+    if not path.startswith(gateway_settings.get('API_PREFIX', '/api/')):
+        route = None
+    elif (
+        path.startswith(gateway_settings.get('JWT_ONLY_PREFIX', '/api/v1/'))
+        and request.META.get('HTTP_AUTHORIZATION', '').startswith('Bearer ')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    ):
+        route = API_ROUTE_JWT
+    else:
+        route = API_ROUTE
+    request._api_route = route
+    return route
 
 
 class RequestLoggingMiddleware:
     """
-    Middleware to log API requests and responses for debugging
+    Structured access log for API requests (see django_blog.access_log)
+    
+    Request bodies are only read for DEBUG logging, and only for small
+    JSON payloads.
     """
     
+    SENSITIVE_FIELDS = ('password', 'token', 'secret', 'refresh', 'access', 'key')
+    
     def __init__(self, get_response):
         self.get_response = get_response
+        self.access_settings = get_access_log_settings()
+        self.enabled = self.access_settings.get('ENABLED', True)
+        self.path_prefixes = tuple(self.access_settings.get('PATH_PREFIXES', ('/api/',)))
     
     def __call__(self, request):
-        # Log request
-        if request.path.startswith('/api/'):
-            logger.info(f"API Request: {request.method} {request.path}")
-            if request.body and len(request.body) < 1000:  # Don't log large payloads
-                try:
-                    body = json.loads(request.body.decode('utf-8'))
-                    # Remove sensitive data
-                    if isinstance(body, dict):
-                        sensitive_fields = ['password', 'token', 'secret']
-                        for field in sensitive_fields:
-                            if field in body:
-                                body[field] = '***'
-                    logger.debug(f"Request body: {body}")
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    pass
+        if not self.enabled or not request.path.startswith(self.path_prefixes):
+            return self.get_response(request)
         
+        if logger.isEnabledFor(logging.DEBUG):
+            self.log_request_body(request)
+        
+        start = time.perf_counter()
         response = self.get_response(request)
+        self.log_response(request, response, (time.perf_counter() - start) * 1000)
+        return response
+    
+    def log_response(self, request, response, duration_ms):
+        if self.enabled and access_logger.isEnabledFor(logging.INFO) and should_log(response.status_code, duration_ms, self.access_settings):
+            access_logger.info('%s', JSONMessage(build_access_record(request, response, duration_ms)))
+        if response.status_code >= 400 and hasattr(response, 'data'):
+            logger.warning('API Error Response: %s', response.data)
+    
+    def log_request_body(self, request):
+        # Check the declared size first: reading request.body would buffer
+        # uploads (and chunked-upload PUTs) in memory
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if 0 < content_length < 1000 and request.content_type == 'application/json':  # Don't log large payloads
+            try:
+                body = json.loads(request.body.decode('utf-8'))
+                # Remove sensitive data (password2, refresh/access tokens...)
+                if isinstance(body, dict):
+                    for field in body:
+                        if any(word in field.lower() for word in self.SENSITIVE_FIELDS):
+                            body[field] = '***'
+                logger.debug('Request body: %s', body)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                pass
+
+
+class RateLimitMiddleware:
+    """
+    Apply the route-group rate limits of RATE_LIMIT_SETTINGS
+
+    Must run after AuthenticationMiddleware so session users are limited
+    per account; JWT bearers are limited by the token's user id and other
+    clients per IP.
+    """
+    
+    # Restrict to these group names (None applies every configured group)
+    groups = None
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_rate_limit_settings().get('ENABLED', True)
+        self.rules = load_rate_limit_rules(self.groups)
+    
+    def __call__(self, request):
+        group = match_group(self.rules, request.path, request.method) if self.enabled else None
+        if group is None:
+            return self.get_response(request)
         
-        # Log response
-        if request.path.startswith('/api/'):
-            logger.info(f"API Response: {request.method} {request.path} - {response.status_code}")
-            if hasattr(response, 'data') and response.status_code >= 400:
-                logger.warning(f"API Error Response: {response.data}")
+        try:
+            identity = group.identity(request)
+            result = check_rate_limit(group.name, identity, group.limit, group.window)
+        except Exception as e:
+            # Fail open: an unavailable cache must not take the API down
+            logger.warning(f"Rate limit check failed for {request.path}: {str(e)}")
+            return self.get_response(request)
         
-        return response
+        if not result.allowed:
+            logger.warning(f"Rate limit exceeded: {group.name} - {identity} - {request.method} {request.path}")
+            response = JsonResponse({
+                'success': False,
+                'error': 'Rate limit exceeded',
+                'message': f"Too many requests. Retry in {result.retry_after} seconds"
+            }, status=HTTPStatus.TOO_MANY_REQUESTS)
+            return result.apply_headers(response)
+        
+        return result.apply_headers(self.get_response(request))
 
 
 class APIErrorHandlingMiddleware:
@@ -250,6 +358,167 @@ class ResponseTimeMiddleware:
         return response
 
 
+class ProfilingMiddleware:
+    """
+    Profile sampled requests, or staff requests sending ``X-Profile``
+
+    Adds a ``Server-Timing`` header (SQL, serialization, cache, total) and
+    logs one JSON record per profiled request. See django_blog.profiling.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING', {}).get('ENABLED', False)
+        if self.enabled:
+            install_serializer_hooks()
+    
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        
+        enabled, use_cprofile = should_profile(request)
+        if not enabled:
+            return self.get_response(request)
+        
+        response, profile = profile_request(self.get_response, request, use_cprofile)
+        response['Server-Timing'] = profile.server_timing()
+        try:
+            log_profile(profile.as_record(request, response))
+        except Exception as e:
+            logger.warning(f"Could not log request profile: {str(e)}")
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record request latency per route and database queries per request
+
+    Should be first in MIDDLEWARE so the latency covers the whole stack.
+    Routes are labelled with their URL pattern, never the raw path.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = get_metrics_settings().get('ENABLED', False)
+        if self.enabled:
+            install_cache_metrics(caches['default'])
+    
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        
+        queries = [0]
+        
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+        
+        start = time.perf_counter()
+        status_code = 500
+        try:
+            with connection.execute_wrapper(count_query):
+                response = self.get_response(request)
+            status_code = response.status_code
+            return response
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            route = match.route if match else 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - start, request.method, route, str(status_code))
+            if queries[0]:
+                DB_QUERIES.inc(route, amount=queries[0])
+
+
+class APIGatewayMiddleware(RequestLoggingMiddleware, APIErrorHandlingMiddleware):
+    """
+    Single pass over API requests
+    
+    Classifies the request once (``get_api_route``) and applies, for API
+    routes only, what SecurityHeadersMiddleware, ResponseTimeMiddleware,
+    APIVersionMiddleware, RequestLoggingMiddleware and
+    APIErrorHandlingMiddleware did as separate layers: security and
+    version headers, X-Response-Time, the access log and JSON responses
+    for unhandled exceptions. Request bodies are never read or logged
+    here. Use it instead of those middlewares, with
+    APISessionMiddleware and APIMessageMiddleware to skip session and
+    message handling for pure-JWT calls.
+    """
+    
+    SECURITY_HEADERS = (
+        ('X-Content-Type-Options', 'nosniff'),
+        ('X-Frame-Options', 'DENY'),
+        ('X-XSS-Protection', '1; mode=block'),
+        ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+        ('Content-Security-Policy', "default-src 'none'; frame-ancestors 'none';"),
+    )
+    
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        gateway_settings = get_gateway_settings()
+        self.api_headers = self.SECURITY_HEADERS + (
+            ('X-API-Version', gateway_settings.get('API_VERSION', 'v1')),
+            ('X-API-Build', gateway_settings.get('API_BUILD', '1.0.0')),
+        )
+        self.slow_request_seconds = gateway_settings.get('SLOW_REQUEST_SECONDS', 1.0)
+    
+    def __call__(self, request):
+        if get_api_route(request) is None:
+            return self.get_response(request)
+        
+        start = time.perf_counter()
+        response = self.get_response(request)
+        response_time = time.perf_counter() - start
+        
+        for header, value in self.api_headers:
+            response[header] = value
+        response['X-Response-Time'] = f"{response_time:.3f}s"
+        if response_time > self.slow_request_seconds:
+            logger.warning(f"Slow API request: {request.method} {request.path} took {response_time:.3f}s")
+        
+        self.log_response(request, response, response_time * 1000)
+        return response
+    
+    # Exceptions Django's handler already turns into 4xx responses
+    DJANGO_HANDLED_EXCEPTIONS = (Http404, PermissionDenied, SuspiciousOperation, BadRequest, MultiPartParserError)
+    
+    def process_exception(self, request, exception):
+        # Exceptions raised by views reach middlewares through this hook,
+        # not through get_response()
+        if get_api_route(request) is None or isinstance(exception, self.DJANGO_HANDLED_EXCEPTIONS):
+            return None
+        return self.handle_api_exception(request, exception)
+
+
+class APISessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that skips pure-JWT API calls
+    
+    They get an empty session that is never saved, so code reading
+    ``request.session`` (and AuthenticationMiddleware) keeps working.
+    """
+    
+    def process_request(self, request):
+        if get_api_route(request) == API_ROUTE_JWT:
+            request.session = self.SessionStore()
+            return
+        super().process_request(request)
+    
+    def process_response(self, request, response):
+        if get_api_route(request) == API_ROUTE_JWT:
+            return response
+        return super().process_response(request, response)
+
+
+class APIMessageMiddleware(MessageMiddleware):
+    """
+    MessageMiddleware that skips pure-JWT API calls
+    """
+    
+    def process_request(self, request):
+        # Without request._messages process_response() does nothing
+        if get_api_route(request) != API_ROUTE_JWT:
+            super().process_request(request)
+
+
 class APIVersionMiddleware:
     """
     Add API version information to responses
@@ -0,0 +1,301 @@
+"""
+Request-level profiling
+
+A profiled request records:
+
+* SQL: query count and time, through ``connection.execute_wrapper`` on
+  every database alias,
+* serialization: time spent in the outermost DRF ``to_representation``,
+* cache: hits and misses of ``get``/``get_many`` on the default cache,
+* optionally the top cProfile frames by cumulative time.
+
+Requests are profiled when sampled (``PROFILING['SAMPLE_RATE']``) or when
+a staff user sends ``X-Profile: 1`` (``X-Profile: cprofile`` adds cProfile).
+Results go to a ``Server-Timing`` header and to one JSON log record on the
+``django_blog.profiling`` logger, which ``manage.py profile_report``
+aggregates into per-route percentiles.
+
+Unprofiled requests only pay for a context variable lookup in the
+serializer hook.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import math
+import pstats
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_active_profile = contextvars.ContextVar('active_profile', default=None)
+_MISSING = object()
+
+
+def get_profiling_settings():
+    return getattr(settings, 'PROFILING', {})
+
+
+class RequestProfile:
+    """Counters collected for one request"""
+
+    def __init__(self, use_cprofile=False):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_depth = 0
+        self.total_time = 0.0
+        self.profiler = cProfile.Profile() if use_cprofile else None
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+    def top_frames(self, limit):
+        """Top functions by cumulative time"""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        stats.sort_stats('cumulative')
+        frames = []
+        for func in stats.fcn_list[:limit]:
+            filename, line, name = func
+            _, calls, _, cumulative, _ = stats.stats[func]
+            frames.append({
+                'frame': f'{filename}:{line}({name})',
+                'calls': calls,
+                'cumulative_ms': round(cumulative * 1000, 2),
+            })
+        return frames
+
+    def server_timing(self):
+        """``Server-Timing`` header value"""
+        other = max(0.0, self.total_time - self.sql_time - self.serializer_time)
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries"',
+            f'serialize;dur={self.serializer_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'app;dur={other * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_record(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'method': request.method,
+            'route': match.route if match else request.path,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(self.total_time * 1000, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'top_frames': self.top_frames(get_profiling_settings().get('CPROFILE_TOP', 15)),
+        }
+
+
+def _instrument_cache(stack, profile):
+    """Count hits and misses on this thread's default cache backend"""
+    backend = caches['default']
+    original_get = backend.get
+    original_get_many = backend.get_many
+
+    def get(key, default=None, version=None):
+        value = original_get(key, _MISSING, version=version)
+        if not profile.cache_depth:
+            if value is _MISSING:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(keys, version=None):
+        keys = list(keys)
+        # Backends may implement get_many with get: count once
+        profile.cache_depth += 1
+        try:
+            values = original_get_many(keys, version=version)
+        finally:
+            profile.cache_depth -= 1
+        profile.cache_hits += len(values)
+        profile.cache_misses += len(keys) - len(values)
+        return values
+
+    backend.get = get
+    backend.get_many = get_many
+
+    def restore():
+        del backend.get
+        del backend.get_many
+    stack.callback(restore)
+
+
+def _timed_representation(original):
+    def to_representation(self, instance):
+        profile = _active_profile.get()
+        if profile is None:
+            return original(self, instance)
+        # Only the outermost serializer is timed; nested ones are included
+        profile.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, instance)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - start
+    to_representation._profiled = True
+    return to_representation
+
+
+def install_serializer_hooks():
+    """Wrap DRF ``to_representation`` once per process"""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.to_representation, '_profiled', False):
+            cls.to_representation = _timed_representation(cls.to_representation)
+
+
+def should_profile(request):
+    """
+    Decide whether to profile a request
+
+    Returns:
+        Tuple ``(profile, use_cprofile)``
+    """
+    profiling_settings = get_profiling_settings()
+    requested = request.META.get('HTTP_X_PROFILE', '').lower()
+    if requested and is_staff_request(request):
+        return True, requested == 'cprofile'
+
+    sample_rate = profiling_settings.get('SAMPLE_RATE', 0.0)
+    if sample_rate and random.random() < sample_rate:
+        return True, profiling_settings.get('SAMPLE_CPROFILE', False)
+    return False, False
+
+
+def is_staff_request(request):
+    """
+    Staff session user, or a valid access token of a current staff user
+
+    Role claims can outlive a demotion (refresh tokens copy them), so they
+    only spare the user lookup for non-staff tokens; staff is confirmed
+    against the cached user row (``accounts.authentication``).
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not header.startswith('Bearer '):
+        return False
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    from accounts.authentication import get_cached_user
+    try:
+        token = AccessToken(header.split(' ', 1)[1])
+    except TokenError:
+        return False
+    if not (token.get('is_staff') or token.get('is_superuser')):
+        return False
+    user = get_cached_user(token.get(api_settings.USER_ID_CLAIM), token.get('exp'))
+    return user is not None and user.is_active and user.is_staff
+
+
+def profile_request(get_response, request, use_cprofile=False):
+    """
+    Run a request with profiling enabled
+
+    Returns:
+        Tuple ``(response, RequestProfile)``
+    """
+    profile = RequestProfile(use_cprofile)
+    token = _active_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.sql_wrapper))
+            _instrument_cache(stack, profile)
+            if profile.profiler is not None:
+                profile.profiler.enable()
+                stack.callback(profile.profiler.disable)
+            response = get_response(request)
+    finally:
+        profile.total_time = time.perf_counter() - start
+        _active_profile.reset(token)
+    return response, profile
+
+
+def log_profile(record):
+    """One JSON record per profiled request (read by ``profile_report``)"""
+    logger.info(json.dumps(record, separators=(',', ':')))
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def aggregate_profiles(lines):
+    """
+    Aggregate profiling log records per route
+
+    Args:
+        lines: Iterable of log lines; lines without a JSON record are skipped
+
+    Returns:
+        List of dicts with ``route``, ``count``, ``p50_ms``, ``p95_ms``,
+        ``p99_ms``, ``max_ms``, ``avg_sql_count``, ``avg_sql_ms`` and
+        ``avg_serializer_ms``, slowest p95 first
+    """
+    routes = {}
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if 'route' not in record or 'total_ms' not in record:
+            continue
+        routes.setdefault(f"{record.get('method', '')} {record['route']}".strip(), []).append(record)
+
+    report = []
+    for route, records in routes.items():
+        totals = sorted(record['total_ms'] for record in records)
+        count = len(records)
+        report.append({
+            'route': route,
+            'count': count,
+            'p50_ms': percentile(totals, 0.50),
+            'p95_ms': percentile(totals, 0.95),
+            'p99_ms': percentile(totals, 0.99),
+            'max_ms': totals[-1],
+            'avg_sql_count': sum(record.get('sql_count', 0) for record in records) / count,
+            'avg_sql_ms': sum(record.get('sql_ms', 0) for record in records) / count,
+            'avg_serializer_ms': sum(record.get('serializer_ms', 0) for record in records) / count,
+        })
+    report.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return report
@@ -0,0 +1,194 @@
+"""
+Distributed rate limiting with sliding-window counters
+
+Each (group, client) pair keeps one counter per fixed window in the cache.
+The effective count is the current window plus the previous one weighted
+by how much of it still overlaps the sliding window::
+
+    count = current + previous * (window - elapsed) / window
+
+Counters are bumped with ``cache.incr``, which is atomic in LocMem (per
+process) and in shared backends (Redis, Memcached), so limits hold across
+gunicorn workers when ``CACHES`` points to a shared cache. A check costs
+two cache operations and no database access.
+
+Groups keyed by ``'user'`` limit session users and JWT bearers per account
+(the access token is verified here, since DRF authenticates after the
+middleware runs); other clients are limited per IP (see
+``django_blog.client_ip`` for proxy handling).
+
+Route groups are configured in ``RATE_LIMIT_SETTINGS['GROUPS']``::
+
+    'auth': {'paths': ['/api/v1/users/auth/login/'], 'limit': 10, 'window': 60,
+             'methods': ['POST'], 'key': 'ip'}
+"""
+import logging
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .client_ip import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEY_PREFIX = 'ratelimit'
+
+
+class RateLimitResult:
+    """Outcome of a rate limit check"""
+
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset', 'retry_after')
+
+    def __init__(self, allowed, limit, remaining, reset, retry_after=0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def apply_headers(self, response):
+        """Add ``X-RateLimit-*`` (and ``Retry-After`` when limited) to a response"""
+        response['X-RateLimit-Limit'] = str(self.limit)
+        response['X-RateLimit-Remaining'] = str(self.remaining)
+        response['X-RateLimit-Reset'] = str(self.reset)
+        if not self.allowed:
+            response['Retry-After'] = str(self.retry_after)
+            response['X-RateLimit-Retry-After'] = str(self.retry_after)
+        return response
+
+
+def get_rate_limit_settings():
+    return getattr(settings, 'RATE_LIMIT_SETTINGS', {})
+
+
+def get_rate_limit_cache():
+    return caches[get_rate_limit_settings().get('CACHE_ALIAS', 'default')]
+
+
+def get_bearer_user_id(request):
+    """
+    User id from a valid ``Authorization: Bearer`` access token
+
+    Returns:
+        The user id claim, or None without a valid access token
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0] not in api_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(header[1]).get(api_settings.USER_ID_CLAIM)
+    except TokenError:
+        return None
+
+
+def _incr(cache, key, timeout):
+    """Atomically increment a counter, creating it on first use"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        # Another worker created it in between
+        return cache.incr(key)
+
+
+def check_rate_limit(scope, identity, limit, window, cache=None, now=None):
+    """
+    Count one hit and decide whether it is within the limit
+
+    Args:
+        scope: Name of the limited resource (route group, view, ...)
+        identity: Client identity (user id or IP)
+        limit: Hits allowed per sliding window
+        window: Window length in seconds
+        cache: Cache backend (defaults to RATE_LIMIT_SETTINGS['CACHE_ALIAS'])
+        now: Current timestamp, for tests
+
+    Returns:
+        RateLimitResult
+    """
+    cache = cache or get_rate_limit_cache()
+    now = time.time() if now is None else now
+    index = int(now // window)
+    elapsed = now - index * window
+    prefix = get_rate_limit_settings().get('KEY_PREFIX', DEFAULT_KEY_PREFIX)
+    key = f'{prefix}:{scope}:{identity}:'
+
+    # The previous window must outlive the current one to be weighted
+    current = _incr(cache, f'{key}{index}', window * 2)
+    previous = cache.get(f'{key}{index - 1}', 0)
+
+    overlap = (window - elapsed) / window
+    count = current + previous * overlap
+    reset = max(1, math.ceil(window - elapsed))
+    if count <= limit:
+        return RateLimitResult(True, limit, int(limit - count), reset)
+
+    if current > limit or not previous:
+        retry_after = reset
+    else:
+        # Time until the previous window has decayed enough for one more hit
+        decayed_at = window * (1 - (limit - current) / previous)
+        retry_after = max(1, math.ceil(decayed_at - elapsed))
+    return RateLimitResult(False, limit, 0, reset, retry_after)
+
+
+class RateLimitGroup:
+    """A configured route group"""
+
+    __slots__ = ('name', 'limit', 'window', 'methods', 'key')
+
+    def __init__(self, name, limit, window, methods=None, key='user'):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.methods = frozenset(method.upper() for method in methods) if methods else None
+        self.key = key
+
+    def identity(self, request):
+        """Authenticated user id (session or JWT), or the client IP"""
+        if self.key == 'user':
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                return f'user:{user.pk}'
+            user_id = get_bearer_user_id(request)
+            if user_id is not None:
+                return f'user:{user_id}'
+        return f'ip:{get_client_ip(request)}'
+
+
+def load_rate_limit_rules(groups=None):
+    """
+    Build the path matching table from settings
+
+    Args:
+        groups: Optional iterable of group names to keep
+
+    Returns:
+        List of ``(path_prefix, RateLimitGroup)``, longest prefix first
+    """
+    rules = []
+    for name, config in get_rate_limit_settings().get('GROUPS', {}).items():
+        if groups is not None and name not in groups:
+            continue
+        group = RateLimitGroup(
+            name,
+            config['limit'],
+            config['window'],
+            methods=config.get('methods'),
+            key=config.get('key', 'user')
+        )
+        rules.extend((prefix, group) for prefix in config.get('paths', []))
+    rules.sort(key=lambda rule: len(rule[0]), reverse=True)
+    return rules
+
+
+def match_group(rules, path, method):
+    """First (most specific) group covering a request"""
+    for prefix, group in rules:
+        if path.startswith(prefix) and (group.methods is None or method in group.methods):
+            return group
+    return None
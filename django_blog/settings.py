@@ -56,19 +56,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_blog.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django_blog.middleware.SecurityHeadersMiddleware',
+    # Security/version headers, timing, access log and API errors in one pass
+    'django_blog.middleware.APIGatewayMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django_blog.middleware.APISessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'django_blog.middleware.RateLimitMiddleware',
+    'django_blog.middleware.ProfilingMiddleware',
+    'django_blog.middleware.APIMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django_blog.middleware.RequestLoggingMiddleware',
-    'django_blog.middleware.APIErrorHandlingMiddleware',
-    'django_blog.middleware.ResponseTimeMiddleware',
-    'django_blog.middleware.APIVersionMiddleware',
 ]
 
 ROOT_URLCONF = 'django_blog.urls'
@@ -170,6 +170,22 @@ MEDIA_FILE_SETTINGS = {
     },
     'IMAGE_QUALITY': 85,
     'AUTO_CREATE_THUMBNAILS': True,
+    'RENDITION_WIDTHS': [320, 640, 1024, 1920],  # srcset widths in pixels
+    'RENDITION_FORMATS': ['webp', 'jpeg'],  # add 'avif' if Pillow supports it
+    'PROCESSING_WORKERS': 2,  # process pool size for `manage.py process_media`
+    'PROCESSING_BATCH_SIZE': 50,  # images per batch
+    'MAX_IMAGE_PIXELS': 40_000_000,  # larger images are rejected by the workers
+    'SIMILAR_IMAGE_MAX_DISTANCE': 6,  # perceptual hash bits that may differ for "similar" images
+    'UPLOAD_CHUNK_SIZE': 5 * 1024 * 1024,  # max bytes per chunked-upload PUT
+    'MAX_CHUNKED_UPLOAD_SIZE': 1024 * 1024 * 1024,  # 1GB
+    'CHUNKED_UPLOAD_DIR': None,  # part files; defaults to <tmp>/chunked_uploads (must be shared across workers)
+    'CHUNKED_UPLOAD_EXPIRY_HOURS': 24,
+    'SENDFILE_BACKEND': None,  # 'nginx' (X-Accel-Redirect) or 'xsendfile' (X-Sendfile)
+    'SENDFILE_URL_PREFIX': '/protected-media/',  # nginx internal location aliased to MEDIA_ROOT
+    'DOWNLOAD_COUNT_FLUSH_INTERVAL': 10.0,  # seconds between batched download count writes
+    'GC_QUARANTINE_DIR': 'quarantine',  # collect_orphaned_media --quarantine target (under MEDIA_ROOT)
+    'GC_MIN_AGE_HOURS': 24,  # files modified more recently are never collected
+    'GC_BATCH_SIZE': 500,
 }
 
 # Login/Logout URLs
@@ -277,7 +293,7 @@ USE_CUSTOM_ADMIN_ONLY = True  # Cambiar a False si quieres mantener ambos admins
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -306,9 +322,19 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Upper bound for users cached by CachedJWTAuthentication (seconds). Entries
+# never outlive the token that loaded them and are dropped on user changes.
+JWT_USER_CACHE_TIMEOUT = 300
+
+# Seconds a refresh token found not blacklisted is trusted from the cache
+JWT_BLACKLIST_NEGATIVE_TIMEOUT = 60
+
 # Enhanced CORS Configuration
 from .cors_settings import configure_cors
 
+# Origins whose allow/deny decision EnhancedCORSMiddleware keeps in memory
+CORS_DECISION_CACHE_SIZE = 1024
+
 # Apply CORS configuration
 try:
     cors_config = configure_cors()
@@ -355,6 +381,14 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'timestamped': {
+            'format': '{asctime} {message}',
+            'style': '{',
+        },
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -374,6 +408,18 @@ LOGGING = {
             'filename': BASE_DIR / 'logs' / 'api.log',
             'formatter': 'verbose',
         },
+        'profiling_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'logs' / 'profiling.log',
+            'formatter': 'timestamped',
+        },
+        'access_file': {
+            'level': 'INFO',
+            'class': 'django_blog.access_log.QueuedFileHandler',
+            'filename': BASE_DIR / 'logs' / 'access.log',
+            'formatter': 'message',
+        },
     },
     'loggers': {
         'django': {
@@ -406,6 +452,16 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
             'propagate': False,
         },
+        'django_blog.profiling': {
+            'handlers': ['profiling_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'django_blog.access': {
+            'handlers': ['access_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -415,6 +471,24 @@ logs_dir = BASE_DIR / 'logs'
 if not os.path.exists(logs_dir):
     os.makedirs(logs_dir)
 
+# Cache shared by every process (presence, replay log, JWT and rate limit state)
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'{REDIS_URL}/1',
+    },
+}
+
+# For development without Redis, use a per-process cache
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
 # Django Channels Configuration
 ASGI_APPLICATION = 'django_blog.asgi.application'
 
@@ -436,10 +510,127 @@ if DEBUG:
         },
     }
 
+# Presence, replay log, JWT and rate limit state live in the default cache and
+# must be visible to every process; only the development server runs in one
+SHARED_CACHE_REQUIRED = not DEBUG
+
 # WebSocket settings
 WEBSOCKET_SETTINGS = {
     'HEARTBEAT_INTERVAL': 30,  # seconds
     'CONNECTION_TIMEOUT': 300,  # seconds
     'MAX_CONNECTIONS_PER_USER': 5,
     'NOTIFICATION_BATCH_SIZE': 10,
-}
\ No newline at end of file
+    'USER_STATE_CACHE_TIMEOUT': 30,  # seconds
+    'CATCHUP_LIMIT': 50,  # undelivered notifications sent on connect
+    'REPLAY_LOG_SIZE': 100,  # frames kept per user for reconnect replay
+    'REPLAY_LOG_TIMEOUT': 3600,  # seconds
+    'DASHBOARD_FLUSH_INTERVAL': 1.0,  # seconds between live metric pushes
+    'DASHBOARD_MAX_EVENTS': 20,  # activity events kept per push
+}
+
+# Notification settings
+NOTIFICATION_SETTINGS = {
+    'PREFERENCE_CACHE_TIMEOUT': 300,  # seconds
+}
+
+# Effective permissions (accounts.permissions) cache lifetime
+PERMISSION_CACHE_TIMEOUT = 300  # seconds
+
+# Reverse proxies in front of the app that append to X-Forwarded-For
+# (0: the header is ignored and REMOTE_ADDR is the client)
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+# Rate limiting (django_blog.ratelimit). Counters live in the cache: point
+# CACHES at Redis/Memcached so limits are shared across workers.
+RATE_LIMIT_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'ratelimit',
+    'GROUPS': {
+        'auth': {
+            'paths': [
+                '/api/v1/users/auth/login/',
+                '/api/v1/users/auth/register/',
+                '/api/v1/users/auth/password-reset/',
+                '/api/v1/users/auth/change-password/',
+                '/api/v1/dashboard/auth/login/',
+                '/api/v1/dashboard/auth/change-password/',
+            ],
+            'methods': ['POST'],
+            'limit': 10,
+            'window': 60,  # seconds
+            'key': 'ip',
+        },
+        'search': {
+            'paths': ['/api/v1/posts/search/', '/api/v1/search/'],
+            'limit': 60,
+            'window': 60,
+        },
+        'uploads': {
+            'paths': [
+                '/api/v1/media/upload/',
+                '/api/v1/media/uploads/',
+                '/api/v1/tinymce/upload/',
+                '/api/v1/api/media/upload/',
+            ],
+            'methods': ['POST'],
+            'limit': 30,
+            'window': 60,
+        },
+        'dashboard': {
+            'paths': ['/api/v1/dashboard/'],
+            'limit': 300,
+            'window': 60,
+        },
+    },
+}
+
+# Buffered audit logging (accounts.audit)
+AUDIT_LOG_SETTINGS = {
+    'FLUSH_INTERVAL': 2.0,  # seconds after the first queued event
+    'MAX_BATCH_SIZE': 100,  # rows per bulk_create
+    'SPOOL_PATH': BASE_DIR / 'logs' / 'audit_spool.jsonl',  # fallback when the database fails
+}
+
+# Audit rows are written synchronously and spooled to a temporary file under tests
+TEST_RUNNER = 'django_blog.test_runner.TestRunner'
+
+# Request profiling (django_blog.profiling). Staff users can always send
+# "X-Profile: 1" (or "cprofile"); SAMPLE_RATE profiles a share of all requests.
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.0,  # 0.01 profiles 1% of requests
+    'SAMPLE_CPROFILE': False,  # cProfile sampled requests too (expensive)
+    'CPROFILE_TOP': 15,  # frames kept in the log record
+}
+
+# Metrics exposed at /metrics in the Prometheus text format (django_blog.metrics).
+# Set MULTIPROC_DIR (or PROMETHEUS_MULTIPROC_DIR) when running several
+# gunicorn/daphne workers so every process is reported.
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROC_DIR': os.environ.get('PROMETHEUS_MULTIPROC_DIR', ''),
+    'FLUSH_INTERVAL': 5.0,  # seconds between snapshot writes per process
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],  # scrapers allowed without a token
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),  # "Authorization: Bearer <token>"
+}
+
+# Access log (django_blog.access_log): one JSON line per API request in
+# logs/access.log, written by a background thread. Errors and requests
+# slower than SLOW_REQUEST_MS are always logged, the rest are sampled.
+ACCESS_LOG = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,  # 0.1 logs 10% of successful requests
+    'SLOW_REQUEST_MS': 1000,
+    'PATH_PREFIXES': ['/api/'],
+}
+
+# APIGatewayMiddleware. Requests under JWT_ONLY_PREFIX with a Bearer token
+# and no session cookie skip session and message handling.
+API_GATEWAY = {
+    'API_PREFIX': '/api/',
+    'JWT_ONLY_PREFIX': '/api/v1/',
+    'API_VERSION': 'v1',
+    'API_BUILD': '1.0.0',
+    'SLOW_REQUEST_SECONDS': 1.0,
+}
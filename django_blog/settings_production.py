@@ -86,10 +86,23 @@ LOGGING = {
     },
 }
 
-# Cache (opcional - para mejorar rendimiento)
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#     }
-# }
\ No newline at end of file
+# Cache y channel layer compartidos por todos los procesos. settings.py ya
+# eligió los backends de desarrollo (DEBUG = True), así que se fijan aquí.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'{REDIS_URL}/1',
+    }
+}
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            "hosts": [REDIS_URL],
+        },
+    },
+}
+
+# Presencia, replay de notificaciones y caché de JWT exigen una caché compartida
+SHARED_CACHE_REQUIRED = True
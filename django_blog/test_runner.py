@@ -0,0 +1,32 @@
+"""
+Project test runner
+
+Audit rows (``accounts.audit``) are flushed by a background timer on its
+own database connection. Under tests that connection hits the locked
+SQLite test database and the rows end up in the real spool file, so the
+runner writes them synchronously and spools to a temporary directory.
+"""
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """``DiscoverRunner`` with synchronous audit logging and a temporary spool"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.audit_spool_dir = tempfile.TemporaryDirectory()
+        self.audit_settings = override_settings(AUDIT_LOG_SETTINGS={
+            **getattr(settings, 'AUDIT_LOG_SETTINGS', {}),
+            'FLUSH_INTERVAL': 0,
+            'SPOOL_PATH': Path(self.audit_spool_dir.name) / 'audit_spool.jsonl',
+        })
+        self.audit_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.audit_settings.disable()
+        self.audit_spool_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
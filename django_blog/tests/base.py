@@ -0,0 +1,26 @@
+"""
+Shared setup for the project-level middleware tests
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+User = get_user_model()
+
+
+class MiddlewareTestCase(TestCase):
+    """Base class: empty cache, a request factory and one user"""
+
+    user_is_staff = False
+
+    def setUp(self):
+        """Set up test data"""
+        # Rate limit counters, cached users and JTIs live in the cache
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            is_staff=self.user_is_staff
+        )
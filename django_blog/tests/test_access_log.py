@@ -0,0 +1,70 @@
+"""
+Tests for the structured access log
+"""
+import json
+import logging
+import os
+import tempfile
+from django.test import override_settings
+from django_blog.access_log import JSONMessage, QueuedFileHandler
+from .base import MiddlewareTestCase
+
+
+class AccessLogTest(MiddlewareTestCase):
+    """Test the structured access log"""
+
+    def test_one_json_line_per_request(self):
+        """Each API request produces one JSON line with timings"""
+        self.client.force_login(self.user)
+        with self.assertLogs('django_blog.access', level='INFO') as logs:
+            response = self.client.get('/api/v1/posts/', HTTP_X_FORWARDED_FOR='198.51.100.1')
+
+        self.assertEqual(len(logs.records), 1)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'api/v1/posts/')
+        self.assertEqual(record['status'], response.status_code)
+        self.assertEqual(record['user_id'], self.user.pk)
+        self.assertEqual(record['bytes'], len(response.content))
+        self.assertGreater(record['duration_ms'], 0)
+        # Without trusted proxies the IP is the connection's
+        self.assertEqual(record['ip'], '127.0.0.1')
+
+    @override_settings(ACCESS_LOG={'ENABLED': True, 'SAMPLE_RATE': 0.0, 'PATH_PREFIXES': ['/api/']})
+    def test_sampling_keeps_errors(self):
+        """With a zero sample rate only errors are logged"""
+        with self.assertLogs('django_blog.access', level='INFO') as logs:
+            self.client.get('/api/v1/health/')
+            self.client.get('/api/v1/posts/does-not-exist/')
+
+        self.assertEqual([json.loads(record.getMessage())['status'] for record in logs.records], [404])
+
+    def test_queued_handler_writes_in_background(self):
+        """The queued handler writes the lines on flush"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'access.log')
+            handler = QueuedFileHandler(path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            test_logger = logging.getLogger('django_blog.tests.access')
+            test_logger.addHandler(handler)
+            test_logger.propagate = False
+            try:
+                test_logger.warning('%s', JSONMessage({'status': 200}))
+                handler.flush()
+                with open(path) as log_file:
+                    self.assertEqual(log_file.read(), '{"status":200}\n')
+            finally:
+                test_logger.removeHandler(handler)
+                handler.close()
+
+    def test_gateway_does_not_log_request_bodies(self):
+        """The gateway never writes request bodies, even at DEBUG"""
+        with self.assertLogs('django_blog.middleware', level='DEBUG') as logs:
+            self.client.post(
+                '/api/v1/auth/login/',
+                data=json.dumps({'username': 'testuser', 'password': 'testpass123'}),
+                content_type='application/json',
+            )
+            logging.getLogger('django_blog.middleware').debug('marker')
+
+        self.assertFalse([record for record in logs.records if 'testpass123' in record.getMessage()])
+        self.assertFalse([record for record in logs.records if 'Request body' in record.getMessage()])
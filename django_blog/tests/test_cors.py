@@ -0,0 +1,67 @@
+"""
+Tests for the compiled CORS middleware
+"""
+from django.http import HttpResponse
+from django.test import override_settings
+from django_blog.cors_middleware import EnhancedCORSMiddleware
+from .base import MiddlewareTestCase
+
+
+@override_settings(
+    DEBUG=False,
+    CORS_ALLOW_ALL_ORIGINS=False,
+    CORS_ALLOWED_ORIGINS=['https://app.example.com'],
+    CORS_ALLOWED_ORIGIN_REGEXES=[r'^https://\w+\.preview\.example\.com$']
+)
+class EnhancedCORSMiddlewareTest(MiddlewareTestCase):
+    """Test compiled CORS policies"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        self.view_calls = 0
+
+        def view(request):
+            self.view_calls += 1
+            return HttpResponse('ok')
+
+        self.middleware = EnhancedCORSMiddleware(view)
+
+    def preflight(self, path, origin, headers='authorization, x-unknown'):
+        return self.middleware(self.factory.options(
+            path,
+            HTTP_ORIGIN=origin,
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD='POST',
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS=headers
+        ))
+
+    def test_preflight_answered_without_view(self):
+        """Preflights get the policy headers without calling the view"""
+        response = self.preflight('/api/v1/dashboard/stats/', 'https://app.example.com')
+
+        self.assertEqual(self.view_calls, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://app.example.com')
+        self.assertEqual(response['Access-Control-Max-Age'], '3600')
+        self.assertEqual(response['Access-Control-Allow-Headers'], 'authorization')
+        self.assertNotIn('Access-Control-Expose-Headers', response)
+
+    def test_origin_decisions_are_cached(self):
+        """Origin decisions are computed once and honour the regexes"""
+        with self.assertLogs('django_blog.cors_middleware', level='WARNING'):
+            self.assertEqual(self.preflight('/api/v1/posts/', 'https://evil.example.org').status_code, 403)
+        for _ in range(3):
+            self.assertEqual(self.preflight('/api/v1/posts/', 'https://pr1.preview.example.com').status_code, 200)
+
+        info = self.middleware.origin_decision.cache_info()
+        self.assertEqual((info.misses, info.hits), (2, 2))
+
+    def test_response_headers(self):
+        """Regular responses get the origin, credentials and exposed headers"""
+        response = self.middleware(self.factory.get('/media/foto.jpg', HTTP_ORIGIN='https://app.example.com'))
+
+        self.assertEqual(self.view_calls, 1)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://app.example.com')
+        self.assertNotIn('Access-Control-Allow-Credentials', response)
+        self.assertEqual(response['Access-Control-Expose-Headers'], 'content-type, content-length, etag, last-modified')
+        self.assertEqual(response['Vary'], 'Origin')
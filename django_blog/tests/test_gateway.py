@@ -0,0 +1,63 @@
+"""
+Tests for the combined API gateway middleware
+"""
+import json
+from django.core.exceptions import PermissionDenied, SuspiciousOperation
+from django.db import IntegrityError
+from django.http import Http404
+from django_blog.middleware import API_ROUTE, API_ROUTE_JWT, APIGatewayMiddleware, get_api_route
+from accounts.tokens import UserClaimsRefreshToken
+from .base import MiddlewareTestCase
+
+
+class APIGatewayTest(MiddlewareTestCase):
+    """Test the combined API middleware"""
+
+    def test_route_classification(self):
+        """Requests are classified as non-API, API or pure JWT"""
+        bearer = {'HTTP_AUTHORIZATION': 'Bearer token'}
+        self.assertIsNone(get_api_route(self.factory.get('/admin/', **bearer)))
+        self.assertEqual(get_api_route(self.factory.get('/api/v1/posts/', **bearer)), API_ROUTE_JWT)
+        self.assertEqual(get_api_route(self.factory.get('/api/v1/posts/')), API_ROUTE)
+
+        with_session = self.factory.get('/api/v1/posts/', **bearer)
+        with_session.COOKIES['sessionid'] = 'abc'
+        self.assertEqual(get_api_route(with_session), API_ROUTE)
+
+    def test_api_headers_applied_once(self):
+        """API responses get the security, version and timing headers"""
+        response = self.client.get('/api/v1/health/')
+        self.assertEqual(response['X-API-Version'], 'v1')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['Content-Security-Policy'], "default-src 'none'; frame-ancestors 'none';")
+        self.assertRegex(response['X-Response-Time'], r'^\d+\.\d{3}s$')
+
+        self.assertNotIn('X-API-Version', self.client.get('/admin/login/'))
+
+    def test_jwt_request_skips_session(self):
+        """A JWT request without a session cookie uses neither sessions nor messages"""
+        token = UserClaimsRefreshToken.for_user(self.user).access_token
+        response = self.client.get('/api/v1/posts/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertFalse(response.wsgi_request.session.accessed)
+        self.assertFalse(hasattr(response.wsgi_request, '_messages'))
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_unhandled_exception_returns_json(self):
+        """Unhandled exceptions on API paths become JSON responses"""
+        middleware = APIGatewayMiddleware(lambda request: None)
+        with self.assertLogs('django_blog.middleware', level='ERROR'):
+            response = middleware.process_exception(self.factory.post('/api/v1/posts/'), IntegrityError('duplicate'))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content)['error'], 'Data integrity error')
+        self.assertIsNone(middleware.process_exception(self.factory.get('/admin/'), IntegrityError('duplicate')))
+
+    def test_django_handled_exceptions_pass_through(self):
+        """Exceptions Django maps to 4xx responses are left to Django"""
+        middleware = APIGatewayMiddleware(lambda request: None)
+        request = self.factory.get('/api/v1/posts/')
+        for exception in (Http404('missing'), PermissionDenied(), SuspiciousOperation('bad host')):
+            self.assertIsNone(middleware.process_exception(request, exception))
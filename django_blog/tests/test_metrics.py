@@ -0,0 +1,91 @@
+"""
+Tests for the metrics registry and the /metrics endpoint
+"""
+import json
+import os
+import tempfile
+from django.test import override_settings
+from posts.models import Post
+from django_blog.metrics import Counter, Gauge, Histogram, registry, render_metrics
+from .base import MiddlewareTestCase
+
+
+class MetricsTest(MiddlewareTestCase):
+    """Test the metrics registry and the /metrics endpoint"""
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        Post.objects.create(titulo='Post medido', contenido='Contenido', autor=self.user, status='published')
+
+    def test_request_latency_and_queries_per_route(self):
+        """/metrics exposes the latency histogram and queries per route"""
+        self.client.get('/api/v1/posts/')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertRegex(
+            body,
+            r'http_request_duration_seconds_bucket\{method="GET",route="api/v1/posts/",status="200",le="\+Inf"\} [1-9]'
+        )
+        self.assertRegex(body, r'django_db_queries_total\{route="api/v1/posts/"\} [1-9]')
+        self.assertIn('django_cache_requests_total', body)
+
+    def test_endpoint_requires_allowed_ip_or_token(self):
+        """/metrics rejects IPs outside ALLOWED_IPS unless the token is sent"""
+        settings = {'ENABLED': True, 'ALLOWED_IPS': [], 'TOKEN': 'secret'}
+        with override_settings(METRICS=settings):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+            response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+
+    def test_multiprocess_snapshots_are_merged(self):
+        """Counters of other processes are summed, gauges of finished ones ignored"""
+        counter = Counter('test_merge_total', 'Test counter', ('source',))
+        gauge = Gauge('test_merge_open', 'Test gauge', ('source',))
+        histogram = Histogram('test_merge_seconds', 'Test histogram', buckets=(1.0,))
+        counter.inc('local', amount=2)
+        gauge.set(3, 'local')
+        histogram.observe(0.5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'metrics_99999999.json'), 'w') as snapshot:
+                json.dump({'pid': 99999999, 'samples': {
+                    'test_merge_total': [[['local'], 5]],
+                    'test_merge_open': [[['local'], 7]],
+                    'test_merge_seconds': [[[], [[0, 1], 2.0]]],
+                }}, snapshot)
+            with override_settings(METRICS={'ENABLED': True, 'MULTIPROC_DIR': directory}):
+                registry.write_snapshot()
+                self.assertTrue(os.path.exists(os.path.join(directory, f'metrics_{os.getpid()}.json')))
+                body = render_metrics()
+
+        self.assertIn('test_merge_total{source="local"} 7', body)
+        self.assertIn('test_merge_open{source="local"} 3', body)
+        self.assertIn('test_merge_seconds_bucket{le="1.0"} 1', body)
+        self.assertIn('test_merge_seconds_bucket{le="+Inf"} 2', body)
+        self.assertIn('test_merge_seconds_count 2', body)
+
+    def test_finished_process_snapshots_are_folded(self):
+        """Finished snapshots move to the aggregate and a reused pid does not subtract"""
+        counter = Counter('test_fold_total', 'Test counter')
+        counter.inc(amount=1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            # A finished process, and an earlier process that had our pid
+            for pid, value in ((99999999, 5), (os.getpid(), 10)):
+                with open(os.path.join(directory, f'metrics_{pid}.json'), 'w') as snapshot:
+                    json.dump({'pid': pid, 'samples': {'test_fold_total': [[[], value]]}}, snapshot)
+
+            with override_settings(METRICS={'ENABLED': True, 'MULTIPROC_DIR': directory}):
+                registry._snapshot_written = False
+                registry.write_snapshot()
+                self.assertIn('test_fold_total 16', render_metrics())
+                self.assertFalse(os.path.exists(os.path.join(directory, 'metrics_99999999.json')))
+                self.assertTrue(os.path.exists(os.path.join(directory, 'aggregate.json')))
+
+                # Folding again does not count twice
+                registry.write_snapshot()
+                self.assertIn('test_fold_total 16', render_metrics())
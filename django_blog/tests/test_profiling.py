@@ -0,0 +1,60 @@
+"""
+Tests for on-demand request profiling
+"""
+import json
+from accounts.tokens import UserClaimsRefreshToken
+from posts.models import Post
+from django_blog.profiling import aggregate_profiles
+from .base import MiddlewareTestCase
+
+
+class ProfilingTest(MiddlewareTestCase):
+    """Test on-demand request profiling"""
+
+    user_is_staff = True
+
+    def setUp(self):
+        """Set up test data"""
+        super().setUp()
+        Post.objects.create(titulo='Post perfilado', contenido='Contenido', autor=self.user, status='published')
+
+    def test_staff_header_profiles_request(self):
+        """Staff users sending X-Profile get Server-Timing and a profile record"""
+        self.client.force_login(self.user)
+        with self.assertLogs('django_blog.profiling', level='INFO') as logs:
+            response = self.client.get('/api/v1/posts/', HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'sql;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'api/v1/posts/')
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['serializer_ms'], 0)
+
+    def test_stale_staff_claim_ignored(self):
+        """A token minted while the user was staff does not profile after a demotion"""
+        token = UserClaimsRefreshToken.for_user(self.user).access_token
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.get('/api/v1/posts/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_header_ignored_for_anonymous(self):
+        """The header does not enable profiling without staff permissions"""
+        response = self.client.get('/api/v1/posts/', HTTP_X_PROFILE='1')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_aggregate_percentiles_per_route(self):
+        """The report groups by route and computes percentiles"""
+        lines = [
+            f'2026-01-01 10:00:00 {{"method":"GET","route":"api/v1/posts/","total_ms":{value},"sql_count":2}}'
+            for value in range(1, 101)
+        ] + ['line without a record', '{"method":"GET","route":"api/v1/tags/","total_ms":5}']
+
+        report = aggregate_profiles(lines)
+        self.assertEqual([row['route'] for row in report], ['GET api/v1/posts/', 'GET api/v1/tags/'])
+        self.assertEqual((report[0]['p50_ms'], report[0]['p95_ms'], report[0]['p99_ms']), (50, 95, 99))
+        self.assertEqual(report[0]['avg_sql_count'], 2)
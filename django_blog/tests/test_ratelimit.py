@@ -0,0 +1,90 @@
+"""
+Tests for the route-group rate limiter and client IP resolution
+"""
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from accounts.tokens import UserClaimsRefreshToken
+from django_blog.client_ip import get_client_ip
+from django_blog.ratelimit import check_rate_limit
+from .base import MiddlewareTestCase
+
+User = get_user_model()
+
+
+RATE_LIMIT_TEST_SETTINGS = {
+    'GROUPS': {
+        'auth': {'paths': ['/api/v1/dashboard/auth/login/'], 'methods': ['POST'], 'limit': 2, 'window': 60, 'key': 'ip'},
+        'dashboard': {'paths': ['/api/v1/dashboard/'], 'limit': 3, 'window': 60},
+    },
+}
+
+
+@override_settings(RATE_LIMIT_SETTINGS=RATE_LIMIT_TEST_SETTINGS)
+class RateLimitTest(MiddlewareTestCase):
+    """Test sliding-window rate limits and client identity"""
+
+    def test_sliding_window_weights_previous_window(self):
+        """The previous window counts in proportion to its overlap"""
+        for _ in range(4):
+            check_rate_limit('scope', 'client', 4, 60, now=59)
+
+        # Halfway through the next window it weighs half: 4 * 0.5 + 2 <= 4
+        self.assertTrue(check_rate_limit('scope', 'client', 4, 60, now=90).allowed)
+        self.assertTrue(check_rate_limit('scope', 'client', 4, 60, now=90).allowed)
+        result = check_rate_limit('scope', 'client', 4, 60, now=90)
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.retry_after, 15)
+
+        # Other clients have their own counter
+        self.assertTrue(check_rate_limit('scope', 'other', 4, 60, now=90).allowed)
+
+    def test_route_group_headers_and_429(self):
+        """The middleware adds rate limit headers and answers 429 over the limit"""
+        responses = [self.client.get('/api/v1/dashboard/stats/') for _ in range(4)]
+
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '3')
+        self.assertEqual(responses[0]['X-RateLimit-Remaining'], '2')
+        self.assertNotEqual(responses[2].status_code, 429)
+        self.assertEqual(responses[3].status_code, 429)
+        self.assertIn('Retry-After', responses[3])
+
+        # Paths without a group are not limited
+        self.assertNotIn('X-RateLimit-Limit', self.client.get('/api/v1/health/'))
+
+    def test_most_specific_group_wins(self):
+        """Login uses the auth group, and only for POST"""
+        for _ in range(2):
+            self.client.post('/api/v1/dashboard/auth/login/', {}, content_type='application/json')
+        response = self.client.post('/api/v1/dashboard/auth/login/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['X-RateLimit-Limit'], '2')
+
+    def test_spoofed_forwarded_for_ignored(self):
+        """Without trusted proxies X-Forwarded-For does not change the identity"""
+        for i in range(2):
+            self.client.post('/api/v1/dashboard/auth/login/', {}, content_type='application/json',
+                             HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        response = self.client.post('/api/v1/dashboard/auth/login/', {}, content_type='application/json',
+                                    HTTP_X_FORWARDED_FOR='10.0.0.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_trusted_proxy_client_ip(self):
+        """Behind proxies the entry they appended is used, not the client's"""
+        request = self.factory.get('/', HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.7', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(get_client_ip(request), '10.0.0.1')
+        with self.settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(get_client_ip(request), '203.0.113.7')
+        with self.settings(TRUSTED_PROXY_COUNT=2):
+            self.assertEqual(get_client_ip(request), '1.2.3.4')
+
+    def test_jwt_users_limited_per_account(self):
+        """JWT users get their own counter even when they share an IP"""
+        other = User.objects.create_user(username='otheruser', email='other@example.com', password='testpass123')
+
+        def get_stats(user):
+            token = UserClaimsRefreshToken.for_user(user).access_token
+            return self.client.get('/api/v1/dashboard/stats/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        responses = [get_stats(self.user) for _ in range(4)]
+        self.assertEqual(responses[3].status_code, 429)
+        self.assertEqual(get_stats(other)['X-RateLimit-Remaining'], '2')
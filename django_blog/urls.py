@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 import time
+from .metrics import metrics_view
 
 def cors_test_view(request):
     """Simple CORS test view"""
@@ -82,6 +83,7 @@ urlpatterns = [
     path('api/v1/notifications/', include('notifications.urls')),  # Notifications API endpoints
     path('api/v1/health/', health_check, name='health_check'),  # Health check endpoint
     path('api/v1/cors-test/', cors_test_view, name='cors_test'),  # CORS testing endpoint
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
 ]
 
 # Serve media files during development
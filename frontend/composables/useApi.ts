@@ -163,6 +163,15 @@ const normalizeImageUrl = (imageUrl: string | null | undefined, baseUrl: string)
   return fullUrl
 }
 
+// Build a srcset from the server-side renditions (WebP preferred, JPEG fallback)
+const buildImageSrcset = (renditions: any, baseUrl: string): string | undefined => {
+  const rendition = renditions?.webp || renditions?.jpeg
+  if (!rendition?.variants?.length) return undefined
+  return rendition.variants
+    .map((variant: any) => `${normalizeImageUrl(variant.url, baseUrl)} ${variant.width}w`)
+    .join(', ')
+}
+
 // Data transformation utilities also remain at the top level
 const transformPost = (apiPost: any): Post => {
   // Get base URL safely
@@ -180,9 +189,12 @@ const transformPost = (apiPost: any): Post => {
     id: apiPost.id,
     title: apiPost.titulo || apiPost.title,
     slug: apiPost.slug,
-    content: apiPost.contenido || apiPost.content,
+    // Only the server-sanitized render is ever rendered with v-html
+    content: apiPost.content_html ?? '',
+    toc: apiPost.toc || [],
     excerpt: apiPost.excerpt,
     image: normalizeImageUrl(apiPost.image_url || apiPost.image || apiPost.imagen, baseUrl),
+    image_srcset: buildImageSrcset(apiPost.image_renditions, baseUrl),
     author: apiPost.author,
     category: {
       id: apiPost.category.id,
@@ -46,6 +46,9 @@ export const useNotificationStore = defineStore('notifications', () => {
     // WebSocket connection
     let ws: WebSocket | null = null
     let reconnectTimeout: NodeJS.Timeout | null = null
+    let heartbeatInterval: NodeJS.Timeout | null = null
+    const heartbeatIntervalMs = 30000 // Keeps server-side presence alive
+    let lastSeq: number | null = null // Last replay sequence number received
 
     // Helper functions to safely get composables
     const getNuxtApp = () => {
@@ -400,7 +403,12 @@ export const useNotificationStore = defineStore('notifications', () => {
 
             // Build WebSocket URL
             const wsUrl = config.public.wsBase || config.public.apiBase.replace('http', 'ws')
-            const wsEndpoint = `${wsUrl}/ws/notifications/?token=${tokens.access}`
+            let wsEndpoint = `${wsUrl}/ws/notifications/?token=${tokens.access}`
+
+            // Ask only for what was missed since the last frame we saw
+            if (lastSeq !== null) {
+                wsEndpoint += `&last_seq=${lastSeq}`
+            }
 
             ws = new WebSocket(wsEndpoint)
 
@@ -415,6 +423,8 @@ export const useNotificationStore = defineStore('notifications', () => {
                     clearTimeout(reconnectTimeout)
                     reconnectTimeout = null
                 }
+
+                startHeartbeat()
             }
 
             ws.onmessage = (event) => {
@@ -430,6 +440,7 @@ export const useNotificationStore = defineStore('notifications', () => {
                 console.log('🔌 Notifications WebSocket disconnected:', event.code, event.reason)
                 connectionStatus.value = 'disconnected'
                 isConnected.value = false
+                stopHeartbeat()
 
                 // Attempt to reconnect if not manually closed
                 if (event.code !== 1000 && reconnectAttempts.value < maxReconnectAttempts) {
@@ -462,6 +473,8 @@ export const useNotificationStore = defineStore('notifications', () => {
             reconnectTimeout = null
         }
 
+        stopHeartbeat()
+
         if (ws) {
             ws.close(1000, 'Manual disconnect')
             ws = null
@@ -490,14 +503,29 @@ export const useNotificationStore = defineStore('notifications', () => {
     }
 
     const handleWebSocketMessage = (message: WebSocketMessage): void => {
+        if (typeof message.seq === 'number') {
+            lastSeq = message.seq
+        }
+
         switch (message.type) {
             case 'connection_established':
                 console.log('🔌 WebSocket connection established')
+                if (message.replay) {
+                    message.replay.forEach(handleWebSocketMessage)
+                }
+                if (message.resync) {
+                    fetchNotifications({ page: 1 })
+                }
+                if (message.pending?.length) {
+                    message.pending.forEach(handleNewNotification)
+                    sendAck(message.pending.map(n => n.id))
+                }
                 break
 
             case 'notification':
                 if (message.notification) {
                     handleNewNotification(message.notification)
+                    sendAck([message.notification.id])
                 }
                 break
 
@@ -606,6 +634,27 @@ export const useNotificationStore = defineStore('notifications', () => {
         }
     }
 
+    const sendAck = (notificationIds: number[]): void => {
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({
+                type: 'ack',
+                notification_ids: notificationIds
+            }))
+        }
+    }
+
+    const startHeartbeat = (): void => {
+        stopHeartbeat()
+        heartbeatInterval = setInterval(sendPing, heartbeatIntervalMs)
+    }
+
+    const stopHeartbeat = (): void => {
+        if (heartbeatInterval) {
+            clearInterval(heartbeatInterval)
+            heartbeatInterval = null
+        }
+    }
+
     // Utility methods
     const clearError = (): void => {
         error.value = null
@@ -616,6 +665,7 @@ export const useNotificationStore = defineStore('notifications', () => {
     }
 
     const resetState = (): void => {
+        lastSeq = null
         notifications.value = []
         unreadCount.value = 0
         totalCount.value = 0
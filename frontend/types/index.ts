@@ -60,13 +60,21 @@ export interface Tag {
   slug: string
 }
 
+export interface TocEntry {
+  level: number
+  text: string
+  anchor: string
+}
+
 export interface Post {
   id: number
   title: string
   slug: string
   content: string
+  toc?: TocEntry[]
   excerpt: string
   image?: string
+  image_srcset?: string
   author: User
   category: Category
   tags: Tag[]
@@ -104,8 +104,13 @@ export interface SystemAnnouncement {
 }
 
 export interface WebSocketMessage {
-    type: 'notification' | 'notification_update' | 'system_announcement' | 'ping' | 'pong' | 'connection_established'
+    type: 'notification' | 'notification_update' | 'system_announcement' | 'ping' | 'pong' | 'ack' | 'connection_established'
     notification?: Notification
+    notification_ids?: number[]
+    pending?: Notification[]
+    replay?: WebSocketMessage[]
+    resync?: boolean
+    seq?: number | null
     update?: {
         type: 'marked_read' | 'marked_all_read' | 'dismissed'
         notification_id?: number
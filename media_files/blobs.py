@@ -0,0 +1,135 @@
+"""
+Content-addressed media storage
+
+Uploads are hashed (SHA-256) while being stored and indexed in
+``MediaBlob``. Uploading bytes that already exist creates a new
+``MediaFile`` row pointing at the existing blob, reusing its stored file
+and its renditions, so nothing is written or processed twice.
+"""
+import hashlib
+import logging
+import os
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .metadata import METADATA_FIELDS
+from .models import MediaBlob, MediaFile
+from .renditions import delete_renditions
+
+logger = logging.getLogger(__name__)
+
+
+def compute_sha256(file_obj):
+    """Hash a Django File/UploadedFile chunk by chunk and rewind it"""
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def get_blob_path(sha256, filename, file_type):
+    """Storage name for a blob, e.g. uploads/image/blobs/ab/ab12...ef.png"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f"uploads/{file_type}/blobs/{sha256[:2]}/{sha256}{ext}"
+
+
+def _get_or_store_blob(sha256, file_obj, filename, file_type):
+    """Lock the blob for a hash, storing the bytes if they are not stored yet"""
+    blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+    if blob and default_storage.exists(blob.file):
+        return blob
+
+    name = default_storage.save(get_blob_path(sha256, filename, file_type), file_obj)
+    if blob:
+        # Index entry survived but the bytes were lost: restore them
+        blob.file = name
+        blob.save(update_fields=['file'])
+        return blob
+
+    try:
+        with transaction.atomic():
+            return MediaBlob.objects.create(sha256=sha256, file=name, size=file_obj.size)
+    except IntegrityError:
+        # A concurrent upload of the same bytes won the race
+        default_storage.delete(name)
+        return MediaBlob.objects.select_for_update().get(sha256=sha256)
+
+
+def create_media_file(file_obj, filename, **fields):
+    """
+    Create a MediaFile, storing its bytes only if they are new
+
+    Args:
+        file_obj: Django File or UploadedFile with the content
+        filename: Original file name (used for type detection)
+        **fields: Other MediaFile fields (uploaded_by, mime_type, ...)
+
+    Returns:
+        Saved MediaFile
+    """
+    sha256 = compute_sha256(file_obj)
+    media_file = MediaFile(original_filename=filename, **fields)
+    media_file.file.name = filename
+    file_type = media_file.get_file_type()
+
+    with transaction.atomic():
+        blob = _get_or_store_blob(sha256, file_obj, filename, file_type)
+        MediaBlob.objects.filter(pk=blob.pk).update(reference_count=F('reference_count') + 1)
+
+        media_file.blob = blob
+        media_file.file = blob.file
+        media_file.file_type = file_type
+
+        # Reuse renditions already generated for the same bytes
+        sibling = MediaFile.objects.filter(
+            blob=blob, processing_status='done'
+        ).values('renditions', 'width', 'height').first()
+        if sibling and sibling['renditions'].get('source') == blob.file:
+            media_file.renditions = sibling['renditions']
+            media_file.width = sibling['width']
+            media_file.height = sibling['height']
+
+        # Same for the extracted image metadata
+        sibling = MediaFile.objects.filter(
+            blob=blob, metadata_status='done'
+        ).values(*METADATA_FIELDS).first()
+        if sibling:
+            for field, value in sibling.items():
+                setattr(media_file, field, value)
+            media_file.metadata_status = 'done'
+
+        media_file.save()
+
+    return media_file
+
+
+def release_blob(blob_id, renditions=None):
+    """
+    Drop one reference to a blob, deleting the bytes with the last one
+
+    Args:
+        blob_id: ID of the MediaBlob
+        renditions: Rendition map of the deleted MediaFile (shared by all
+            references, removed together with the blob)
+    """
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+
+        if blob.reference_count > 1:
+            MediaBlob.objects.filter(pk=blob.pk).update(reference_count=F('reference_count') - 1)
+            return
+
+        name = blob.file
+        blob.delete()
+        transaction.on_commit(lambda: _delete_blob_files(name, renditions))
+
+
+def _delete_blob_files(name, renditions):
+    try:
+        default_storage.delete(name)
+    except Exception as e:
+        logger.warning(f"Could not delete blob {name}: {str(e)}")
+    delete_renditions(renditions)
@@ -0,0 +1,203 @@
+"""
+Chunked, resumable uploads
+
+Protocol (all under ``/api/v1/media/uploads/``):
+
+1. ``POST uploads/`` with filename/total_size (+ MediaFile metadata)
+   creates a session and returns its id, the chunk size and offset 0.
+2. ``PUT uploads/<id>/`` with the raw chunk as the body and an
+   ``Upload-Offset`` header equal to the current offset appends it.
+3. ``GET uploads/<id>/`` returns the current offset, so a client that lost
+   its connection resumes from there.
+4. ``POST uploads/<id>/complete/`` (optionally with the CRC32 of the whole
+   file) turns the part file into a ``MediaFile``.
+
+Request bodies are streamed to the part file in small blocks, so memory use
+per request never exceeds one read block regardless of the chunk size.
+"""
+import logging
+import mimetypes
+import os
+import tempfile
+import zlib
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from .blobs import create_media_file
+from .models import ChunkedUpload
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkedUploadError(Exception):
+    """Upload protocol violation; ``status`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def get_chunked_upload_settings():
+    media_settings = getattr(settings, 'MEDIA_FILE_SETTINGS', {})
+    return (
+        media_settings.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024),
+        media_settings.get('MAX_CHUNKED_UPLOAD_SIZE', 1024 * 1024 * 1024),
+    )
+
+
+def get_allowed_extensions():
+    """Flattened list of extensions accepted by MediaFile"""
+    allowed = getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('ALLOWED_EXTENSIONS', {})
+    return [ext for extensions in allowed.values() for ext in extensions]
+
+
+def get_part_path(upload):
+    """Local path of the part file for an upload session"""
+    upload_dir = getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('CHUNKED_UPLOAD_DIR') or os.path.join(
+        getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None) or tempfile.gettempdir(),
+        'chunked_uploads'
+    )
+    os.makedirs(upload_dir, exist_ok=True)
+    return os.path.join(upload_dir, f"{upload.id}.part")
+
+
+def create_upload(user, filename, total_size, mime_type=None, metadata=None):
+    """
+    Start an upload session and create its empty part file
+
+    Returns:
+        ChunkedUpload instance
+    """
+    if not mime_type:
+        mime_type, _ = mimetypes.guess_type(filename)
+
+    upload = ChunkedUpload.objects.create(
+        user=user,
+        filename=filename,
+        total_size=total_size,
+        mime_type=mime_type or 'application/octet-stream',
+        metadata=metadata or {}
+    )
+    open(get_part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Stream one chunk from the request body into the part file
+
+    Args:
+        upload: ChunkedUpload session
+        offset: Byte offset declared by the client (must equal the resume offset)
+        stream: File-like request body
+        length: Content-Length of the chunk
+
+    Returns:
+        New resume offset
+
+    Raises:
+        ChunkedUploadError: On offset mismatch, oversized or truncated chunks
+    """
+    chunk_size, _ = get_chunked_upload_settings()
+
+    if upload.status != 'uploading' or upload.is_expired():
+        raise ChunkedUploadError('Upload session is no longer active', status=410)
+    if offset != upload.received_bytes:
+        raise ChunkedUploadError('Offset does not match the upload', status=409, offset=upload.received_bytes)
+    if length <= 0 or length > chunk_size:
+        raise ChunkedUploadError(f'Chunk size must be between 1 and {chunk_size} bytes')
+    if offset + length > upload.total_size:
+        raise ChunkedUploadError('Chunk exceeds the declared file size')
+
+    checksum = upload.checksum
+    remaining = length
+    with open(get_part_path(upload), 'r+b') as part:
+        part.seek(offset)
+        while remaining > 0:
+            block = stream.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            part.write(block)
+            checksum = zlib.crc32(block, checksum)
+            remaining -= len(block)
+
+    if remaining:
+        # Bytes past received_bytes are ignored and overwritten on retry
+        raise ChunkedUploadError('Chunk body is shorter than Content-Length', offset=upload.received_bytes)
+
+    # Only advance if no concurrent request moved the offset meanwhile
+    updated = ChunkedUpload.objects.filter(
+        pk=upload.pk, received_bytes=offset, status='uploading'
+    ).update(received_bytes=offset + length, checksum=checksum)
+    if not updated:
+        upload.refresh_from_db(fields=['received_bytes'])
+        raise ChunkedUploadError('Offset does not match the upload', status=409, offset=upload.received_bytes)
+
+    upload.received_bytes = offset + length
+    upload.checksum = checksum
+    return upload.received_bytes
+
+
+def complete_upload(upload, expected_checksum=None):
+    """
+    Turn a fully received upload into a MediaFile
+
+    Args:
+        upload: ChunkedUpload session
+        expected_checksum: Optional CRC32 (int or hex string) of the whole file
+
+    Returns:
+        Created MediaFile
+    """
+    if upload.status == 'complete' and upload.media_file_id:
+        return upload.media_file
+    if upload.received_bytes != upload.total_size:
+        raise ChunkedUploadError('Upload is incomplete', status=409, offset=upload.received_bytes)
+
+    if expected_checksum not in (None, ''):
+        try:
+            expected = int(expected_checksum, 16) if isinstance(expected_checksum, str) else int(expected_checksum)
+        except ValueError:
+            raise ChunkedUploadError('Invalid checksum')
+        if expected != upload.checksum:
+            raise ChunkedUploadError('Checksum mismatch')
+
+    part_path = get_part_path(upload)
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'complete':
+            return upload.media_file
+
+        with open(part_path, 'r+b') as part:
+            # Drop bytes left behind by an interrupted chunk
+            part.truncate(upload.total_size)
+            part.seek(0)
+            # Storage copies the part file in chunks instead of reading it whole
+            media_file = create_media_file(
+                File(part, name=upload.filename),
+                upload.filename,
+                file_size=upload.total_size,
+                mime_type=upload.mime_type,
+                uploaded_by=upload.user,
+                **upload.metadata
+            )
+
+        upload.status = 'complete'
+        upload.media_file = media_file
+        upload.save(update_fields=['status', 'media_file', 'updated_at'])
+
+    discard_part(upload)
+    return media_file
+
+
+def discard_part(upload):
+    """Remove the temporary part file of a session"""
+    try:
+        os.remove(get_part_path(upload))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove part file for upload {upload.id}: {str(e)}")
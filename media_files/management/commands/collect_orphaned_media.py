@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from media_files.orphans import collect_expired_uploads, collect_orphaned_media
+
+
+class Command(BaseCommand):
+    help = 'Find media files no longer referenced by the database and delete or quarantine them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Remove orphans (default is a dry-run report)')
+        parser.add_argument('--quarantine', action='store_true', help='Move orphans to the quarantine directory instead of deleting them')
+        parser.add_argument('--min-age-hours', type=float, default=None, help='Skip files modified more recently than this')
+        parser.add_argument('--batch-size', type=int, default=None, help='Orphans removed per batch')
+        parser.add_argument('--verbose-list', action='store_true', help='List every orphan found')
+
+    def handle(self, *args, **options):
+        dry_run = not (options['delete'] or options['quarantine'])
+
+        report = collect_orphaned_media(
+            dry_run=dry_run,
+            quarantine=options['quarantine'],
+            min_age_hours=options['min_age_hours'],
+            batch_size=options['batch_size'],
+            on_orphan=self.report_orphan if options['verbose_list'] else None
+        )
+        uploads = collect_expired_uploads(dry_run=dry_run)
+
+        size_mb = report['bytes'] / (1024 * 1024)
+        if dry_run:
+            self.stdout.write(
+                f"Dry run: {report['orphans']} orphaned files ({size_mb:.1f} MB) out of "
+                f"{report['scanned']} scanned, {uploads} expired chunked uploads. "
+                f"Use --delete or --quarantine to remove them."
+            )
+            return
+
+        action = 'Quarantined' if options['quarantine'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {report['removed']} of {report['orphans']} orphaned files ({size_mb:.1f} MB), "
+            f"removed {uploads} expired chunked uploads"
+        ))
+        if report['errors']:
+            self.stdout.write(self.style.ERROR(f"{report['errors']} files could not be removed (see logs)"))
+
+    def report_orphan(self, name, size):
+        self.stdout.write(f"  {name} ({size} bytes)")
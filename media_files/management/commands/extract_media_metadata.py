@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from media_files.metadata import extract_pending_metadata
+
+
+class Command(BaseCommand):
+    help = 'Extract dimensions, dominant color, perceptual hash and blurhash of pending images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum images per batch')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (0 = no pool)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+        parser.add_argument('--all', action='store_true', help='Run batches until the whole library is done')
+
+    def handle(self, *args, **options):
+        while True:
+            results = extract_pending_metadata(
+                limit=options['limit'],
+                workers=options['workers'],
+                on_result=self.report
+            )
+
+            if results:
+                failed = sum(1 for result in results if result['error'])
+                total_ms = sum(result['elapsed_ms'] for result in results)
+                self.stdout.write(
+                    f'Extracted metadata from {len(results)} images ({failed} failed) in {total_ms} ms of worker time'
+                )
+
+            if not results:
+                if not options['loop']:
+                    self.stdout.write('No pending images.')
+                    return
+                time.sleep(options['interval'])
+            elif not (options['loop'] or options['all']):
+                return
+
+    def report(self, pk, result):
+        label = f"media #{pk} {result['name']}"
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f"{label}: failed ({result['error']})"))
+        else:
+            metadata = result['metadata']
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: {metadata['width']}x{metadata['height']} "
+                f"{metadata['dominant_color']} phash={metadata['perceptual_hash']} ({result['elapsed_ms']} ms)"
+            ))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from media_files.processing import process_pending_media
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive renditions for pending uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum images per batch')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (0 = no pool)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            results = process_pending_media(
+                limit=options['limit'],
+                workers=options['workers'],
+                on_result=self.report
+            )
+
+            if results:
+                failed = sum(1 for result in results if result['error'])
+                total_ms = sum(result['elapsed_ms'] for result in results)
+                self.stdout.write(
+                    f'Processed {len(results)} images ({failed} failed) in {total_ms} ms of worker time'
+                )
+
+            if not options['loop']:
+                if not results:
+                    self.stdout.write('No pending images.')
+                return
+            if not results:
+                time.sleep(options['interval'])
+
+    def report(self, kind, pk, result):
+        label = f"{kind} #{pk} {result['name']}"
+        if result['error']:
+            self.stdout.write(self.style.ERROR(f"{label}: failed after {result['elapsed_ms']} ms ({result['error']})"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{label}: {result['elapsed_ms']} ms"))
@@ -0,0 +1,290 @@
+"""
+Image metadata extraction stage
+
+Fills the descriptive fields of image ``MediaFile`` rows outside the
+request cycle:
+
+* ``width``/``height`` of the image as displayed (EXIF orientation applied),
+* ``dominant_color`` for solid-color placeholders,
+* ``blurhash``, a ~30 character blurred preview decoded by the client,
+* ``perceptual_hash``, a 64-bit difference hash; images that look the same
+  (resized, recompressed, lightly edited) have hashes a few bits apart,
+  which is what ``find_similar_media`` uses to detect near-duplicates.
+
+Images are decoded at a reduced scale (JPEG draft mode) since every value
+is computed from a small thumbnail. Batches run in the same bounded process
+pool as the renditions stage::
+
+    extract_pending_metadata(limit=100, workers=2)
+"""
+import logging
+import math
+import time
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from .models import MediaFile
+from .processing import _run_in_pool, get_processing_settings
+from .renditions import EXIF_ORIENTATION, ROTATED_ORIENTATIONS
+
+logger = logging.getLogger(__name__)
+
+# Fields written by this stage (copied as-is between rows sharing a blob)
+METADATA_FIELDS = ['width', 'height', 'dominant_color', 'perceptual_hash', 'blurhash']
+
+DECODE_SIZE = 256
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+BLURHASH_SAMPLE_SIZE = 32
+BASE83_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def get_similarity_threshold():
+    return getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('SIMILAR_IMAGE_MAX_DISTANCE', 6)
+
+
+def _flatten(image):
+    """RGB copy of an image, transparent areas composited on white"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def difference_hash(image):
+    """
+    64-bit difference hash (dHash) as 16 hex characters
+
+    Each bit tells if a pixel is brighter than its right neighbour in a
+    9x8 grayscale thumbnail, so the hash survives scaling and recompression.
+    """
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            offset = row * (HASH_SIZE + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return f'{value:016x}'
+
+
+def dominant_color(image):
+    """Most common color of a 5-color median-cut palette as '#rrggbb'"""
+    small = image.copy()
+    small.thumbnail((64, 64))
+    palette_image = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(palette_image.getcolors())
+    palette = palette_image.getpalette()
+    return '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _encode83(value, length):
+    return ''.join(
+        BASE83_CHARS[(value // 83 ** (length - position)) % 83]
+        for position in range(1, length + 1)
+    )
+
+
+def blurhash(image, components_x=4, components_y=3):
+    """
+    Encode a BlurHash placeholder (https://blurha.sh)
+
+    Args:
+        image: RGB image (sampled down to 32px, so its size does not matter)
+        components_x: Horizontal DCT components (1-9)
+        components_y: Vertical DCT components (1-9)
+
+    Returns:
+        BlurHash string
+    """
+    small = image.resize((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE), Image.Resampling.BOX)
+    width, height = small.size
+    pixels = [tuple(_srgb_to_linear(channel) for channel in pixel) for pixel in small.getdata()]
+
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(components_x)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(components_y)]
+
+    factors = []
+    for j in range(components_y):
+        for i in range(components_x):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            red = green = blue = 0.0
+            for y in range(height):
+                row_basis = cos_y[j][y]
+                for x in range(width):
+                    basis = cos_x[i][x] * row_basis
+                    pixel = pixels[y * width + x]
+                    red += basis * pixel[0]
+                    green += basis * pixel[1]
+                    blue += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((red * scale, green * scale, blue * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((components_x - 1) + (components_y - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+
+    def quantise(value):
+        signed = math.copysign(abs(value / max_value) ** 0.5, value)
+        return max(0, min(18, int(signed * 9 + 9.5)))
+
+    for factor in ac:
+        result += _encode83(quantise(factor[0]) * 19 * 19 + quantise(factor[1]) * 19 + quantise(factor[2]), 2)
+
+    return result
+
+
+def extract_metadata(name):
+    """
+    Extract the metadata of one stored image (runs inside a pool worker)
+
+    Args:
+        name: Storage name of the image
+
+    Returns:
+        Dict with ``name``, ``metadata``, ``elapsed_ms`` and ``error``
+    """
+    started = time.perf_counter()
+    metadata = {}
+    error = None
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # Full-size dimensions are known before decoding anything
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+            image.draft('RGB', (DECODE_SIZE, DECODE_SIZE))
+            image = ImageOps.exif_transpose(image)
+            image = _flatten(image)
+
+        components = (4, 3) if width >= height else (3, 4)
+        metadata = {
+            'width': width,
+            'height': height,
+            'dominant_color': dominant_color(image),
+            'perceptual_hash': difference_hash(image),
+            'blurhash': blurhash(image, *components),
+        }
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    return {'name': name, 'metadata': metadata, 'elapsed_ms': elapsed_ms, 'error': error}
+
+
+def collect_pending_metadata(limit=None):
+    """
+    Find images without extracted metadata
+
+    Returns:
+        List of ``('media', pk, name)`` jobs, one per stored file
+    """
+    media_files = MediaFile.objects.filter(
+        metadata_status='pending', file_type='image'
+    ).values_list('pk', 'file')
+    if limit:
+        media_files = media_files[:limit]
+    # Rows sharing a blob are extracted once (see apply_metadata)
+    return list({name: ('media', pk, name) for pk, name in media_files}.values())
+
+
+def apply_metadata(pk, result):
+    """Store an extraction result on every pending row of the same file"""
+    updates = dict(result.get('metadata') or {})
+    updates['metadata_status'] = 'done' if updates else 'failed'
+    MediaFile.objects.filter(file=result['name'], metadata_status='pending').update(**updates)
+    return MediaFile.objects.filter(pk=pk, file=result['name']).update(**updates) > 0
+
+
+def extract_pending_metadata(limit=None, workers=None, on_result=None):
+    """
+    Extract metadata for pending images in a bounded process pool
+
+    Args:
+        limit: Maximum number of images (defaults to PROCESSING_BATCH_SIZE)
+        workers: Pool size; 0 extracts in the current process
+        on_result: Optional callback ``(pk, result)`` for reporting
+
+    Returns:
+        List of result dicts, each including ``pk``
+    """
+    default_workers, batch_size, max_image_pixels = get_processing_settings()
+    workers = default_workers if workers is None else workers
+    jobs = collect_pending_metadata(limit or batch_size)
+    if not jobs:
+        return []
+
+    if workers > 0:
+        completed = _run_in_pool(jobs, min(workers, len(jobs)), max_image_pixels, task=extract_metadata)
+    else:
+        completed = ((job, extract_metadata(job[2])) for job in jobs)
+
+    results = []
+    for (_, pk, name), result in completed:
+        apply_metadata(pk, result)
+        result['pk'] = pk
+        results.append(result)
+
+        if result['error']:
+            logger.warning(f"Failed to extract metadata from {name}: {result['error']}")
+        if on_result:
+            on_result(pk, result)
+
+    return results
+
+
+def find_similar_media(media_file, max_distance=None):
+    """
+    Find images that look like a given one
+
+    Args:
+        media_file: MediaFile with a perceptual hash
+        max_distance: Maximum differing hash bits (defaults to
+            SIMILAR_IMAGE_MAX_DISTANCE); 0 only matches identical hashes
+
+    Returns:
+        List of ``(distance, media_file_id)`` sorted by distance
+    """
+    if not media_file.perceptual_hash:
+        return []
+
+    max_distance = get_similarity_threshold() if max_distance is None else max_distance
+    candidates = MediaFile.objects.exclude(pk=media_file.pk).exclude(perceptual_hash='')
+    if max_distance == 0:
+        candidates = candidates.filter(perceptual_hash=media_file.perceptual_hash)
+
+    target = int(media_file.perceptual_hash, 16)
+    matches = []
+    # Hashes are 16 characters, so scanning them is cheap even for large libraries
+    for pk, perceptual_hash in candidates.values_list('pk', 'perceptual_hash').iterator(chunk_size=2000):
+        distance = (target ^ int(perceptual_hash, 16)).bit_count()
+        if distance <= max_distance:
+            matches.append((distance, pk))
+    return sorted(matches)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_files', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, help_text='Responsive resized copies'),
+        ),
+    ]
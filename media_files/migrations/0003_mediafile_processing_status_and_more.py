@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_images_pending(apps, schema_editor):
+    from media_files.renditions import supports_renditions
+
+    MediaFile = apps.get_model('media_files', 'MediaFile')
+    pending_ids = [
+        pk for pk, name in MediaFile.objects.filter(file_type='image').values_list('pk', 'file')
+        if supports_renditions(name)
+    ]
+    MediaFile.objects.filter(pk__in=pending_ids).update(processing_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_files', '0002_mediafile_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='done', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['processing_status'], name='media_files_process_4a97ab_idx'),
+        ),
+        migrations.RunPython(mark_existing_images_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_catalog_index(apps, schema_editor):
+    from media_files.search import normalize_tag, tokenize
+
+    MediaFile = apps.get_model('media_files', 'MediaFile')
+    MediaTag = apps.get_model('media_files', 'MediaTag')
+    MediaFileTag = apps.get_model('media_files', 'MediaFileTag')
+    MediaSearchToken = apps.get_model('media_files', 'MediaSearchToken')
+
+    fields = ['original_filename', 'alt_text', 'caption', 'description', 'tags']
+    for media_file in MediaFile.objects.only('pk', *fields).iterator():
+        tokens = set()
+        for field in fields:
+            tokens |= tokenize(getattr(media_file, field))
+        MediaSearchToken.objects.bulk_create(
+            [MediaSearchToken(media_file_id=media_file.pk, token=token) for token in tokens],
+            ignore_conflicts=True
+        )
+
+        for name in {normalize_tag(tag) for tag in media_file.tags.split(',')} - {''}:
+            tag, _ = MediaTag.objects.get_or_create(name=name)
+            MediaFileTag.objects.get_or_create(media_file_id=media_file.pk, tag=tag)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_files', '0005_mediablob_mediafile_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MediaFileTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='media_files.mediafile')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='media_files.mediatag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='media_files', through='media_files.MediaFileTag', to='media_files.mediatag'),
+        ),
+        migrations.CreateModel(
+            name='MediaSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='media_files.mediafile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token'], name='media_search_token_prefix', opclasses=['varchar_pattern_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('token', 'media_file'), name='unique_media_search_token')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mediafiletag',
+            index=models.Index(fields=['tag', 'media_file'], name='media_files_tag_id_061272_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mediafiletag',
+            constraint=models.UniqueConstraint(fields=('media_file', 'tag'), name='unique_media_file_tag'),
+        ),
+        migrations.RunPython(build_catalog_index, migrations.RunPython.noop),
+    ]
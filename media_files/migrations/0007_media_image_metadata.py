@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_files', '0006_media_catalog_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='blurhash',
+            field=models.CharField(blank=True, help_text='Low-quality placeholder', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='dominant_color',
+            field=models.CharField(blank=True, help_text='Hex color, e.g. #a0522d', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='metadata_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, help_text='64-bit difference hash (hex)', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['metadata_status', 'file_type'], name='media_files_metadat_dc304b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['perceptual_hash'], name='media_files_percept_cff58e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=models.Index(fields=['width', 'height'], name='media_files_width_954589_idx'),
+        ),
+    ]
@@ -4,7 +4,13 @@ from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 import os
 import uuid
+from datetime import timedelta
 from django.conf import settings
+from .renditions import supports_renditions
+
+
+# Fields covered by the media search index and tag table
+INDEXED_FIELDS = ['original_filename', 'alt_text', 'caption', 'description', 'tags']
 
 
 def get_upload_path(instance, filename):
@@ -24,6 +30,24 @@ def get_upload_path(instance, filename):
     return f'uploads/{file_type}/{date_path}/{filename}'
 
 
+class MediaBlob(models.Model):
+    """
+    Content-addressed stored file shared by identical uploads
+    
+    ``reference_count`` is the number of ``MediaFile`` rows pointing at the
+    blob; the stored bytes are removed when the last reference goes.
+    """
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.CharField(max_length=255)  # Storage name
+    size = models.PositiveBigIntegerField()
+    reference_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.reference_count} refs)"
+
+
 class MediaFile(models.Model):
     """
     Model for handling all types of media files
@@ -37,7 +61,14 @@ class MediaFile(models.Model):
         ('other', 'Other'),
     ]
     
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
     # Basic file information
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='media_files')
     file = models.FileField(
         upload_to=get_upload_path,
         validators=[
@@ -66,6 +97,12 @@ class MediaFile(models.Model):
     # Image-specific fields
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True, help_text="Responsive resized copies")
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUSES, default='done')
+    dominant_color = models.CharField(max_length=7, blank=True, help_text="Hex color, e.g. #a0522d")
+    perceptual_hash = models.CharField(max_length=16, blank=True, help_text="64-bit difference hash (hex)")
+    blurhash = models.CharField(max_length=64, blank=True, help_text="Low-quality placeholder")
+    metadata_status = models.CharField(max_length=20, choices=PROCESSING_STATUSES, default='pending')
     
     # Metadata
     alt_text = models.CharField(max_length=255, blank=True)
@@ -83,6 +120,7 @@ class MediaFile(models.Model):
     
     # SEO and organization
     tags = models.CharField(max_length=500, blank=True, help_text="Comma-separated tags")
+    tag_set = models.ManyToManyField('MediaTag', through='MediaFileTag', related_name='media_files', blank=True)
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -90,6 +128,10 @@ class MediaFile(models.Model):
             models.Index(fields=['file_type', '-uploaded_at']),
             models.Index(fields=['uploaded_by', '-uploaded_at']),
             models.Index(fields=['is_public', '-uploaded_at']),
+            models.Index(fields=['processing_status']),
+            models.Index(fields=['metadata_status', 'file_type']),
+            models.Index(fields=['perceptual_hash']),
+            models.Index(fields=['width', 'height']),
         ]
     
     def __str__(self):
@@ -104,8 +146,29 @@ class MediaFile(models.Model):
             # Determine file type from extension
             if not self.file_type:
                 self.file_type = self.get_file_type()
+            
+            # Queue resized renditions for the processing stage
+            if self.needs_processing():
+                self.processing_status = 'pending'
         
         super().save(*args, **kwargs)
+        
+        # Keep normalized tags and the search index in sync
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(INDEXED_FIELDS):
+            from .search import index_media_file
+            index_media_file(self)
+    
+    def needs_processing(self):
+        """
+        Check if the stored image has no renditions for its current file
+        """
+        return (
+            bool(self.file)
+            and self.get_file_type() == 'image'
+            and supports_renditions(self.file.name)
+            and self.renditions.get('source') != self.file.name
+        )
     
     def get_file_type(self):
         """
@@ -153,10 +216,20 @@ class MediaFile(models.Model):
     
     def increment_download_count(self):
         """
-        Increment download counter
+        Increment download counter (buffered, written in batches)
         """
-        self.download_count += 1
-        self.save(update_fields=['download_count'])
+        from .download_counts import DownloadCountBuffer
+        DownloadCountBuffer.record(self.pk)
+    
+    def get_download_url(self):
+        """
+        Get the serving URL; hashed URLs are cached as immutable
+        """
+        from django.urls import reverse
+        url = reverse('media_files:file-download', kwargs={'pk': self.pk})
+        if self.blob_id:
+            url = f"{url}?v={self.blob.sha256[:16]}"
+        return url
     
     def get_tags_list(self):
         """
@@ -164,4 +237,97 @@ class MediaFile(models.Model):
         """
         if self.tags:
             return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
-        return []
\ No newline at end of file
+        return []
+
+
+class MediaTag(models.Model):
+    """
+    Normalized media tag (lowercase, single-spaced)
+    """
+    name = models.CharField(max_length=50, unique=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class MediaFileTag(models.Model):
+    """
+    Through table between media files and tags
+    """
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE)
+    tag = models.ForeignKey(MediaTag, on_delete=models.CASCADE)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['media_file', 'tag'], name='unique_media_file_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'media_file']),
+        ]
+
+
+class MediaSearchToken(models.Model):
+    """
+    Inverted search index: one row per distinct token of a media file
+    
+    Tokens come from the filename, alt text, caption, description and tags
+    (see media_files.search.tokenize).
+    """
+    token = models.CharField(max_length=64)
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name='search_tokens')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'media_file'], name='unique_media_search_token'),
+        ]
+        indexes = [
+            # Prefix lookups (token LIKE 'abc%'); opclasses only apply on PostgreSQL
+            models.Index(fields=['token'], name='media_search_token_prefix', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload session
+
+    Chunks are appended to a temporary part file in order; ``received_bytes``
+    is the resume offset and ``checksum`` the running CRC32 of everything
+    received so far. The ``MediaFile`` is created on completion.
+    """
+    
+    STATUSES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    mime_type = models.CharField(max_length=100)
+    total_size = models.PositiveBigIntegerField()
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    checksum = models.PositiveBigIntegerField(default=0)  # Running CRC32
+    metadata = models.JSONField(default=dict, blank=True)  # MediaFile fields to apply on completion
+    status = models.CharField(max_length=20, choices=STATUSES, default='uploading')
+    media_file = models.ForeignKey(MediaFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+    
+    def is_expired(self):
+        """
+        Check if the session has been idle longer than the expiry window
+        """
+        expiry_hours = getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+        return self.updated_at < timezone.now() - timedelta(hours=expiry_hours)
@@ -0,0 +1,211 @@
+"""
+Orphaned media garbage collection
+
+Mark and sweep over the media storage:
+
+* **mark** collects every storage name still referenced by the database:
+  ``MediaFile.file``, ``MediaBlob.file``, rendition maps, ``Post.imagen``,
+  ``UserProfile.avatar`` and media URLs embedded in ``Post.contenido``
+  (``src``, ``srcset``, links, ...).
+* **sweep** walks the storage one directory at a time and deletes, or moves
+  to a quarantine directory, the files nobody references, in batches.
+
+Files younger than a grace period are never touched, so an upload whose
+row is not committed yet cannot be collected. Each batch is re-checked
+against the file fields right before it is removed.
+
+Expired chunked-upload sessions and their part files are cleaned up too.
+"""
+import logging
+import re
+from datetime import timedelta
+from urllib.parse import unquote, urlparse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .chunked import discard_part
+from .models import ChunkedUpload, MediaBlob, MediaFile
+
+logger = logging.getLogger(__name__)
+
+
+def get_gc_settings():
+    media_settings = getattr(settings, 'MEDIA_FILE_SETTINGS', {})
+    return (
+        media_settings.get('GC_QUARANTINE_DIR', 'quarantine'),
+        media_settings.get('GC_MIN_AGE_HOURS', 24),
+        media_settings.get('GC_BATCH_SIZE', 500),
+    )
+
+
+def _rendition_paths(renditions):
+    for variants in (renditions or {}).get('formats', {}).values():
+        for variant in variants:
+            yield variant['path']
+
+
+def _media_url_re():
+    """Regex capturing storage names in URLs under MEDIA_URL"""
+    media_path = urlparse(settings.MEDIA_URL).path or '/'
+    return re.compile(re.escape(media_path) + r'([^"\'\s?#<>),]+)')
+
+
+def find_content_references(html, pattern=None):
+    """Storage names referenced by media URLs inside an HTML fragment"""
+    pattern = pattern or _media_url_re()
+    return {unquote(name) for name in pattern.findall(html or '')}
+
+
+def collect_referenced_names():
+    """
+    Mark phase: every storage name referenced by the database
+
+    Returns:
+        Set of storage names
+    """
+    from accounts.models import UserProfile
+    from posts.models import Post
+
+    referenced = set()
+    referenced.update(MediaBlob.objects.values_list('file', flat=True).iterator())
+    for name, renditions in MediaFile.objects.values_list('file', 'renditions').iterator():
+        referenced.add(name)
+        referenced.update(_rendition_paths(renditions))
+
+    content_re = _media_url_re()
+    posts = Post.objects.values_list('imagen', 'imagen_renditions', 'contenido')
+    for name, renditions, contenido in posts.iterator():
+        referenced.add(name)
+        referenced.update(_rendition_paths(renditions))
+        referenced.update(find_content_references(contenido, content_re))
+
+    referenced.update(UserProfile.objects.values_list('avatar', flat=True).iterator())
+    referenced.discard('')
+    referenced.discard(None)
+    return referenced
+
+
+def iter_storage_files(storage=None, path='', exclude=()):
+    """
+    Walk a storage directory by directory, yielding file names
+
+    Directories are listed lazily, as the walk reaches them.
+    """
+    storage = storage or default_storage
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+
+    for filename in files:
+        yield f'{path}/{filename}' if path else filename
+    for directory in sorted(directories):
+        subpath = f'{path}/{directory}' if path else directory
+        if subpath not in exclude:
+            yield from iter_storage_files(storage, subpath, exclude)
+
+
+def _still_referenced(names):
+    """Re-check a batch against the file fields (cheap indexed lookups)"""
+    from accounts.models import UserProfile
+    from posts.models import Post
+
+    names = list(names)
+    return (
+        set(MediaFile.objects.filter(file__in=names).values_list('file', flat=True))
+        | set(MediaBlob.objects.filter(file__in=names).values_list('file', flat=True))
+        | set(Post.objects.filter(imagen__in=names).values_list('imagen', flat=True))
+        | set(UserProfile.objects.filter(avatar__in=names).values_list('avatar', flat=True))
+    )
+
+
+def _remove(storage, name, quarantine_dir):
+    if quarantine_dir:
+        target = f"{quarantine_dir}/{timezone.now():%Y%m%d}/{name}"
+        with storage.open(name, 'rb') as source:
+            storage.save(target, source)
+    storage.delete(name)
+
+
+def collect_orphaned_media(dry_run=True, quarantine=False, min_age_hours=None,
+                           batch_size=None, storage=None, on_orphan=None):
+    """
+    Find orphaned media files and delete or quarantine them
+
+    Args:
+        dry_run: Only report, do not touch any file
+        quarantine: Move orphans under GC_QUARANTINE_DIR instead of deleting
+        min_age_hours: Grace period (defaults to GC_MIN_AGE_HOURS)
+        batch_size: Orphans removed per batch (defaults to GC_BATCH_SIZE)
+        storage: Storage backend (defaults to ``default_storage``)
+        on_orphan: Optional callback ``(name, size)`` for reporting
+
+    Returns:
+        Dict with ``scanned``, ``orphans``, ``bytes``, ``removed`` and ``errors``
+    """
+    storage = storage or default_storage
+    quarantine_dir, default_min_age, default_batch_size = get_gc_settings()
+    min_age_hours = default_min_age if min_age_hours is None else min_age_hours
+    batch_size = batch_size or default_batch_size
+    cutoff = timezone.now() - timedelta(hours=min_age_hours)
+
+    referenced = collect_referenced_names()
+    report = {'scanned': 0, 'orphans': 0, 'bytes': 0, 'removed': 0, 'errors': 0}
+    batch = {}
+
+    def sweep(batch):
+        for name in set(batch) - _still_referenced(batch):
+            try:
+                _remove(storage, name, quarantine_dir if quarantine else None)
+                report['removed'] += 1
+            except Exception as e:
+                report['errors'] += 1
+                logger.warning(f"Could not remove orphaned media {name}: {str(e)}")
+
+    for name in iter_storage_files(storage, exclude={quarantine_dir}):
+        report['scanned'] += 1
+        if name in referenced:
+            continue
+        try:
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            size = storage.size(name)
+        except (FileNotFoundError, NotImplementedError):
+            continue
+
+        report['orphans'] += 1
+        report['bytes'] += size
+        if on_orphan:
+            on_orphan(name, size)
+
+        if not dry_run:
+            batch[name] = size
+            if len(batch) >= batch_size:
+                sweep(batch)
+                batch = {}
+
+    if batch:
+        sweep(batch)
+    return report
+
+
+def collect_expired_uploads(dry_run=True):
+    """
+    Remove chunked-upload sessions idle past CHUNKED_UPLOAD_EXPIRY_HOURS
+
+    Returns:
+        Number of expired sessions
+    """
+    expiry_hours = getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+    expired = ChunkedUpload.objects.exclude(status='complete').filter(
+        updated_at__lt=timezone.now() - timedelta(hours=expiry_hours)
+    )
+    if dry_run:
+        return expired.count()
+
+    count = 0
+    for upload in expired.iterator():
+        discard_part(upload)
+        upload.delete()
+        count += 1
+    return count
@@ -0,0 +1,230 @@
+"""
+Image processing stage
+
+Uploads only persist the original file and mark it as pending. This module
+turns pending images (``MediaFile`` rows and ``Post.imagen``) into
+responsive renditions outside the request cycle, using a bounded process
+pool so that Pillow's decode/resize/encode work never runs in a web worker.
+
+Entry point for job queues and the ``process_media`` management command::
+
+    process_pending_media(limit=100, workers=2)
+
+Workers only touch storage; every database write happens in the calling
+process once a result comes back.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTextTransform
+from django_blog.metrics import MEDIA_PROCESSING
+from PIL import Image
+from .models import MediaFile
+from .renditions import delete_renditions, generate_renditions, supports_renditions
+
+logger = logging.getLogger(__name__)
+
+
+def get_processing_settings():
+    media_settings = getattr(settings, 'MEDIA_FILE_SETTINGS', {})
+    return (
+        media_settings.get('PROCESSING_WORKERS', 2),
+        media_settings.get('PROCESSING_BATCH_SIZE', 50),
+        media_settings.get('MAX_IMAGE_PIXELS', 40_000_000),
+    )
+
+
+def _init_worker(max_image_pixels):
+    """Prepare a pool worker (needed when processes are spawned, not forked)"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    # Refuse decompression bombs instead of allocating huge bitmaps
+    Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+
+def process_image(name):
+    """
+    Generate renditions for one stored image (runs inside a pool worker)
+
+    Args:
+        name: Storage name of the original image
+
+    Returns:
+        Dict with ``name``, ``renditions``, ``elapsed_ms`` and ``error``
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        renditions = generate_renditions(name)
+        if not renditions:
+            error = 'Image could not be decoded'
+    except Exception as e:
+        renditions = {}
+        error = str(e)
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    if renditions:
+        renditions['processing_ms'] = elapsed_ms
+    return {'name': name, 'renditions': renditions, 'elapsed_ms': elapsed_ms, 'error': error}
+
+
+def collect_pending_jobs(limit=None):
+    """
+    Find images that still need renditions
+
+    Returns:
+        List of ``(kind, pk, name)`` tuples, ``kind`` being 'media' or 'post'
+    """
+    from posts.models import Post
+
+    media_files = MediaFile.objects.filter(processing_status='pending').values_list('pk', 'file')
+    if limit:
+        media_files = media_files[:limit]
+    # Rows sharing a blob are processed once (see apply_result)
+    jobs = list({name: ('media', pk, name) for pk, name in media_files}.values())
+
+    if limit and len(jobs) >= limit:
+        return jobs
+
+    posts = Post.objects.exclude(imagen='').exclude(imagen__isnull=True).annotate(
+        renditions_source=KeyTextTransform('source', 'imagen_renditions')
+    ).filter(
+        Q(renditions_source__isnull=True) | ~Q(renditions_source=F('imagen'))
+    ).values_list('pk', 'imagen')
+    for pk, name in posts.iterator():
+        if supports_renditions(name):
+            jobs.append(('post', pk, name))
+            if limit and len(jobs) >= limit:
+                break
+
+    return jobs
+
+
+def apply_result(kind, pk, result):
+    """
+    Store a processing result on its owner row
+
+    Renditions for a file that was replaced or deleted while processing
+    are discarded instead of being attached to the new file.
+    """
+    from posts.models import Post
+
+    renditions = result.get('renditions') or {}
+    if kind == 'media':
+        owner = MediaFile.objects.filter(pk=pk, file=result['name']).first()
+        previous = owner.renditions if owner else None
+    else:
+        owner = Post.objects.filter(pk=pk, imagen=result['name']).first()
+        previous = owner.imagen_renditions if owner else None
+
+    if owner is None:
+        delete_renditions(renditions)
+        return False
+
+    if previous and previous.get('source') != result['name']:
+        delete_renditions(previous)
+
+    if kind == 'media':
+        updates = {
+            'renditions': renditions,
+            'processing_status': 'done' if renditions else 'failed',
+        }
+        if renditions:
+            updates['width'] = renditions['width']
+            updates['height'] = renditions['height']
+        # Every pending row pointing at the same stored file shares the result
+        MediaFile.objects.filter(file=result['name'], processing_status='pending').update(**updates)
+        MediaFile.objects.filter(pk=pk).update(**updates)
+    else:
+        # Record failures too so the same file is not retried forever
+        Post.objects.filter(pk=pk).update(
+            imagen_renditions=renditions or {'source': result['name'], 'error': result['error']}
+        )
+    return True
+
+
+def _run_in_pool(jobs, workers, max_image_pixels, task=process_image):
+    """
+    Yield ``(job, result)`` keeping at most two tasks per worker in flight
+
+    ``task`` is called in a worker with the storage name of each job.
+    """
+    # Forked workers must not share the parent's database sockets
+    connections.close_all()
+
+    pending_jobs = iter(jobs)
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(max_image_pixels,)
+    ) as pool:
+        in_flight = {}
+        while True:
+            while len(in_flight) < max_in_flight:
+                job = next(pending_jobs, None)
+                if job is None:
+                    break
+                in_flight[pool.submit(task, job[2])] = job
+
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'name': job[2], 'elapsed_ms': 0, 'error': str(e)}
+                yield job, result
+
+
+def process_pending_media(limit=None, workers=None, on_result=None):
+    """
+    Process pending images in a bounded process pool
+
+    Args:
+        limit: Maximum number of images (defaults to PROCESSING_BATCH_SIZE)
+        workers: Pool size; 0 processes in the current process
+        on_result: Optional callback ``(kind, pk, result)`` for reporting
+
+    Returns:
+        List of result dicts, each including ``kind`` and ``pk``
+    """
+    default_workers, batch_size, max_image_pixels = get_processing_settings()
+    workers = default_workers if workers is None else workers
+    jobs = collect_pending_jobs(limit or batch_size)
+    if not jobs:
+        return []
+
+    if workers > 0:
+        completed = _run_in_pool(jobs, min(workers, len(jobs)), max_image_pixels)
+    else:
+        completed = ((job, process_image(job[2])) for job in jobs)
+
+    results = []
+    for (kind, pk, name), result in completed:
+        apply_result(kind, pk, result)
+        result.update(kind=kind, pk=pk)
+        MEDIA_PROCESSING.observe(result['elapsed_ms'] / 1000, kind, 'failed' if result.get('error') else 'processed')
+        results.append(result)
+
+        if result['error']:
+            logger.warning(f"Failed to process {name} after {result['elapsed_ms']} ms: {result['error']}")
+        else:
+            logger.info(f"Processed {name} in {result['elapsed_ms']} ms")
+        if on_result:
+            on_result(kind, pk, result)
+
+    # Posts whose content was waiting for these images get re-rendered
+    from posts.content import refresh_pending_content
+    refresh_pending_content(result['name'] for result in results if result['kind'] == 'media')
+
+    return results
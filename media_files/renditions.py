@@ -0,0 +1,201 @@
+"""
+Responsive image renditions
+
+Every uploaded raster image is resized to a configurable set of widths and
+encoded in each configured format (WebP plus a JPEG fallback by default).
+The generated files live next to the original and are described by a small
+JSON map stored on the owning model, which serializers expose as
+``srcset``-ready data so pages never download full-size images for
+thumbnails.
+
+Stored map layout::
+
+    {
+        'source': 'uploads/image/2026/01/01/abc.png',
+        'width': 2400,
+        'height': 1600,
+        'formats': {
+            'webp': [{'path': '..._320w.webp', 'width': 320, 'height': 213}, ...],
+            'jpeg': [{'path': '..._320w.jpg', 'width': 320, 'height': 213}, ...],
+        },
+    }
+"""
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Output format -> (Pillow format name, file extension)
+FORMATS = {
+    'avif': ('AVIF', 'avif'),
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Raster formats that get renditions (SVG and animated GIF are served as-is)
+SOURCE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'bmp', 'tiff'}
+
+
+def get_rendition_settings():
+    media_settings = getattr(settings, 'MEDIA_FILE_SETTINGS', {})
+    return (
+        sorted(media_settings.get('RENDITION_WIDTHS', [320, 640, 1024, 1920])),
+        media_settings.get('RENDITION_FORMATS', ['webp', 'jpeg']),
+        media_settings.get('IMAGE_QUALITY', 85),
+    )
+
+
+def is_format_supported(output_format):
+    """Check if the installed Pillow build can encode a format"""
+    if output_format not in FORMATS:
+        return False
+    Image.init()
+    return FORMATS[output_format][0] in Image.SAVE
+
+
+def supports_renditions(name):
+    """Check if a stored file is a raster image that gets renditions"""
+    if not name:
+        return False
+    ext = os.path.splitext(name)[1].lstrip('.').lower()
+    return ext in SOURCE_EXTENSIONS
+
+
+def _target_widths(source_width, widths):
+    """Widths to generate; never upscale, always at least one rendition"""
+    targets = [width for width in widths if width < source_width]
+    if not targets or source_width <= widths[-1]:
+        targets.append(source_width)
+    return targets
+
+
+def _prepare_for_format(image, output_format):
+    """Flatten transparency for formats without alpha support"""
+    if output_format == 'jpeg' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            return background
+        return image.convert('RGB')
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    return image
+
+
+def generate_renditions(name, storage=None):
+    """
+    Generate the rendition files for a stored image
+
+    Args:
+        name: Storage name of the original image
+        storage: Storage backend (defaults to ``default_storage``)
+
+    Returns:
+        Rendition map (see module docstring), or an empty dict if the file
+        is not a supported raster image or cannot be decoded
+    """
+    storage = storage or default_storage
+    if not supports_renditions(name):
+        return {}
+
+    widths, formats, quality = get_rendition_settings()
+    formats = [output_format for output_format in formats if is_format_supported(output_format)]
+
+    try:
+        with storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            source_width, source_height = image.size
+            if image.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+                source_width, source_height = source_height, source_width
+
+            # Let JPEG decode at a reduced scale when the original is much
+            # larger than the biggest rendition (bounds memory per image)
+            image.draft(None, (widths[-1], widths[-1]))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except Exception as e:
+        logger.warning(f"Could not open image {name} for renditions: {str(e)}")
+        return {}
+
+    root = os.path.splitext(name)[0]
+    renditions = {
+        'source': name,
+        'width': source_width,
+        'height': source_height,
+        'formats': {output_format: [] for output_format in formats},
+    }
+
+    for width in _target_widths(source_width, widths):
+        height = max(1, round(source_height * width / source_width))
+        resized = image if image.size == (width, height) else image.resize(
+            (width, height), Image.Resampling.LANCZOS
+        )
+
+        for output_format in formats:
+            pil_format, extension = FORMATS[output_format]
+            output = io.BytesIO()
+            _prepare_for_format(resized, output_format).save(
+                output, format=pil_format, quality=quality, optimize=True
+            )
+
+            path = f"{root}_{width}w.{extension}"
+            if storage.exists(path):
+                storage.delete(path)
+            path = storage.save(path, ContentFile(output.getvalue()))
+            renditions['formats'][output_format].append({
+                'path': path,
+                'width': width,
+                'height': height,
+            })
+
+    return renditions
+
+
+def delete_renditions(renditions, storage=None):
+    """Delete the files described by a rendition map"""
+    storage = storage or default_storage
+    for variants in (renditions or {}).get('formats', {}).values():
+        for variant in variants:
+            try:
+                storage.delete(variant['path'])
+            except Exception as e:
+                logger.warning(f"Could not delete rendition {variant.get('path')}: {str(e)}")
+
+
+def serialize_renditions(renditions, storage=None):
+    """
+    Build the ``srcset``-ready representation of a rendition map
+
+    Returns:
+        Dict keyed by format with ``srcset`` and ``variants`` (url, width,
+        height), or None when there are no renditions
+    """
+    storage = storage or default_storage
+    formats = (renditions or {}).get('formats')
+    if not formats:
+        return None
+
+    result = {}
+    for output_format, variants in formats.items():
+        items = [
+            {
+                'url': storage.url(variant['path']),
+                'width': variant['width'],
+                'height': variant['height'],
+            }
+            for variant in variants
+        ]
+        result[output_format] = {
+            'srcset': ', '.join(f"{item['url']} {item['width']}w" for item in items),
+            'variants': items,
+        }
+    return result
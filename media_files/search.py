@@ -0,0 +1,107 @@
+"""
+Media catalog index
+
+Normalizes comma-separated ``MediaFile.tags`` into ``MediaTag`` rows and
+maintains ``MediaSearchToken``, an inverted index of the words in the
+filename, alt text, caption, description and tags. Searches become
+indexed prefix lookups on the token table instead of ``icontains`` scans
+over five text columns.
+"""
+import re
+import unicodedata
+from django.db import transaction
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+MAX_TAG_LENGTH = 50
+
+
+def _fold(text):
+    """Lowercase and strip accents ("Canción" -> "cancion")"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    """
+    Split text into normalized search tokens
+
+    Returns:
+        Set of tokens (camera_2024-01.JPG -> {'camera', '2024', '01', 'jpg'})
+    """
+    return {
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall(_fold(text))
+        if len(token) >= MIN_TOKEN_LENGTH
+    }
+
+
+def normalize_tag(tag):
+    """Canonical form of a tag: lowercase, single spaces, bounded length"""
+    return ' '.join((tag or '').lower().split())[:MAX_TAG_LENGTH]
+
+
+def get_media_file_tokens(media_file):
+    """All search tokens of a media file"""
+    from .models import INDEXED_FIELDS
+
+    tokens = set()
+    for field in INDEXED_FIELDS:
+        tokens |= tokenize(getattr(media_file, field, ''))
+    return tokens
+
+
+def index_media_file(media_file):
+    """
+    Rebuild the tag links and search tokens of one media file
+    """
+    from .models import MediaFileTag, MediaSearchToken, MediaTag
+
+    tag_names = {normalize_tag(tag) for tag in media_file.get_tags_list()} - {''}
+    tokens = get_media_file_tokens(media_file)
+
+    with transaction.atomic():
+        existing_tags = dict(MediaTag.objects.filter(name__in=tag_names).values_list('name', 'pk'))
+        missing = tag_names - set(existing_tags)
+        if missing:
+            MediaTag.objects.bulk_create([MediaTag(name=name) for name in missing], ignore_conflicts=True)
+            existing_tags = dict(MediaTag.objects.filter(name__in=tag_names).values_list('name', 'pk'))
+
+        MediaFileTag.objects.filter(media_file=media_file).exclude(tag_id__in=existing_tags.values()).delete()
+        MediaFileTag.objects.bulk_create(
+            [MediaFileTag(media_file=media_file, tag_id=tag_id) for tag_id in existing_tags.values()],
+            ignore_conflicts=True
+        )
+
+        MediaSearchToken.objects.filter(media_file=media_file).exclude(token__in=tokens).delete()
+        MediaSearchToken.objects.bulk_create(
+            [MediaSearchToken(media_file=media_file, token=token) for token in tokens],
+            ignore_conflicts=True
+        )
+
+
+def search_media_files(queryset, query):
+    """
+    Filter a MediaFile queryset to files matching every word of a query
+
+    Each query word matches tokens it is a prefix of, so "sun bea" finds
+    "sunset_beach.jpg".
+    """
+    from .models import MediaSearchToken
+
+    words = tokenize(query)
+    if not words:
+        # Single-character queries have no tokens; fall back to a filename match
+        return queryset.filter(original_filename__istartswith=(query or '').strip())
+
+    for word in words:
+        queryset = queryset.filter(
+            pk__in=MediaSearchToken.objects.filter(token__startswith=word).values('media_file_id')
+        )
+    return queryset
+
+
+def filter_by_tag(queryset, tag):
+    """Filter a MediaFile queryset by a normalized tag"""
+    return queryset.filter(tag_set__name=normalize_tag(tag))
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import MediaFile
+from .chunked import get_allowed_extensions, get_chunked_upload_settings
+from .models import ChunkedUpload, MediaFile
+from .renditions import serialize_renditions
 
 
 class MediaFileSerializer(serializers.ModelSerializer):
@@ -7,6 +9,8 @@ class MediaFileSerializer(serializers.ModelSerializer):
     Serializer for MediaFile model
     """
     file_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
     file_size_display = serializers.SerializerMethodField()
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)
     tags_list = serializers.SerializerMethodField()
@@ -17,6 +21,9 @@ class MediaFileSerializer(serializers.ModelSerializer):
             'id',
             'file',
             'file_url',
+            'download_url',
+            'renditions',
+            'processing_status',
             'original_filename',
             'file_type',
             'file_size',
@@ -24,6 +31,9 @@ class MediaFileSerializer(serializers.ModelSerializer):
             'mime_type',
             'width',
             'height',
+            'dominant_color',
+            'blurhash',
+            'perceptual_hash',
             'alt_text',
             'caption',
             'description',
@@ -39,12 +49,18 @@ class MediaFileSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id',
             'file_url',
+            'download_url',
+            'renditions',
+            'processing_status',
             'file_type',
             'file_size',
             'file_size_display',
             'mime_type',
             'width',
             'height',
+            'dominant_color',
+            'blurhash',
+            'perceptual_hash',
             'uploaded_by',
             'uploaded_by_username',
             'uploaded_at',
@@ -56,6 +72,14 @@ class MediaFileSerializer(serializers.ModelSerializer):
         """Get the file URL"""
         return obj.get_file_url()
     
+    def get_download_url(self, obj):
+        """Get the cacheable serving URL"""
+        return obj.get_download_url()
+    
+    def get_renditions(self, obj):
+        """Get srcset-ready resized versions of the image"""
+        return serialize_renditions(obj.renditions)
+    
     def get_file_size_display(self, obj):
         """Get human-readable file size"""
         return obj.get_file_size_display()
@@ -104,4 +128,81 @@ class MediaUploadSerializer(serializers.Serializer):
                 f"Allowed types: {', '.join(allowed_extensions)}"
             )
         
-        return value
\ No newline at end of file
+        return value
+
+class ChunkedUploadInitSerializer(serializers.Serializer):
+    """
+    Serializer for starting a chunked upload
+    """
+    filename = serializers.CharField(max_length=255)
+    total_size = serializers.IntegerField(min_value=1)
+    mime_type = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    alt_text = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    caption = serializers.CharField(required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    tags = serializers.CharField(max_length=500, required=False, allow_blank=True)
+    is_public = serializers.BooleanField(default=True)
+    
+    def validate_filename(self, value):
+        """Validate file extension"""
+        allowed_extensions = get_allowed_extensions()
+        file_extension = value.split('.')[-1].lower()
+        if '.' not in value or file_extension not in allowed_extensions:
+            raise serializers.ValidationError(
+                f"File type '{file_extension}' is not allowed. "
+                f"Allowed types: {', '.join(allowed_extensions)}"
+            )
+        return value
+    
+    def validate_total_size(self, value):
+        """Validate declared file size"""
+        _, max_size = get_chunked_upload_settings()
+        if value > max_size:
+            raise serializers.ValidationError(
+                f"File size exceeds {max_size // (1024 * 1024)}MB limit"
+            )
+        return value
+    
+    def get_metadata(self):
+        """MediaFile fields to apply when the upload completes"""
+        metadata_fields = ['alt_text', 'caption', 'description', 'tags', 'is_public']
+        return {
+            field: self.validated_data[field]
+            for field in metadata_fields
+            if field in self.validated_data
+        }
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """
+    Serializer for chunked upload sessions
+    """
+    offset = serializers.IntegerField(source='received_bytes', read_only=True)
+    chunk_size = serializers.SerializerMethodField()
+    checksum = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ChunkedUpload
+        fields = [
+            'id',
+            'filename',
+            'mime_type',
+            'total_size',
+            'offset',
+            'chunk_size',
+            'checksum',
+            'status',
+            'media_file',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = fields
+    
+    def get_chunk_size(self, obj):
+        """Get the maximum accepted chunk size"""
+        chunk_size, _ = get_chunked_upload_settings()
+        return chunk_size
+    
+    def get_checksum(self, obj):
+        """Get the running CRC32 as hex"""
+        return f"{obj.checksum:08x}"
@@ -0,0 +1,168 @@
+"""
+Media file serving
+
+Builds responses for stored media files with:
+
+* strong ETags from the blob's SHA-256 (``If-None-Match`` -> 304),
+* single byte ranges (``Range``/``If-Range`` -> 206/416) so video seeking
+  only transfers the requested bytes,
+* optional offload of the bytes to the front server through
+  ``X-Sendfile`` (Apache/lighttpd) or ``X-Accel-Redirect`` (nginx),
+* ``immutable`` caching for URLs that carry the content hash.
+"""
+import os
+import re
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+READ_BLOCK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_serving_settings():
+    media_settings = getattr(settings, 'MEDIA_FILE_SETTINGS', {})
+    return (
+        media_settings.get('SENDFILE_BACKEND'),
+        media_settings.get('SENDFILE_URL_PREFIX', '/protected-media/'),
+    )
+
+
+def get_etag(media_file):
+    """Strong ETag from the content hash, weak one for pre-dedup files"""
+    if media_file.blob_id:
+        return quote_etag(media_file.blob.sha256)
+    return f'W/"{media_file.pk}-{media_file.file_size}-{int(media_file.uploaded_at.timestamp())}"'
+
+
+def get_version(media_file):
+    """Short content-hash token used to build immutable URLs"""
+    return media_file.blob.sha256[:16] if media_file.blob_id else None
+
+
+def parse_range(header, size):
+    """
+    Parse a single ``bytes=`` range
+
+    Returns:
+        ``(start, end)`` inclusive, None to serve the whole file (no,
+        malformed or multi-range header), or False if unsatisfiable
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or size == 0:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_file(file_obj, start, length):
+    try:
+        file_obj.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = file_obj.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file_obj.close()
+
+
+def _offload_headers(response, name):
+    backend, url_prefix = get_serving_settings()
+    if backend == 'xsendfile':
+        response['X-Sendfile'] = os.path.join(str(settings.MEDIA_ROOT), name)
+    elif backend == 'nginx':
+        response['X-Accel-Redirect'] = url_prefix.rstrip('/') + '/' + name
+
+
+def _cache_headers(response, media_file, etag, versioned):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(media_file.uploaded_at.timestamp())
+    visibility = 'public' if media_file.is_public else 'private'
+    if versioned:
+        response['Cache-Control'] = f'{visibility}, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'{visibility}, max-age=0, must-revalidate'
+
+
+def build_file_response(request, media_file):
+    """
+    Build the response serving a media file's bytes
+
+    Args:
+        request: Incoming request (conditional and Range headers are read)
+        media_file: MediaFile to serve
+
+    Returns:
+        ``(response, counted)`` where ``counted`` tells if the hit should
+        increase the download count (full downloads and the first range)
+    """
+    name = media_file.file.name
+    storage = media_file.file.storage
+    size = storage.size(name)
+    etag = get_etag(media_file)
+    version = get_version(media_file)
+    versioned = bool(version) and request.GET.get('v') == version
+
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+        _cache_headers(response, media_file, etag, versioned)
+        return response, False
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and (if_range.strip() != etag or etag.startswith('W/')):
+        # The client's partial copy may be stale: send the whole file
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response, False
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    backend, _ = get_serving_settings()
+
+    if request.method == 'HEAD':
+        response = HttpResponse(status=206 if byte_range else 200)
+    elif backend:
+        # The front server streams the file (and handles Range itself)
+        response = HttpResponse(status=200)
+        _offload_headers(response, name)
+    else:
+        response = StreamingHttpResponse(
+            _iter_file(storage.open(name, 'rb'), start, length),
+            status=206 if byte_range else 200
+        )
+
+    if not backend or request.method == 'HEAD':
+        response['Content-Length'] = str(length)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Type'] = media_file.mime_type or 'application/octet-stream'
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    if media_file.file_type not in ('image', 'video', 'audio'):
+        response['Content-Disposition'] = content_disposition_header(True, media_file.original_filename)
+    _cache_headers(response, media_file, etag, versioned)
+
+    return response, request.method != 'HEAD' and start == 0
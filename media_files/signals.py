@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .blobs import release_blob
+from .models import MediaFile
+
+
+@receiver(post_delete, sender=MediaFile)
+def release_media_blob(sender, instance, **kwargs):
+    """
+    Drop the blob reference of a deleted media file
+    """
+    if instance.blob_id:
+        release_blob(instance.blob_id, instance.renditions)
@@ -0,0 +1,574 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from posts.models import Post
+from .blobs import create_media_file
+from .chunked import get_part_path
+from .download_counts import DownloadCountBuffer
+from .metadata import blurhash, extract_pending_metadata
+from .models import ChunkedUpload, MediaBlob, MediaFile, MediaSearchToken
+from .orphans import collect_orphaned_media
+from .processing import process_pending_media
+from .search import search_media_files, tokenize
+from .serializers import MediaFileSerializer
+
+User = get_user_model()
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(name='photo.png', size=(1200, 800), image_format='PNG'):
+    output = io.BytesIO()
+    Image.new('RGBA', size, (200, 100, 50, 128)).save(output, format=image_format)
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class RenditionTest(TestCase):
+    """Test responsive image renditions"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+
+    def test_media_file_renditions(self):
+        """Images get one rendition per width and format, without upscaling"""
+        media_file = MediaFile.objects.create(
+            file=make_image(),
+            original_filename='photo.png',
+            file_size=0,
+            mime_type='image/png',
+            uploaded_by=self.user
+        )
+        self.assertEqual(media_file.processing_status, 'pending')
+        self.assertEqual(media_file.renditions, {})
+
+        results = process_pending_media(workers=0)
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0]['error'])
+
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.processing_status, 'done')
+        self.assertEqual((media_file.width, media_file.height), (1200, 800))
+        widths = [variant['width'] for variant in media_file.renditions['formats']['webp']]
+        self.assertEqual(widths, [320, 640, 1024, 1200])
+        self.assertEqual(len(media_file.renditions['formats']['jpeg']), 4)
+
+        with Image.open(media_file.file.storage.path(media_file.renditions['formats']['jpeg'][0]['path'])) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (320, 213))
+
+        data = MediaFileSerializer(media_file).data
+        self.assertIn('320w', data['renditions']['webp']['srcset'])
+        self.assertEqual(len(data['renditions']['jpeg']['variants']), 4)
+
+    def test_renditions_not_regenerated_for_same_file(self):
+        """Saving without changing the file keeps the existing renditions"""
+        media_file = MediaFile.objects.create(
+            file=make_image(size=(200, 100)),
+            original_filename='small.png',
+            file_size=0,
+            mime_type='image/png',
+            uploaded_by=self.user
+        )
+        process_pending_media(workers=0)
+        media_file.refresh_from_db()
+        renditions = media_file.renditions
+        self.assertEqual([v['width'] for v in renditions['formats']['webp']], [200])
+
+        media_file.alt_text = 'Updated'
+        media_file.save()
+        self.assertEqual(media_file.processing_status, 'done')
+        self.assertEqual(process_pending_media(workers=0), [])
+        self.assertEqual(media_file.renditions, renditions)
+
+    def test_post_image_renditions(self):
+        """Post.imagen uploads are processed in the pool and exposed by the serializer"""
+        from posts.serializers import PostListSerializer
+
+        post = Post.objects.create(
+            titulo='Post con imagen',
+            contenido='Contenido suficientemente largo',
+            autor=self.user,
+            imagen=make_image(name='cover.png', size=(700, 350))
+        )
+        self.assertTrue(post.imagen_needs_processing())
+
+        results = process_pending_media(workers=1)
+        self.assertEqual([(result['kind'], result['pk']) for result in results], [('post', post.pk)])
+        self.assertGreaterEqual(results[0]['elapsed_ms'], 0)
+
+        post.refresh_from_db()
+        self.assertFalse(post.imagen_needs_processing())
+        widths = [variant['width'] for variant in post.imagen_renditions['formats']['jpeg']]
+        self.assertEqual(widths, [320, 640, 700])
+
+        data = PostListSerializer(post).data
+        self.assertIsNotNone(data['image_url'])
+        self.assertIn('640w', data['image_renditions']['webp']['srcset'])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ChunkedUploadTest(TestCase):
+    """Test the chunked, resumable upload protocol"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = os.urandom(2500)
+
+    def start_upload(self, **extra):
+        response = self.client.post('/api/v1/media/uploads/', {
+            'filename': 'clip.mp4',
+            'total_size': len(self.payload),
+            'caption': 'Clip',
+            **extra
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['data']['id']
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.generic(
+            'PUT', f'/api/v1/media/uploads/{upload_id}/', data,
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunked_upload_with_resume(self):
+        """Chunks are appended in order and the upload resumes from the stored offset"""
+        upload_id = self.start_upload()
+
+        response = self.put_chunk(upload_id, 0, self.payload[:1000])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['offset'], 1000)
+
+        # A retried or out-of-order chunk is rejected with the resume offset
+        response = self.put_chunk(upload_id, 2000, self.payload[2000:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1000)
+
+        response = self.client.get(f'/api/v1/media/uploads/{upload_id}/')
+        self.assertEqual(response.data['data']['offset'], 1000)
+
+        self.assertEqual(self.put_chunk(upload_id, 1000, self.payload[1000:]).status_code, 200)
+
+        response = self.client.post(f'/api/v1/media/uploads/{upload_id}/complete/', {
+            'checksum': f"{zlib.crc32(self.payload):08x}"
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['caption'], 'Clip')
+        self.assertEqual(response.data['data']['file_type'], 'video')
+
+        media_file = MediaFile.objects.get(pk=response.data['data']['id'])
+        with media_file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.payload)
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        self.assertEqual(upload.status, 'complete')
+        self.assertFalse(os.path.exists(get_part_path(upload)))
+
+    def test_incomplete_and_corrupt_uploads_are_rejected(self):
+        """Completion requires every byte and a matching checksum"""
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, self.payload[:1000])
+
+        response = self.client.post(f'/api/v1/media/uploads/{upload_id}/complete/', {}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        self.put_chunk(upload_id, 1000, self.payload[1000:])
+        response = self.client.post(f'/api/v1/media/uploads/{upload_id}/complete/', {
+            'checksum': '00000000'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_disallowed_extension(self):
+        """Uploads are validated before any bytes are accepted"""
+        response = self.client.post('/api/v1/media/uploads/', {
+            'filename': 'script.exe',
+            'total_size': 10
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaDeduplicationTest(TestCase):
+    """Test content-addressed storage of uploads"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_login(self.user)
+
+    def upload(self, name='photo.png'):
+        # Editor upload endpoint (posts.media_views.MediaUploadView)
+        image = make_image(name=name, size=(400, 300))
+        response = self.client.post('/api/v1/media/upload/', {'file': image}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return MediaFile.objects.get(pk=response.json()['data']['id'])
+
+    def test_duplicate_uploads_share_blob_and_renditions(self):
+        """Identical bytes are stored and processed once"""
+        first = self.upload()
+        process_pending_media(workers=0)
+        second = self.upload(name='copy.png')
+
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.reference_count, 2)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(second.processing_status, 'done')
+        self.assertEqual(second.original_filename, 'copy.png')
+        self.assertEqual((second.width, second.height), (400, 300))
+        self.assertEqual(process_pending_media(workers=0), [])
+
+    def test_bytes_removed_with_last_reference(self):
+        """Deleting a media file only removes the blob when unreferenced"""
+        first = self.upload()
+        second = self.upload()
+        storage = first.file.storage
+        name = first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/v1/media/files/{first.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get().reference_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/v1/media/files/{second.pk}/')
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    """Test Range/ETag serving and buffered download counts"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.payload = os.urandom(3000)
+        self.media_file = create_media_file(
+            SimpleUploadedFile('clip.mp4', self.payload, content_type='video/mp4'),
+            'clip.mp4',
+            file_size=len(self.payload),
+            mime_type='video/mp4',
+            uploaded_by=self.user
+        )
+        self.url = self.media_file.get_download_url()
+        DownloadCountBuffer.flush()
+
+    def tearDown(self):
+        DownloadCountBuffer.flush()
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_with_immutable_caching(self):
+        """Hashed URLs are served whole with a strong ETag and immutable caching"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read(response), self.payload)
+        self.assertEqual(response['ETag'], f'"{self.media_file.blob.sha256}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.media_file.blob.sha256}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """Byte ranges are answered with 206 and only the requested bytes"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/3000')
+        self.assertEqual(self.read(response), self.payload[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-500')
+        self.assertEqual(self.read(response), self.payload[-500:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */3000')
+
+    def test_sendfile_offload(self):
+        """With nginx offload the body is left to X-Accel-Redirect"""
+        media_settings = dict(settings.MEDIA_FILE_SETTINGS, SENDFILE_BACKEND='nginx')
+        with self.settings(MEDIA_FILE_SETTINGS=media_settings):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.media_file.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_download_counts_are_buffered(self):
+        """Hits are counted on full downloads and first ranges, then flushed together"""
+        self.read(self.client.get(self.url))
+        self.read(self.client.get(self.url, HTTP_RANGE='bytes=0-99'))
+        self.read(self.client.get(self.url, HTTP_RANGE='bytes=100-199'))
+
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.download_count, 0)
+        self.assertEqual(DownloadCountBuffer.pending(self.media_file.pk), 2)
+
+        self.assertEqual(DownloadCountBuffer.flush(), 1)
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.download_count, 2)
+
+    def test_private_files_hidden_from_others(self):
+        """Private media is only served to its owner and staff"""
+        MediaFile.objects.filter(pk=self.media_file.pk).update(is_public=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaCatalogTest(TestCase):
+    """Test the token/tag index used by search and the aggregated stats"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.beach = self.create('sunset_beach.jpg', caption='Atardecer en la playa', tags='Viajes, Verano')
+        self.city = self.create('city_night.jpg', description='Skyline at night', tags='viajes')
+        self.song = self.create('Canción.mp3', tags='Música', is_public=False)
+
+    def create(self, filename, **fields):
+        return create_media_file(
+            SimpleUploadedFile(filename, filename.encode() * 10),
+            filename,
+            file_size=len(filename.encode()) * 10,
+            uploaded_by=self.user,
+            **fields
+        )
+
+    def search(self, query):
+        return set(search_media_files(MediaFile.objects.all(), query))
+
+    def test_tokenize_folds_accents(self):
+        """Tokens are lowercase, accent-free and skip single characters"""
+        self.assertEqual(tokenize('Canción_2024-a.MP3'), {'cancion', '2024', 'mp3'})
+
+    def test_prefix_search_matches_all_words(self):
+        """Every query word must prefix-match a token of the file"""
+        self.assertEqual(self.search('sun bea'), {self.beach})
+        self.assertEqual(self.search('playa'), {self.beach})
+        self.assertEqual(self.search('VIAJ'), {self.beach, self.city})
+        self.assertEqual(self.search('cancion'), {self.song})
+        self.assertEqual(self.search('beach night'), set())
+
+    def test_index_follows_updates(self):
+        """Editing indexed fields replaces the tokens and tag links"""
+        self.city.tags = 'trabajo'
+        self.city.save()
+
+        self.assertEqual(self.search('viajes'), {self.beach})
+        self.assertEqual(set(self.city.tag_set.values_list('name', flat=True)), {'trabajo'})
+        self.assertFalse(MediaSearchToken.objects.filter(media_file=self.city, token='viajes').exists())
+
+    def test_list_search_and_tag_filter(self):
+        """The list endpoint uses the index for search and tag filters"""
+        response = self.client.get('/api/v1/media/files/', {'search': 'sun'})
+        self.assertEqual([item['id'] for item in response.data['data']], [self.beach.pk])
+
+        response = self.client.get('/api/v1/media/files/', {'tag': ' Viajes '})
+        self.assertEqual(
+            {item['id'] for item in response.data['data']},
+            {self.beach.pk, self.city.pk}
+        )
+
+    def test_stats_single_query(self):
+        """All counters come from one aggregate query"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/media/stats/')
+
+        stats = response.data['data']
+        self.assertEqual(stats['total_files'], 3)
+        self.assertEqual(stats['public_files'], 2)
+        self.assertEqual(stats['by_type']['image'], 2)
+        self.assertEqual(stats['by_type']['audio'], 1)
+        self.assertEqual(stats['total_size'], sum(f.file_size for f in (self.beach, self.city, self.song)))
+
+
+def make_gradient(name, size, flip=False, image_format='JPEG', exif=None):
+    image = Image.linear_gradient('L').rotate(90).resize(size).convert('RGB')
+    if flip:
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    output = io.BytesIO()
+    image.save(output, format=image_format, **({'exif': exif} if exif else {}))
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaMetadataTest(TestCase):
+    """Test dimensions, color, blurhash and perceptual hash extraction"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, upload):
+        return create_media_file(upload, upload.name, file_size=upload.size, uploaded_by=self.user)
+
+    def test_extracts_metadata(self):
+        """Pending images get dimensions, color, placeholder and hash"""
+        media_file = self.create(make_image('photo.png', size=(300, 200)))
+        self.assertEqual(media_file.metadata_status, 'pending')
+
+        results = extract_pending_metadata(workers=0)
+        self.assertEqual([result['error'] for result in results], [None])
+
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.metadata_status, 'done')
+        self.assertEqual((media_file.width, media_file.height), (300, 200))
+        self.assertEqual(len(media_file.perceptual_hash), 16)
+        self.assertEqual(len(media_file.blurhash), 28)
+        self.assertRegex(media_file.dominant_color, r'^#[0-9a-f]{6}$')
+
+    def test_exif_orientation_applied(self):
+        """Rotated JPEGs report the displayed dimensions"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        media_file = self.create(make_gradient('rotated.jpg', (400, 100), exif=exif))
+
+        extract_pending_metadata(workers=0)
+        media_file.refresh_from_db()
+        self.assertEqual((media_file.width, media_file.height), (100, 400))
+
+    def test_solid_color_blurhash(self):
+        """A flat image has no AC components and encodes its color"""
+        self.assertEqual(blurhash(Image.new('RGB', (10, 10), (255, 255, 255)), 1, 1), '00TSUA')
+
+    def test_similar_images(self):
+        """Resized copies are near-duplicates, different images are not"""
+        original = self.create(make_gradient('original.jpg', (640, 480)))
+        resized = self.create(make_gradient('resized.jpg', (320, 240)))
+        different = self.create(make_gradient('flipped.jpg', (640, 480), flip=True))
+        extract_pending_metadata(workers=0)
+
+        response = self.client.get(f'/api/v1/media/files/{original.pk}/similar/')
+        self.assertEqual([item['id'] for item in response.data['data']], [resized.pk])
+        self.assertNotIn(different.pk, [item['id'] for item in response.data['data']])
+
+        for distance in ('abc', '-1'):
+            response = self.client.get(f'/api/v1/media/files/{original.pk}/similar/', {'distance': distance})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(f'/api/v1/media/files/{original.pk}/similar/', {'distance': 10 ** 6})
+        self.assertEqual({item['id'] for item in response.data['data']}, {resized.pk, different.pk})
+
+        response = self.client.get('/api/v1/media/files/', {'min_width': 400})
+        self.assertEqual({item['id'] for item in response.data['data']}, {original.pk, different.pk})
+
+    def test_duplicates_reuse_metadata(self):
+        """A re-upload of extracted bytes is not extracted again"""
+        self.create(make_image('photo.png', size=(300, 200)))
+        extract_pending_metadata(workers=0)
+
+        duplicate = self.create(make_image('copy.png', size=(300, 200)))
+        self.assertEqual(duplicate.metadata_status, 'done')
+        self.assertEqual((duplicate.width, duplicate.height), (300, 200))
+        self.assertEqual(extract_pending_metadata(workers=0), [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class OrphanedMediaTest(TestCase):
+    """Test the mark-and-sweep media garbage collector"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='uploader',
+            email='uploader@example.com',
+            password='testpass123'
+        )
+        self.media_file = create_media_file(make_image('kept.png'), 'kept.png', file_size=1, uploaded_by=self.user)
+        self.post = Post.objects.create(
+            titulo='Post con imagen',
+            contenido='<p><img src="/media/tinymce/inline%20image.png" srcset="/media/tinymce/inline_320w.webp 320w"></p>',
+            autor=self.user,
+            imagen=make_image(name='cover.png', size=(100, 100))
+        )
+        self.orphans = [
+            default_storage.save('uploads/1/leftover.png', ContentFile(b'x' * 10)),
+            default_storage.save('posts/deleted_post.png', ContentFile(b'y' * 20)),
+        ]
+        self.kept = [
+            self.media_file.file.name,
+            self.post.imagen.name,
+            default_storage.save('tinymce/inline image.png', ContentFile(b'z')),
+            default_storage.save('tinymce/inline_320w.webp', ContentFile(b'z')),
+        ]
+        self.recent = default_storage.save('uploads/1/in_progress.png', ContentFile(b'w'))
+
+        old = time.time() - 48 * 3600
+        for name in self.orphans + self.kept:
+            os.utime(default_storage.path(name), (old, old))
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_dry_run_reports_orphans(self):
+        """Only old unreferenced files are reported and nothing is removed"""
+        found = []
+        report = collect_orphaned_media(on_orphan=lambda name, size: found.append(name))
+
+        self.assertEqual(sorted(found), sorted(self.orphans))
+        self.assertEqual(report['bytes'], 30)
+        self.assertEqual(report['removed'], 0)
+        self.assertTrue(all(default_storage.exists(name) for name in self.orphans))
+
+    def test_delete_in_batches(self):
+        """Orphans are deleted, referenced and recent files are kept"""
+        report = collect_orphaned_media(dry_run=False, batch_size=1)
+
+        self.assertEqual(report['removed'], 2)
+        self.assertFalse(any(default_storage.exists(name) for name in self.orphans))
+        self.assertTrue(all(default_storage.exists(name) for name in self.kept + [self.recent]))
+
+    def test_quarantine(self):
+        """Quarantined orphans are moved aside and skipped by later runs"""
+        collect_orphaned_media(dry_run=False, quarantine=True)
+
+        self.assertFalse(default_storage.exists(self.orphans[0]))
+        days, _ = default_storage.listdir('quarantine')
+        self.assertTrue(default_storage.exists(f'quarantine/{days[0]}/{self.orphans[0]}'))
+        self.assertEqual(collect_orphaned_media()['orphans'], 0)
@@ -8,9 +8,16 @@ urlpatterns = [
     # File upload
     path('upload/', views.MediaFileUploadView.as_view(), name='upload'),
     
+    # Chunked, resumable uploads
+    path('uploads/', views.ChunkedUploadView.as_view(), name='chunked-upload'),
+    path('uploads/<uuid:upload_id>/', views.ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path('uploads/<uuid:upload_id>/complete/', views.ChunkedUploadCompleteView.as_view(), name='chunked-upload-complete'),
+    
     # File management
     path('files/', views.MediaFileListView.as_view(), name='file-list'),
     path('files/<int:pk>/', views.MediaFileDetailView.as_view(), name='file-detail'),
+    path('files/<int:pk>/download/', views.MediaFileDownloadView.as_view(), name='file-download'),
+    path('files/<int:pk>/similar/', views.MediaFileSimilarView.as_view(), name='file-similar'),
     
     # Statistics
     path('stats/', views.media_stats, name='stats'),
@@ -2,18 +2,28 @@ from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, HttpResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
 from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
+import logging
 import mimetypes
-import os
-from .models import MediaFile
-from .serializers import MediaFileSerializer, MediaUploadSerializer
+from .blobs import create_media_file
+from .chunked import ChunkedUploadError, complete_upload, create_upload, discard_part, write_chunk
+from .metadata import HASH_BITS, find_similar_media
+from .models import ChunkedUpload, MediaFile
+from .renditions import delete_renditions
+from .search import filter_by_tag, search_media_files
+from .serving import build_file_response
+from .serializers import (
+    ChunkedUploadInitSerializer, ChunkedUploadSerializer, MediaFileSerializer, MediaUploadSerializer
+)
+
+logger = logging.getLogger(__name__)
 
 
 class MediaFileUploadView(APIView):
@@ -41,10 +51,10 @@ class MediaFileUploadView(APIView):
             if not mime_type:
                 mime_type = 'application/octet-stream'
             
-            # Create media file instance
-            media_file = MediaFile(
-                file=uploaded_file,
-                original_filename=uploaded_file.name,
+            # Create media file instance (identical bytes share one stored blob)
+            media_file = create_media_file(
+                uploaded_file,
+                uploaded_file.name,
                 file_size=uploaded_file.size,
                 mime_type=mime_type,
                 uploaded_by=request.user,
@@ -55,9 +65,6 @@ class MediaFileUploadView(APIView):
                 is_public=serializer.validated_data.get('is_public', True)
             )
             
-            # Save the file
-            media_file.save()
-            
             # Serialize and return
             response_serializer = MediaFileSerializer(media_file)
             
@@ -74,6 +81,129 @@ class MediaFileUploadView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def chunked_upload_error_response(error):
+    """
+    Build the response for a chunked upload protocol error
+    """
+    body = {
+        'error': True,
+        'message': str(error),
+    }
+    if error.offset is not None:
+        body['offset'] = error.offset
+    return Response(body, status=error.status)
+
+
+class ChunkedUploadView(APIView):
+    """
+    Start a resumable chunked upload
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = ChunkedUploadInitSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'error': True,
+                'message': 'Invalid upload data',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = create_upload(
+            user=request.user,
+            filename=serializer.validated_data['filename'],
+            total_size=serializer.validated_data['total_size'],
+            mime_type=serializer.validated_data.get('mime_type'),
+            metadata=serializer.get_metadata()
+        )
+        
+        return Response({
+            'error': False,
+            'message': 'Upload started',
+            'data': ChunkedUploadSerializer(upload).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    """
+    Get the resume offset, append a chunk, or abort a chunked upload
+    
+    Chunks are sent as the raw request body of a PUT with an
+    ``Upload-Offset`` header; the body is streamed to disk and never
+    parsed, so ``request.data`` must not be touched here.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        return Response({
+            'error': False,
+            'data': ChunkedUploadSerializer(upload).data
+        }, status=status.HTTP_200_OK)
+    
+    def put(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return Response({
+                'error': True,
+                'message': 'Upload-Offset and Content-Length headers are required',
+                'offset': upload.received_bytes
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            new_offset = write_chunk(upload, offset, request.stream, length)
+        except ChunkedUploadError as e:
+            return chunked_upload_error_response(e)
+        
+        return Response({
+            'error': False,
+            'data': {
+                'offset': new_offset,
+                'total_size': upload.total_size,
+                'complete': new_offset == upload.total_size,
+            }
+        }, status=status.HTTP_200_OK)
+    
+    def delete(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        discard_part(upload)
+        if upload.status != 'complete':
+            upload.delete()
+        
+        return Response({
+            'error': False,
+            'message': 'Upload discarded'
+        }, status=status.HTTP_200_OK)
+
+
+class ChunkedUploadCompleteView(APIView):
+    """
+    Finalize a chunked upload into a MediaFile
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, upload_id):
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+        
+        try:
+            media_file = complete_upload(upload, request.data.get('checksum'))
+        except ChunkedUploadError as e:
+            return chunked_upload_error_response(e)
+        
+        return Response({
+            'error': False,
+            'message': 'File uploaded successfully',
+            'data': MediaFileSerializer(media_file).data
+        }, status=status.HTTP_201_CREATED)
+
+
 class MediaFileListView(APIView):
     """
     List and filter media files
@@ -85,29 +215,35 @@ class MediaFileListView(APIView):
             # Get query parameters
             file_type = request.GET.get('file_type')
             search = request.GET.get('search')
+            tag = request.GET.get('tag')
             is_public = request.GET.get('is_public')
             page = int(request.GET.get('page', 1))
             page_size = int(request.GET.get('page_size', 20))
             
             # Build query
-            queryset = MediaFile.objects.all()
+            queryset = MediaFile.objects.select_related('blob', 'uploaded_by')
             
             # Apply filters
             if file_type:
                 queryset = queryset.filter(file_type=file_type)
             
             if search:
-                queryset = queryset.filter(
-                    Q(original_filename__icontains=search) |
-                    Q(alt_text__icontains=search) |
-                    Q(caption__icontains=search) |
-                    Q(description__icontains=search) |
-                    Q(tags__icontains=search)
-                )
+                queryset = search_media_files(queryset, search)
+            
+            if tag:
+                queryset = filter_by_tag(queryset, tag)
             
             if is_public is not None:
                 queryset = queryset.filter(is_public=is_public.lower() == 'true')
             
+            # Dimension filters (filled by the metadata extraction stage)
+            for param, lookup in (
+                ('min_width', 'width__gte'), ('max_width', 'width__lte'),
+                ('min_height', 'height__gte'), ('max_height', 'height__lte'),
+            ):
+                if request.GET.get(param):
+                    queryset = queryset.filter(**{lookup: int(request.GET[param])})
+            
             # Order by upload date (newest first)
             queryset = queryset.order_by('-uploaded_at')
             
@@ -138,6 +274,83 @@ class MediaFileListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class MediaFileDownloadView(APIView):
+    """
+    Serve the bytes of a media file
+    
+    Supports Range requests, conditional requests and X-Sendfile /
+    X-Accel-Redirect offload; see media_files.serving.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pk):
+        media_file = get_object_or_404(MediaFile.objects.select_related('blob'), pk=pk)
+        
+        if not media_file.is_public:
+            user = request.user
+            if not user.is_authenticated or (media_file.uploaded_by_id != user.id and not user.is_staff):
+                raise Http404
+        
+        response, counted = build_file_response(request, media_file)
+        if counted:
+            media_file.increment_download_count()
+        return response
+
+
+class MediaFileSimilarView(APIView):
+    """
+    List images that look like a given one (near-duplicate detection)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        media_file = get_object_or_404(MediaFile, pk=pk)
+        if not media_file.is_public and media_file.uploaded_by != request.user and not request.user.is_staff:
+            raise Http404
+        
+        distance = request.GET.get('distance') or None
+        if distance is not None:
+            try:
+                distance = int(distance)
+            except ValueError:
+                distance = -1
+            if distance < 0:
+                return Response({
+                    'error': True,
+                    'message': 'distance must be a non-negative integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            # Hashes never differ in more bits than they have
+            distance = min(distance, HASH_BITS)
+        
+        try:
+            matches = find_similar_media(media_file, distance)
+            
+            queryset = MediaFile.objects.select_related('blob', 'uploaded_by').filter(
+                pk__in=[pk for _, pk in matches]
+            )
+            if not request.user.is_staff:
+                queryset = queryset.filter(Q(is_public=True) | Q(uploaded_by=request.user))
+            files = {item.pk: item for item in queryset}
+            
+            results = []
+            for match_distance, match_pk in matches:
+                if match_pk in files:
+                    data = MediaFileSerializer(files[match_pk]).data
+                    data['distance'] = match_distance
+                    results.append(data)
+            
+            return Response({
+                'error': False,
+                'data': results
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response({
+                'error': True,
+                'message': f'Failed to find similar media: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class MediaFileDetailView(APIView):
     """
     Get, update, or delete a specific media file
@@ -212,12 +425,16 @@ class MediaFileDetailView(APIView):
                     'message': 'Permission denied'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            # Delete file from filesystem
-            if media_file.file:
+            # Files stored before deduplication are owned by a single row;
+            # blob-backed bytes are released by the post_delete signal once
+            # the last reference is gone
+            if media_file.file and not media_file.blob_id:
                 try:
-                    os.remove(media_file.file.path)
-                except OSError:
-                    pass
+                    media_file.file.storage.delete(media_file.file.name)
+                except OSError as e:
+                    # Left for the collect_orphaned_media command
+                    logger.warning(f"Could not delete media file {media_file.file.name}: {str(e)}")
+                delete_renditions(media_file.renditions)
             
             media_file.delete()
             
@@ -240,18 +457,29 @@ def media_stats(request):
     Get media statistics
     """
     try:
-        stats = {
-            'total_files': MediaFile.objects.count(),
-            'total_size': sum(MediaFile.objects.values_list('file_size', flat=True)),
-            'by_type': {},
-            'public_files': MediaFile.objects.filter(is_public=True).count(),
-            'featured_files': MediaFile.objects.filter(is_featured=True).count(),
+        # One aggregate query for every counter
+        type_counts = {
+            f'type_{file_type}': Count('id', filter=Q(file_type=file_type))
+            for file_type, _ in MediaFile.FILE_TYPES
         }
+        totals = MediaFile.objects.aggregate(
+            total_files=Count('id'),
+            total_size=Sum('file_size'),
+            public_files=Count('id', filter=Q(is_public=True)),
+            featured_files=Count('id', filter=Q(is_featured=True)),
+            **type_counts
+        )
         
-        # Count by file type
-        for file_type, _ in MediaFile.FILE_TYPES:
-            count = MediaFile.objects.filter(file_type=file_type).count()
-            stats['by_type'][file_type] = count
+        stats = {
+            'total_files': totals['total_files'],
+            'total_size': totals['total_size'] or 0,
+            'by_type': {
+                file_type: totals[f'type_{file_type}']
+                for file_type, _ in MediaFile.FILE_TYPES
+            },
+            'public_files': totals['public_files'],
+            'featured_files': totals['featured_files'],
+        }
         
         return Response({
             'error': False,
@@ -18,6 +18,7 @@ from .serializers import (
     SystemAnnouncementSerializer, NotificationStatsSerializer
 )
 from .services import NotificationService
+from .preference_cache import NotificationPreferenceCache
 
 logger = logging.getLogger(__name__)
 
@@ -303,6 +304,7 @@ class NotificationPreferenceView(generics.RetrieveUpdateAPIView):
         response = super().update(request, *args, **kwargs)
         
         if response.status_code == 200:
+            NotificationPreferenceCache.invalidate(request.user)
             logger.info(f"Updated notification preferences for user {request.user.username}")
         
         return response
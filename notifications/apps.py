@@ -10,5 +10,7 @@ class NotificationsConfig(AppConfig):
     verbose_name = 'Notifications'
     
     def ready(self):
-        """Import signal handlers when app is ready"""
-        import notifications.signals
\ No newline at end of file
+        """Import signal handlers and check the replay log backend"""
+        import notifications.signals
+        from django_blog.caching import require_shared_cache
+        require_shared_cache('The notification replay log')
@@ -0,0 +1,150 @@
+"""
+WebSocket authentication for notification consumers
+
+The JWT is validated once and the user id is taken from its claims. The
+account state (active flag, username and roles) comes from a short-TTL
+user-state cache, so reconnect storms after a deploy do not turn into one
+thread-pool hop and one query per connection. Role claims are never
+trusted: refresh tokens copy them for days, so a demoted user's tokens
+would keep granting staff groups.
+"""
+import logging
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'ws_user_state'
+LOCAL_CACHE_MAX_ENTRIES = 10000
+
+
+def _get_state_timeout():
+    websocket_settings = getattr(settings, 'WEBSOCKET_SETTINGS', {})
+    return websocket_settings.get('USER_STATE_CACHE_TIMEOUT', 30)
+
+
+def get_query_param(scope, name):
+    """Get a single parameter from the WebSocket query string"""
+    query_string = scope.get('query_string', b'').decode()
+    values = parse_qs(query_string).get(name)
+    return values[0] if values else None
+
+
+class UserStateCache:
+    """
+    Short-TTL cache of ``(is_active, username, is_staff, is_superuser)`` per user
+
+    A small process-local map sits in front of the shared cache so that
+    repeated connects from the same user are answered without leaving the
+    event loop. Misses are resolved in a single thread-pool hop.
+    """
+
+    _local = OrderedDict()
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f"{CACHE_KEY_PREFIX}_{user_id}"
+
+    @classmethod
+    def get_local(cls, user_id):
+        entry = cls._local.get(user_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at < time.monotonic():
+            cls._local.pop(user_id, None)
+            return None
+        return state
+
+    @classmethod
+    def set_local(cls, user_id, state):
+        cls._local[user_id] = (time.monotonic() + _get_state_timeout(), state)
+        cls._local.move_to_end(user_id)
+        while len(cls._local) > LOCAL_CACHE_MAX_ENTRIES:
+            cls._local.popitem(last=False)
+
+    @classmethod
+    def load(cls, user_id):
+        """Load user state from the shared cache or the database (sync)"""
+        key = cls._cache_key(user_id)
+        state = cache.get(key)
+        if state is None:
+            row = User.objects.filter(pk=user_id).values_list(
+                'is_active', 'username', 'is_staff', 'is_superuser'
+            ).first()
+            if row is None:
+                return None
+            state = tuple(row)
+            cache.set(key, state, _get_state_timeout())
+        return state
+
+    @classmethod
+    async def aget(cls, user_id):
+        """Get user state, only leaving the event loop on a local miss"""
+        state = cls.get_local(user_id)
+        if state is None:
+            state = await database_sync_to_async(cls.load)(user_id)
+            if state is not None:
+                cls.set_local(user_id, state)
+        return state
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """Drop cached state after the user row changes"""
+        cls._local.pop(user_id, None)
+        try:
+            cache.delete(cls._cache_key(user_id))
+        except Exception as e:
+            logger.warning(f"Error invalidating WebSocket user state: {str(e)}")
+
+
+async def authenticate_websocket(scope):
+    """
+    Resolve the user for a WebSocket connection
+
+    Returns:
+        TokenUser with the cached account state, or AnonymousUser
+    """
+    try:
+        raw_token = get_query_param(scope, 'token')
+        if not raw_token:
+            return AnonymousUser()
+
+        try:
+            token = AccessToken(raw_token)
+        except TokenError:
+            return AnonymousUser()
+
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return AnonymousUser()
+
+        state = await UserStateCache.aget(user_id)
+        if state is None:
+            return AnonymousUser()
+
+        is_active, username, is_staff, is_superuser = state
+        if not is_active:
+            return AnonymousUser()
+
+        # Current state wins over the (possibly stale) claims
+        token.payload['username'] = username
+        token.payload['is_staff'] = is_staff
+        token.payload['is_superuser'] = is_superuser
+
+        return TokenUser(token)
+
+    except Exception as e:
+        logger.error(f"Error extracting user from token: {str(e)}")
+        return AnonymousUser()
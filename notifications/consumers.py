@@ -3,13 +3,15 @@ WebSocket consumers for real-time notifications
 """
 import json
 import logging
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django_blog.metrics import WEBSOCKET_CONNECTIONS
+from .auth import authenticate_websocket, get_query_param
+from .presence import PresenceRegistry
+from .replay import ReplayLog
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -51,12 +53,16 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 )
             
             await self.accept()
+            WEBSOCKET_CONNECTIONS.inc(type(self).__name__)
             logger.info(f"WebSocket connected for user {user.username}")
             
-            # Send connection confirmation
+            await self.touch_presence()
+            
+            # Send connection confirmation with whatever the client missed
             await self.send(text_data=json.dumps({
                 'type': 'connection_established',
-                'message': 'Connected to notifications'
+                'message': 'Connected to notifications',
+                **await self.get_catch_up()
             }))
         else:
             logger.warning("WebSocket connection rejected: Invalid or missing token")
@@ -65,6 +71,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         if self.user and self.user_group_name:
+            WEBSOCKET_CONNECTIONS.dec(type(self).__name__)
+            await sync_to_async(PresenceRegistry.remove)(self.user.id, self.channel_name)
+            
             # Leave user-specific group
             await self.channel_layer.group_discard(
                 self.user_group_name,
@@ -94,10 +103,16 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             
             if message_type == 'ping':
                 # Respond to ping to keep connection alive
+                await self.touch_presence()
                 await self.send(text_data=json.dumps({
                     'type': 'pong',
                     'timestamp': text_data_json.get('timestamp')
                 }))
+            elif message_type == 'ack':
+                # Client confirms it received these notifications
+                notification_ids = text_data_json.get('notification_ids') or []
+                if notification_ids:
+                    await self.acknowledge_notifications(notification_ids)
             elif message_type == 'mark_read':
                 # Handle mark as read request
                 notification_id = text_data_json.get('notification_id')
@@ -115,14 +130,16 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         """Send notification to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'notification',
-            'notification': event['notification']
+            'notification': event['notification'],
+            'seq': event.get('seq')
         }))
 
     async def notification_update(self, event):
         """Send notification update to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'notification_update',
-            'update': event['update']
+            'update': event['update'],
+            'seq': event.get('seq')
         }))
 
     async def system_announcement(self, event):
@@ -132,39 +149,54 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'announcement': event['announcement']
         }))
 
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """Extract user from JWT token in query string"""
-        try:
-            # Get token from query string
-            query_string = self.scope.get('query_string', b'').decode()
-            token = None
-            
-            for param in query_string.split('&'):
-                if param.startswith('token='):
-                    token = param.split('=', 1)[1]
-                    break
-            
-            if not token:
-                return AnonymousUser()
-            
-            # Validate token
+    async def get_user_from_token(self):
+        """Resolve user from the JWT token in the query string"""
+        return await authenticate_websocket(self.scope)
+
+    async def touch_presence(self):
+        """Register or refresh this connection (cache I/O off the event loop)"""
+        await sync_to_async(PresenceRegistry.touch)(self.user.id, self.channel_name)
+
+    async def get_catch_up(self):
+        """
+        Build the catch-up part of the connection frame
+        
+        With a ``last_seq`` query parameter the missed frames are replayed
+        from the replay log. Otherwise, or when the gap is too large to
+        replay, undelivered notifications are sent and ``resync`` tells the
+        client to reload its list.
+        """
+        catch_up = {'seq': await sync_to_async(ReplayLog.current_seq)(self.user.id)}
+        
+        last_seq = get_query_param(self.scope, 'last_seq')
+        if last_seq is not None:
             try:
-                UntypedToken(token)
-            except (InvalidToken, TokenError):
-                return AnonymousUser()
-            
-            # Get user from token
-            from rest_framework_simplejwt.authentication import JWTAuthentication
-            jwt_auth = JWTAuthentication()
-            validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
-            
-            return user
-            
-        except Exception as e:
-            logger.error(f"Error extracting user from token: {str(e)}")
-            return AnonymousUser()
+                frames = await sync_to_async(ReplayLog.frames_since)(self.user.id, int(last_seq))
+            except ValueError:
+                frames = None
+            if frames is not None:
+                catch_up['replay'] = frames
+                return catch_up
+            catch_up['resync'] = True
+        
+        catch_up['pending'] = await self.get_pending_notifications()
+        return catch_up
+
+    @database_sync_to_async
+    def get_pending_notifications(self):
+        """Get serialized notifications the client has not acknowledged yet"""
+        from .services import NotificationService
+        limit = settings.WEBSOCKET_SETTINGS.get('CATCHUP_LIMIT', 50)
+        return [
+            notification.to_dict()
+            for notification in NotificationService.get_pending_notifications(self.user.id, limit)
+        ]
+
+    @database_sync_to_async
+    def acknowledge_notifications(self, notification_ids):
+        """Mark acknowledged notifications as delivered"""
+        from .services import NotificationService
+        NotificationService.acknowledge_delivery(self.user.id, notification_ids)
 
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
@@ -173,7 +205,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             from .models import Notification
             notification = Notification.objects.get(
                 id=notification_id,
-                recipient=self.user
+                recipient_id=self.user.id
             )
             notification.mark_as_read()
             logger.info(f"Notification {notification_id} marked as read for user {self.user.username}")
@@ -200,6 +232,7 @@ class DashboardConsumer(AsyncWebsocketConsumer):
             )
             
             await self.accept()
+            WEBSOCKET_CONNECTIONS.inc(type(self).__name__)
             logger.info(f"Dashboard WebSocket connected for user {user.username}")
         else:
             logger.warning("Dashboard WebSocket connection rejected: Unauthorized")
@@ -208,6 +241,7 @@ class DashboardConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
         if hasattr(self, 'user'):
+            WEBSOCKET_CONNECTIONS.dec(type(self).__name__)
             await self.channel_layer.group_discard(
                 "dashboard_users",
                 self.channel_name
@@ -235,33 +269,6 @@ class DashboardConsumer(AsyncWebsocketConsumer):
             'data': event['data']
         }))
 
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """Extract user from JWT token - same as NotificationConsumer"""
-        try:
-            query_string = self.scope.get('query_string', b'').decode()
-            token = None
-            
-            for param in query_string.split('&'):
-                if param.startswith('token='):
-                    token = param.split('=', 1)[1]
-                    break
-            
-            if not token:
-                return AnonymousUser()
-            
-            try:
-                UntypedToken(token)
-            except (InvalidToken, TokenError):
-                return AnonymousUser()
-            
-            from rest_framework_simplejwt.authentication import JWTAuthentication
-            jwt_auth = JWTAuthentication()
-            validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
-            
-            return user
-            
-        except Exception as e:
-            logger.error(f"Error extracting user from token: {str(e)}")
-            return AnonymousUser()
\ No newline at end of file
+    async def get_user_from_token(self):
+        """Resolve user from the JWT token - same as NotificationConsumer"""
+        return await authenticate_websocket(self.scope)
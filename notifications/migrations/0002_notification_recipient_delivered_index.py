@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'delivered_at'], name='notificatio_recipie_71dae9_idx'),
+        ),
+    ]
@@ -10,6 +10,16 @@ import json
 User = get_user_model()
 
 
+def is_time_in_quiet_hours(now, start, end):
+    """Check if a time of day falls inside a quiet hours window"""
+    if start <= end:
+        # Same day quiet hours (e.g., 13:00 to 15:00)
+        return start <= now <= end
+    else:
+        # Overnight quiet hours (e.g., 22:00 to 08:00 next day)
+        return now >= start or now <= end
+
+
 class Notification(models.Model):
     """
     Model for storing user notifications
@@ -123,6 +133,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient', 'is_read']),
             models.Index(fields=['recipient', 'created_at']),
+            models.Index(fields=['recipient', 'delivered_at']),
             models.Index(fields=['notification_type', 'created_at']),
             models.Index(fields=['priority', 'created_at']),
             models.Index(fields=['is_read', 'created_at']),
@@ -313,6 +324,21 @@ class NotificationPreference(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Preference field that controls each notification type
+    TYPE_PREFERENCE_FIELDS = {
+        'comment': 'notify_comments',
+        'comment_reply': 'notify_comment_replies',
+        'post_liked': 'notify_post_likes',
+        'user_followed': 'notify_user_follows',
+        'post_featured': 'notify_post_featured',
+        'content_approved': 'notify_content_moderation',
+        'content_rejected': 'notify_content_moderation',
+        'system_announcement': 'notify_system_announcements',
+        'user_registration': 'notify_user_registrations',
+        'moderation_required': 'notify_moderation_required',
+        'post_published': 'notify_post_published',
+    }
+    
     class Meta:
         verbose_name = 'Notification Preference'
         verbose_name_plural = 'Notification Preferences'
@@ -322,57 +348,47 @@ class NotificationPreference(models.Model):
     
     def is_notification_enabled(self, notification_type):
         """Check if a specific notification type is enabled for this user"""
-        type_mapping = {
-            'comment': self.notify_comments,
-            'comment_reply': self.notify_comment_replies,
-            'post_liked': self.notify_post_likes,
-            'user_followed': self.notify_user_follows,
-            'post_featured': self.notify_post_featured,
-            'content_approved': self.notify_content_moderation,
-            'content_rejected': self.notify_content_moderation,
-            'system_announcement': self.notify_system_announcements,
-            'user_registration': self.notify_user_registrations,
-            'moderation_required': self.notify_moderation_required,
-            'post_published': self.notify_post_published,
-        }
-        return type_mapping.get(notification_type, True)
+        field_name = self.TYPE_PREFERENCE_FIELDS.get(notification_type)
+        if field_name is None:
+            return True
+        return getattr(self, field_name)
     
     def is_in_quiet_hours(self):
         """Check if current time is within quiet hours"""
         if not self.quiet_hours_enabled or not self.quiet_hours_start or not self.quiet_hours_end:
             return False
         
-        now = timezone.now().time()
-        start = self.quiet_hours_start
-        end = self.quiet_hours_end
-        
-        if start <= end:
-            # Same day quiet hours (e.g., 22:00 to 08:00 next day)
-            return start <= now <= end
-        else:
-            # Overnight quiet hours (e.g., 22:00 to 08:00 next day)
-            return now >= start or now <= end
+        return is_time_in_quiet_hours(
+            timezone.now().time(),
+            self.quiet_hours_start,
+            self.quiet_hours_end
+        )
+    
+    @staticmethod
+    def get_defaults_for_user(user):
+        """Default preference values for a user without a stored row"""
+        return {
+            'email_notifications': True,
+            'push_notifications': True,
+            'in_app_notifications': True,
+            'notify_comments': True,
+            'notify_comment_replies': True,
+            'notify_post_likes': True,
+            'notify_user_follows': True,
+            'notify_post_featured': True,
+            'notify_content_moderation': True,
+            'notify_system_announcements': True,
+            'notify_user_registrations': user.is_staff,
+            'notify_moderation_required': user.is_staff,
+            'notify_post_published': user.is_staff,
+        }
     
     @classmethod
     def get_or_create_for_user(cls, user):
         """Get or create notification preferences for a user"""
         preferences, created = cls.objects.get_or_create(
             user=user,
-            defaults={
-                'email_notifications': True,
-                'push_notifications': True,
-                'in_app_notifications': True,
-                'notify_comments': True,
-                'notify_comment_replies': True,
-                'notify_post_likes': True,
-                'notify_user_follows': True,
-                'notify_post_featured': True,
-                'notify_content_moderation': True,
-                'notify_system_announcements': True,
-                'notify_user_registrations': user.is_staff,
-                'notify_moderation_required': user.is_staff,
-                'notify_post_published': user.is_staff,
-            }
+            defaults=cls.get_defaults_for_user(user)
         )
         return preferences
 
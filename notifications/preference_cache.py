@@ -0,0 +1,183 @@
+"""
+Cache layer for notification preference lookups
+
+Preferences are stored in the cache as a compact tuple of
+``(enabled_types_bitmask, quiet_hours_start, quiet_hours_end)`` so that
+checking whether a notification should be created does not cost a
+database round trip per notification.
+"""
+import logging
+from typing import Dict, Iterable
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Notification, NotificationPreference, is_time_in_quiet_hours
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'notification_prefs'
+
+# Bit assigned to each notification type, in NOTIFICATION_TYPES order
+TYPE_BITS = {
+    notification_type: 1 << index
+    for index, (notification_type, label) in enumerate(Notification.NOTIFICATION_TYPES)
+}
+
+
+def _get_cache_timeout():
+    notification_settings = getattr(settings, 'NOTIFICATION_SETTINGS', {})
+    return notification_settings.get('PREFERENCE_CACHE_TIMEOUT', 300)
+
+
+class PreferenceSnapshot:
+    """
+    Read-only view of a user's notification preferences
+    """
+
+    __slots__ = ('mask', 'quiet_hours_start', 'quiet_hours_end')
+
+    def __init__(self, mask, quiet_hours_start=None, quiet_hours_end=None):
+        self.mask = mask
+        self.quiet_hours_start = quiet_hours_start
+        self.quiet_hours_end = quiet_hours_end
+
+    @classmethod
+    def from_values(cls, values):
+        """Build a snapshot from a mapping of preference field values"""
+        mask = 0
+        for notification_type, bit in TYPE_BITS.items():
+            field_name = NotificationPreference.TYPE_PREFERENCE_FIELDS.get(notification_type)
+            if field_name is None or values.get(field_name):
+                mask |= bit
+
+        if (values.get('quiet_hours_enabled')
+                and values.get('quiet_hours_start')
+                and values.get('quiet_hours_end')):
+            return cls(mask, values['quiet_hours_start'], values['quiet_hours_end'])
+        return cls(mask)
+
+    @classmethod
+    def from_preferences(cls, preferences):
+        """Build a snapshot from a NotificationPreference instance"""
+        return cls.from_values(preferences.__dict__)
+
+    def to_cache(self):
+        return (self.mask, self.quiet_hours_start, self.quiet_hours_end)
+
+    @classmethod
+    def from_cache(cls, value):
+        return cls(*value)
+
+    def is_notification_enabled(self, notification_type):
+        """Check if a specific notification type is enabled"""
+        bit = TYPE_BITS.get(notification_type)
+        if bit is None:
+            return True
+        return bool(self.mask & bit)
+
+    def is_in_quiet_hours(self):
+        """Check if current time is within quiet hours"""
+        if self.quiet_hours_start is None or self.quiet_hours_end is None:
+            return False
+        return is_time_in_quiet_hours(
+            timezone.now().time(),
+            self.quiet_hours_start,
+            self.quiet_hours_end
+        )
+
+
+class NotificationPreferenceCache:
+    """
+    Cached access to notification preferences
+    """
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f"{CACHE_KEY_PREFIX}_{user_id}"
+
+    @staticmethod
+    def get(user) -> PreferenceSnapshot:
+        """
+        Get the preference snapshot for a single user
+
+        Args:
+            user: User to get preferences for
+
+        Returns:
+            PreferenceSnapshot for the user
+        """
+        return NotificationPreferenceCache.get_many([user])[user.id]
+
+    @staticmethod
+    def get_many(users: Iterable) -> Dict[int, PreferenceSnapshot]:
+        """
+        Bulk load preference snapshots, e.g. before a group fan-out
+
+        Cache misses are resolved with a single query. Users without a
+        stored preference row get the model defaults without creating one.
+
+        Args:
+            users: Users to get preferences for
+
+        Returns:
+            Dictionary mapping user id to PreferenceSnapshot
+        """
+        users_by_id = {user.id: user for user in users}
+        if not users_by_id:
+            return {}
+
+        keys = {
+            NotificationPreferenceCache._cache_key(user_id): user_id
+            for user_id in users_by_id
+        }
+        snapshots = {}
+
+        try:
+            cached = cache.get_many(keys.keys())
+        except Exception as e:
+            logger.warning(f"Error reading notification preference cache: {str(e)}")
+            cached = {}
+
+        for key, value in cached.items():
+            snapshots[keys[key]] = PreferenceSnapshot.from_cache(value)
+
+        missing_ids = [user_id for user_id in users_by_id if user_id not in snapshots]
+        if not missing_ids:
+            return snapshots
+
+        loaded = {}
+        for preferences in NotificationPreference.objects.filter(user_id__in=missing_ids):
+            loaded[preferences.user_id] = PreferenceSnapshot.from_preferences(preferences)
+
+        for user_id in missing_ids:
+            if user_id not in loaded:
+                defaults = NotificationPreference.get_defaults_for_user(users_by_id[user_id])
+                loaded[user_id] = PreferenceSnapshot.from_values(defaults)
+
+        try:
+            cache.set_many(
+                {
+                    NotificationPreferenceCache._cache_key(user_id): snapshot.to_cache()
+                    for user_id, snapshot in loaded.items()
+                },
+                _get_cache_timeout()
+            )
+        except Exception as e:
+            logger.warning(f"Error writing notification preference cache: {str(e)}")
+
+        snapshots.update(loaded)
+        return snapshots
+
+    @staticmethod
+    def invalidate(user_or_id) -> None:
+        """
+        Drop the cached preferences for a user
+
+        Args:
+            user_or_id: User instance or user id
+        """
+        user_id = getattr(user_or_id, 'id', user_or_id)
+        try:
+            cache.delete(NotificationPreferenceCache._cache_key(user_id))
+        except Exception as e:
+            logger.warning(f"Error invalidating notification preference cache: {str(e)}")
@@ -0,0 +1,126 @@
+"""
+Presence registry for notification WebSocket connections
+
+Every open connection has its own cache key, refreshed by the ``ping``
+handler, and each online user has a connection counter. Both are updated
+with single atomic cache operations (``add``, ``incr``, ``decr``,
+``delete``) so concurrent tabs and processes never overwrite each other.
+Connections that stop sending heartbeats age out after
+``CONNECTION_TIMEOUT``; the counter errs on the side of "online".
+
+Presence is only used to skip publishing to offline users when the cache
+is shared by every process (see ``django_blog.caching``). Otherwise, or
+when the cache fails, users count as online and frames are always sent.
+
+The methods are synchronous: consumers call them through ``sync_to_async``.
+"""
+import logging
+from typing import Iterable, Set
+from django.conf import settings
+from django.core.cache import cache
+from django_blog.caching import cache_state_is_reliable
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'notification_presence'
+
+
+def _get_connection_timeout():
+    websocket_settings = getattr(settings, 'WEBSOCKET_SETTINGS', {})
+    return websocket_settings.get('CONNECTION_TIMEOUT', 300)
+
+
+class PresenceRegistry:
+    """
+    Track which users currently have an open notifications socket
+    """
+
+    @staticmethod
+    def _count_key(user_id):
+        return f"{CACHE_KEY_PREFIX}_{user_id}"
+
+    @staticmethod
+    def _connection_key(user_id, channel_name):
+        return f"{CACHE_KEY_PREFIX}_{user_id}_{channel_name}"
+
+    @staticmethod
+    def touch(user_id, channel_name) -> None:
+        """
+        Register a connection or refresh it from a heartbeat
+
+        Args:
+            user_id: ID of the connected user
+            channel_name: Channel name of the consumer instance
+        """
+        timeout = _get_connection_timeout()
+        count_key = PresenceRegistry._count_key(user_id)
+        try:
+            cache.add(count_key, 0, timeout)
+            if cache.add(PresenceRegistry._connection_key(user_id, channel_name), 1, timeout):
+                # New (or expired) connection: counted once, whoever else races
+                cache.incr(count_key)
+            else:
+                cache.touch(PresenceRegistry._connection_key(user_id, channel_name), timeout)
+                if cache.get(count_key, 0) <= 0:
+                    # Counter lost while this connection is still alive
+                    cache.incr(count_key)
+            cache.touch(count_key, timeout)
+        except Exception as e:
+            logger.warning(f"Error updating presence for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def remove(user_id, channel_name) -> None:
+        """
+        Unregister a connection on disconnect
+
+        Only the caller that actually deletes the connection key decrements
+        the counter, so sibling connections stay counted.
+
+        Args:
+            user_id: ID of the disconnected user
+            channel_name: Channel name of the consumer instance
+        """
+        try:
+            if cache.delete(PresenceRegistry._connection_key(user_id, channel_name)):
+                cache.decr(PresenceRegistry._count_key(user_id))
+        except ValueError:
+            # Counter already expired
+            pass
+        except Exception as e:
+            logger.warning(f"Error removing presence for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def is_online(user_id) -> bool:
+        """Check if a user has at least one live connection (True when unknown)"""
+        if not cache_state_is_reliable():
+            return True
+        try:
+            return cache.get(PresenceRegistry._count_key(user_id), 0) > 0
+        except Exception as e:
+            logger.warning(f"Error reading presence for user {user_id}: {str(e)}")
+            return True
+
+    @staticmethod
+    def online_user_ids(user_ids: Iterable[int]) -> Set[int]:
+        """
+        Bulk presence lookup for a fan-out
+
+        Args:
+            user_ids: Candidate user IDs
+
+        Returns:
+            Set of user IDs with at least one live connection (all of them
+            when presence is unknown)
+        """
+        keys = {PresenceRegistry._count_key(user_id): user_id for user_id in user_ids}
+        if not keys:
+            return set()
+        if not cache_state_is_reliable():
+            return set(keys.values())
+        try:
+            entries = cache.get_many(keys.keys())
+        except Exception as e:
+            logger.warning(f"Error reading presence: {str(e)}")
+            return set(keys.values())
+
+        return {keys[key] for key, count in entries.items() if count > 0}
@@ -0,0 +1,116 @@
+"""
+Per-user replay log for the notifications WebSocket
+
+Every frame published to a user gets a monotonically increasing sequence
+number and is kept in the cache under its own key for a bounded window.
+A reconnecting client sends the last sequence number it saw and receives
+only the frames it missed, instead of reloading the whole list.
+
+Frames are recorded by whichever process publishes them and read by the
+ASGI process holding the socket, so the default cache must be shared
+(``NotificationsConfig.ready`` refuses to start otherwise). Methods are
+synchronous; consumers call them through ``sync_to_async``.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'notification_replay'
+
+
+def _get_replay_settings():
+    websocket_settings = getattr(settings, 'WEBSOCKET_SETTINGS', {})
+    return (
+        websocket_settings.get('REPLAY_LOG_SIZE', 100),
+        websocket_settings.get('REPLAY_LOG_TIMEOUT', 3600),
+    )
+
+
+class ReplayLog:
+    """
+    Bounded, sequence-numbered log of frames sent to each user
+    """
+
+    @staticmethod
+    def _seq_key(user_id):
+        return f"{CACHE_KEY_PREFIX}_{user_id}_seq"
+
+    @staticmethod
+    def _event_key(user_id, seq):
+        return f"{CACHE_KEY_PREFIX}_{user_id}_{seq}"
+
+    @staticmethod
+    def _next_seq(user_id):
+        key = ReplayLog._seq_key(user_id)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Counter missing (first frame or evicted): start a new sequence
+            cache.add(key, 0, None)
+            return cache.incr(key)
+
+    @staticmethod
+    def record(user_id, frame: Dict[str, Any]) -> Optional[int]:
+        """
+        Assign the next sequence number to a frame and store it
+
+        Args:
+            user_id: ID of the receiving user
+            frame: Client-facing frame (``type`` plus payload)
+
+        Returns:
+            Sequence number, or None if the log is unavailable
+        """
+        try:
+            seq = ReplayLog._next_seq(user_id)
+            size, timeout = _get_replay_settings()
+            cache.set(ReplayLog._event_key(user_id, seq), dict(frame, seq=seq), timeout)
+            return seq
+        except Exception as e:
+            logger.warning(f"Error recording replay frame for user {user_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def current_seq(user_id) -> int:
+        """Get the last sequence number assigned to a user"""
+        try:
+            return cache.get(ReplayLog._seq_key(user_id), 0)
+        except Exception as e:
+            logger.warning(f"Error reading replay sequence for user {user_id}: {str(e)}")
+            return 0
+
+    @staticmethod
+    def frames_since(user_id, last_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the frames a client missed after ``last_seq``
+
+        Args:
+            user_id: ID of the reconnecting user
+            last_seq: Last sequence number the client received
+
+        Returns:
+            Frames in sequence order, or None if the gap cannot be replayed
+            (too old, evicted, or the sequence was reset) and the client
+            must resync from the REST API
+        """
+        size, timeout = _get_replay_settings()
+        current = ReplayLog.current_seq(user_id)
+
+        if last_seq > current or current - last_seq > size:
+            return None
+        if last_seq == current:
+            return []
+
+        seqs = range(last_seq + 1, current + 1)
+        try:
+            frames = cache.get_many([ReplayLog._event_key(user_id, seq) for seq in seqs])
+        except Exception as e:
+            logger.warning(f"Error reading replay log for user {user_id}: {str(e)}")
+            return None
+
+        if len(frames) != len(seqs):
+            return None
+        return [frames[ReplayLog._event_key(user_id, seq)] for seq in seqs]
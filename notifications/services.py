@@ -9,7 +9,11 @@ from django.db import transaction
 from django.core.exceptions import ValidationError
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django_blog.metrics import CHANNEL_SEND_LATENCY, NOTIFICATION_FANOUT
 from .models import Notification, NotificationPreference, NotificationBatch
+from .preference_cache import NotificationPreferenceCache, PreferenceSnapshot
+from .presence import PresenceRegistry
+from .replay import ReplayLog
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -32,7 +36,8 @@ class NotificationService:
         data: Optional[Dict[str, Any]] = None,
         action_url: Optional[str] = None,
         expires_at: Optional[timezone.datetime] = None,
-        send_immediately: bool = True
+        send_immediately: bool = True,
+        preferences: Optional[PreferenceSnapshot] = None
     ) -> Notification:
         """
         Create and optionally send a notification
@@ -48,6 +53,7 @@ class NotificationService:
             action_url: URL to navigate to when clicked
             expires_at: When the notification expires
             send_immediately: Whether to send via WebSocket immediately
+            preferences: Preloaded preference snapshot for the recipient (optional)
             
         Returns:
             Created Notification instance
@@ -55,7 +61,8 @@ class NotificationService:
         try:
             with transaction.atomic():
                 # Check user preferences
-                preferences = NotificationPreference.get_or_create_for_user(recipient)
+                if preferences is None:
+                    preferences = NotificationPreferenceCache.get(recipient)
                 
                 # Check if this notification type is enabled
                 if not preferences.is_notification_enabled(notification_type):
@@ -82,9 +89,10 @@ class NotificationService:
                 
                 logger.info(f"Created notification {notification.id} for user {recipient.username}")
                 
-                # Send immediately if requested
+                # Send immediately if requested, once the row is committed:
+                # a rolled back notification must never reach a socket
                 if send_immediately:
-                    NotificationService.send_to_user(notification)
+                    transaction.on_commit(lambda: NotificationService.send_to_user(notification))
                 
                 return notification
                 
@@ -97,33 +105,30 @@ class NotificationService:
         """
         Send notification to specific user via WebSocket
         
+        Only users with an open socket are published to. Offline users keep
+        the notification undelivered and receive it as catch-up on their
+        next connect. ``delivered_at`` is set when the client acknowledges it.
+        
         Args:
             notification: Notification instance to send
             
         Returns:
-            True if sent successfully, False otherwise
+            True if published, False if queued or on error
         """
         try:
             if not channel_layer:
                 logger.warning("Channel layer not configured, cannot send WebSocket notification")
                 return False
             
-            # Prepare notification data
-            notification_data = notification.to_dict()
-            
-            # Send to user-specific group
-            group_name = f"user_{notification.recipient.id}"
-            
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    'type': 'notification_message',
-                    'notification': notification_data
-                }
+            published = NotificationService._publish_to_user(
+                notification.recipient_id,
+                'notification_message',
+                'notification',
+                notification.to_dict()
             )
-            
-            # Mark as delivered
-            notification.mark_as_delivered()
+            if not published:
+                logger.info(f"User {notification.recipient_id} offline, queued notification {notification.id}")
+                return False
             
             logger.info(f"Sent notification {notification.id} to user {notification.recipient.username}")
             return True
@@ -173,6 +178,9 @@ class NotificationService:
                 logger.warning(f"Unknown group name: {group_name}")
                 return []
             
+            recipients = list(recipients)
+            preferences_by_user = NotificationPreferenceCache.get_many(recipients)
+            
             # Create notifications for each recipient
             with transaction.atomic():
                 for recipient in recipients:
@@ -185,27 +193,16 @@ class NotificationService:
                         priority=priority,
                         data=data,
                         action_url=action_url,
-                        send_immediately=False  # We'll send in batch
+                        send_immediately=False,  # We'll send in batch
+                        preferences=preferences_by_user[recipient.id]
                     )
                     if notification:
                         notifications.append(notification)
                 
-                # Send to WebSocket group
                 if channel_layer and notifications:
-                    notification_data = notifications[0].to_dict()  # Use first notification as template
-                    
-                    async_to_sync(channel_layer.group_send)(
-                        group_name,
-                        {
-                            'type': 'notification_message',
-                            'notification': notification_data
-                        }
-                    )
-                    
-                    # Mark all as delivered
-                    for notification in notifications:
-                        notification.mark_as_delivered()
+                    transaction.on_commit(lambda: NotificationService._publish_notifications(notifications))
             
+            NOTIFICATION_FANOUT.observe(len(notifications), group_name)
             logger.info(f"Sent {len(notifications)} notifications to group {group_name}")
             return notifications
             
@@ -213,6 +210,80 @@ class NotificationService:
             logger.error(f"Error sending notification to group: {str(e)}")
             return []
     
+    @staticmethod
+    def _publish_notifications(notifications: List[Notification]) -> None:
+        """
+        Publish committed notifications to their online recipients
+        
+        Offline recipients catch up on connect.
+        
+        Args:
+            notifications: Notifications to publish
+        """
+        try:
+            online_ids = PresenceRegistry.online_user_ids(
+                notification.recipient_id for notification in notifications
+            )
+            
+            for notification in notifications:
+                NotificationService._publish_to_user(
+                    notification.recipient_id,
+                    'notification_message',
+                    'notification',
+                    notification.to_dict(),
+                    online=notification.recipient_id in online_ids
+                )
+        except Exception as e:
+            logger.error(f"Error publishing group notifications: {str(e)}")
+    
+    @staticmethod
+    def get_pending_notifications(user_id: int, limit: int = 50) -> List[Notification]:
+        """
+        Get notifications not yet acknowledged by the user's client
+        
+        Args:
+            user_id: ID of the user
+            limit: Maximum number of notifications to return
+            
+        Returns:
+            Undelivered notifications, oldest first
+        """
+        try:
+            return list(
+                Notification.objects.filter(
+                    recipient_id=user_id,
+                    delivered_at__isnull=True,
+                    is_dismissed=False
+                ).exclude(
+                    expires_at__lt=timezone.now()
+                ).select_related('recipient', 'sender').order_by('created_at')[:limit]
+            )
+        except Exception as e:
+            logger.error(f"Error getting pending notifications: {str(e)}")
+            return []
+    
+    @staticmethod
+    def acknowledge_delivery(user_id: int, notification_ids: List[int]) -> int:
+        """
+        Record client acknowledgement of delivered notifications
+        
+        Args:
+            user_id: ID of the acknowledging user
+            notification_ids: IDs of the received notifications
+            
+        Returns:
+            Number of notifications marked as delivered
+        """
+        try:
+            return Notification.objects.filter(
+                recipient_id=user_id,
+                id__in=notification_ids,
+                delivered_at__isnull=True
+            ).update(delivered_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Error acknowledging notification delivery: {str(e)}")
+            return 0
+    
     @staticmethod
     def mark_as_read(notification_id: int, user: User) -> bool:
         """
@@ -542,18 +613,59 @@ class NotificationService:
             if not channel_layer:
                 return False
             
-            group_name = f"user_{user.id}"
+            return NotificationService._publish_to_user(
+                user.id,
+                'notification_update',
+                'update',
+                update_data
+            )
+            
+        except Exception as e:
+            logger.error(f"Error sending notification update: {str(e)}")
+            return False
+    
+    # Client frame type for each consumer handler
+    CLIENT_FRAME_TYPES = {
+        'notification_message': 'notification',
+        'notification_update': 'notification_update',
+    }
+    
+    @staticmethod
+    def _publish_to_user(
+        user_id: int,
+        handler_type: str,
+        payload_key: str,
+        payload: Dict[str, Any],
+        online: Optional[bool] = None
+    ) -> bool:
+        """
+        Record a frame in the user's replay log and publish it if they are online
+        
+        Args:
+            user_id: ID of the receiving user
+            handler_type: Consumer handler for the channel layer message
+            payload_key: Key holding the payload in the frame
+            payload: Frame payload
+            online: Known presence state (looked up when omitted)
             
+        Returns:
+            True if published, False if the user is offline
+        """
+        frame_type = NotificationService.CLIENT_FRAME_TYPES[handler_type]
+        seq = ReplayLog.record(user_id, {'type': frame_type, payload_key: payload})
+        
+        if online is None:
+            online = PresenceRegistry.is_online(user_id)
+        if not online:
+            return False
+        
+        with CHANNEL_SEND_LATENCY.time('notifications'):
             async_to_sync(channel_layer.group_send)(
-                group_name,
+                f"user_{user_id}",
                 {
-                    'type': 'notification_update',
-                    'update': update_data
+                    'type': handler_type,
+                    payload_key: payload,
+                    'seq': seq
                 }
             )
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error sending notification update: {str(e)}")
-            return False
\ No newline at end of file
+        return True
\ No newline at end of file
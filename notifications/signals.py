@@ -6,6 +6,9 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from .auth import UserStateCache
+from .models import NotificationPreference
+from .preference_cache import NotificationPreferenceCache
 from .services import NotificationService
 
 # Import models from other apps
@@ -359,6 +362,24 @@ def handle_post_like(sender, instance, created, **kwargs):
         logger.error(f"Error creating post like notification: {str(e)}")
 
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_websocket_user_state(sender, instance, **kwargs):
+    """
+    Drop cached WebSocket user state when the user row changes
+    """
+    UserStateCache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=NotificationPreference)
+@receiver(post_delete, sender=NotificationPreference)
+def invalidate_notification_preferences(sender, instance, **kwargs):
+    """
+    Drop cached preferences when they are changed outside the API (admin, shell)
+    """
+    NotificationPreferenceCache.invalidate(instance.user_id)
+
+
 # Cleanup signal handlers
 @receiver(post_delete, sender=Comment)
 def handle_comment_deletion(sender, instance, **kwargs):
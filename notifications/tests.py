@@ -1,12 +1,23 @@
 """
 Tests for notifications app
 """
-from django.test import TestCase
+from datetime import time
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from channels.testing import WebsocketCommunicator
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
-from .consumers import NotificationConsumer
+from accounts.tokens import UserClaimsRefreshToken
+from .auth import UserStateCache
+from .consumers import NotificationConsumer, DashboardConsumer
+from .models import Notification, NotificationPreference
+from .preference_cache import NotificationPreferenceCache
+from .presence import PresenceRegistry
+from .replay import ReplayLog
+from .services import NotificationService
 
 User = get_user_model()
 
@@ -73,4 +84,273 @@ class NotificationConsumerTest(TestCase):
         self.assertEqual(response['type'], 'pong')
         self.assertEqual(response['timestamp'], 1234567890)
         
-        await communicator.disconnect()
\ No newline at end of file
+        await communicator.disconnect()
+
+
+class WebSocketAuthTest(TestCase):
+    """Test claim-based WebSocket authentication"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        UserStateCache._local.clear()
+        self.staff = User.objects.create_user(
+            username='staffws',
+            email='staffws@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.token = str(UserClaimsRefreshToken.for_user(self.staff).access_token)
+    
+    async def test_dashboard_connection_uses_role_state(self):
+        """Staff users are granted dashboard access"""
+        communicator = WebsocketCommunicator(
+            DashboardConsumer.as_asgi(),
+            f"/ws/dashboard/?token={self.token}"
+        )
+        
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertIsNotNone(UserStateCache.get_local(self.staff.id))
+        
+        await communicator.disconnect()
+    
+    async def test_demoted_staff_rejected_despite_claims(self):
+        """Role claims in old tokens do not outlive a demotion"""
+        self.staff.is_staff = False
+        await database_sync_to_async(self.staff.save)()
+        
+        communicator = WebsocketCommunicator(
+            DashboardConsumer.as_asgi(),
+            f"/ws/dashboard/?token={self.token}"
+        )
+        
+        connected, subprotocol = await communicator.connect()
+        self.assertFalse(connected)
+    
+    async def test_deactivated_user_rejected(self):
+        """Deactivating a user invalidates cached state and blocks new connections"""
+        await database_sync_to_async(UserStateCache.load)(self.staff.id)
+        
+        self.staff.is_active = False
+        await database_sync_to_async(self.staff.save)()
+        
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={self.token}"
+        )
+        
+        connected, subprotocol = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class PresenceRoutingTest(TestCase):
+    """Test presence-aware delivery and client acknowledgements"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='presenceuser',
+            email='presence@example.com',
+            password='testpass123'
+        )
+        # Welcome notification from registration is not part of these tests
+        Notification.objects.filter(recipient=self.user).delete()
+        self.token = str(AccessToken.for_user(self.user))
+    
+    def test_presence_registry(self):
+        """Connections are tracked per channel"""
+        PresenceRegistry.touch(self.user.id, 'channel-a')
+        PresenceRegistry.touch(self.user.id, 'channel-b')
+        PresenceRegistry.remove(self.user.id, 'channel-a')
+        
+        self.assertTrue(PresenceRegistry.is_online(self.user.id))
+        self.assertEqual(PresenceRegistry.online_user_ids([self.user.id, 0]), {self.user.id})
+        
+        PresenceRegistry.remove(self.user.id, 'channel-b')
+        self.assertFalse(PresenceRegistry.is_online(self.user.id))
+        
+        # A repeated disconnect must not drive the counter negative
+        PresenceRegistry.remove(self.user.id, 'channel-b')
+        PresenceRegistry.touch(self.user.id, 'channel-c')
+        self.assertTrue(PresenceRegistry.is_online(self.user.id))
+    
+    @override_settings(SHARED_CACHE_REQUIRED=True)
+    def test_presence_unknown_with_process_local_cache(self):
+        """A per-process cache cannot see other workers' sockets, so everyone counts as online"""
+        self.assertTrue(PresenceRegistry.is_online(self.user.id))
+        self.assertEqual(PresenceRegistry.online_user_ids([self.user.id]), {self.user.id})
+    
+    async def test_offline_notification_delivered_on_connect(self):
+        """Notifications for offline users are queued and acknowledged after catch-up"""
+        notification = await database_sync_to_async(NotificationService.create_notification)(
+            recipient=self.user,
+            notification_type='comment',
+            title='Queued',
+            message='Sent while offline'
+        )
+        self.assertIsNone(notification.delivered_at)
+        
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={self.token}"
+        )
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        
+        response = await communicator.receive_json_from()
+        self.assertEqual(response['type'], 'connection_established')
+        self.assertEqual([n['id'] for n in response['pending']], [notification.id])
+        
+        await communicator.send_json_to({
+            'type': 'ack',
+            'notification_ids': [notification.id]
+        })
+        await communicator.send_json_to({'type': 'ping', 'timestamp': 1})
+        await communicator.receive_json_from()
+        
+        await database_sync_to_async(notification.refresh_from_db)()
+        self.assertIsNotNone(notification.delivered_at)
+        
+        await communicator.disconnect()
+        self.assertFalse(PresenceRegistry.is_online(self.user.id))
+
+
+class ReplayLogTest(TestCase):
+    """Test sequence-numbered replay on reconnect"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='replayuser',
+            email='replay@example.com',
+            password='testpass123'
+        )
+        self.token = str(AccessToken.for_user(self.user))
+    
+    def create_committed_notification(self, **kwargs):
+        # Publishing waits for the commit, which TestCase never performs
+        with self.captureOnCommitCallbacks(execute=True):
+            return NotificationService.create_notification(**kwargs)
+    
+    def test_frames_since(self):
+        """Only frames after last_seq are returned, gaps force a resync"""
+        first = ReplayLog.record(self.user.id, {'type': 'notification_update', 'update': {'n': 1}})
+        second = ReplayLog.record(self.user.id, {'type': 'notification_update', 'update': {'n': 2}})
+        
+        self.assertEqual(second, first + 1)
+        self.assertEqual([f['seq'] for f in ReplayLog.frames_since(self.user.id, first)], [second])
+        self.assertEqual(ReplayLog.frames_since(self.user.id, second), [])
+        self.assertIsNone(ReplayLog.frames_since(self.user.id, second + 10))
+        
+        with self.settings(WEBSOCKET_SETTINGS={'REPLAY_LOG_SIZE': 1}):
+            self.assertIsNone(ReplayLog.frames_since(self.user.id, first - 1))
+    
+    def test_replay_log_requires_shared_cache(self):
+        """Startup fails clearly when the replay log would only live in one process"""
+        apps.get_app_config('notifications').ready()
+        
+        with self.settings(SHARED_CACHE_REQUIRED=True):
+            with self.assertRaises(ImproperlyConfigured):
+                apps.get_app_config('notifications').ready()
+    
+    async def test_reconnect_with_last_seq(self):
+        """Reconnecting with last_seq replays missed notifications"""
+        last_seq = await database_sync_to_async(ReplayLog.current_seq)(self.user.id)
+        notification = await database_sync_to_async(self.create_committed_notification)(
+            recipient=self.user,
+            notification_type='comment',
+            title='Missed',
+            message='Sent while disconnected'
+        )
+        
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={self.token}&last_seq={last_seq}"
+        )
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        
+        response = await communicator.receive_json_from()
+        self.assertNotIn('pending', response)
+        self.assertEqual(len(response['replay']), 1)
+        self.assertEqual(response['replay'][0]['notification']['id'], notification.id)
+        self.assertEqual(response['replay'][0]['seq'], response['seq'])
+        
+        await communicator.disconnect()
+    
+    def test_frames_published_after_commit(self):
+        """Notifications reach the replay log and channel layer only once committed"""
+        start = ReplayLog.current_seq(self.user.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            NotificationService.create_notification(
+                recipient=self.user,
+                notification_type='comment',
+                title='Direct',
+                message='Sent to one user'
+            )
+            NotificationService.send_to_group('all_users', 'system_announcement', 'Group', 'Sent to everyone')
+            self.assertEqual(ReplayLog.current_seq(self.user.id), start)
+        
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(ReplayLog.current_seq(self.user.id), start + 2)
+
+
+class NotificationPreferenceCacheTest(TestCase):
+    """Test cached notification preference lookups"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='prefuser',
+            email='pref@example.com',
+            password='testpass123'
+        )
+        self.staff = User.objects.create_user(
+            username='staffuser',
+            email='staff@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+    
+    def test_defaults_without_preference_row(self):
+        """Users without stored preferences get the model defaults"""
+        NotificationPreference.objects.filter(user__in=[self.user, self.staff]).delete()
+        cache.clear()
+        
+        snapshots = NotificationPreferenceCache.get_many([self.user, self.staff])
+        
+        self.assertTrue(snapshots[self.user.id].is_notification_enabled('comment'))
+        self.assertFalse(snapshots[self.user.id].is_notification_enabled('user_registration'))
+        self.assertTrue(snapshots[self.staff.id].is_notification_enabled('user_registration'))
+        self.assertFalse(NotificationPreference.objects.filter(user=self.user).exists())
+    
+    def test_cached_lookup_skips_database(self):
+        """Second lookup is served from the cache"""
+        NotificationPreferenceCache.get(self.user)
+        
+        with self.assertNumQueries(0):
+            snapshot = NotificationPreferenceCache.get(self.user)
+        
+        self.assertTrue(snapshot.is_notification_enabled('comment'))
+    
+    def test_invalidated_on_preference_change(self):
+        """Saving preferences drops the cached snapshot"""
+        self.assertTrue(NotificationPreferenceCache.get(self.user).is_notification_enabled('comment'))
+        
+        preferences = NotificationPreference.get_or_create_for_user(self.user)
+        preferences.notify_comments = False
+        preferences.quiet_hours_enabled = True
+        preferences.quiet_hours_start = time(0, 0)
+        preferences.quiet_hours_end = time(23, 59, 59, 999999)
+        preferences.save()
+        
+        snapshot = NotificationPreferenceCache.get(self.user)
+        self.assertFalse(snapshot.is_notification_enabled('comment'))
+        self.assertTrue(snapshot.is_notification_enabled('comment_reply'))
+        self.assertTrue(snapshot.is_in_quiet_hours())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from dashboard.realtime import DashboardMetricsPublisher
 from .models import Post, Categoria, Comentario
 
 @admin.register(Categoria)
@@ -69,11 +70,13 @@ class ComentarioAdmin(admin.ModelAdmin):
     
     def aprobar_comentarios(self, request, queryset):
         queryset.update(approved=True)
+        DashboardMetricsPublisher.request_refresh()
         self.message_user(request, f'{queryset.count()} comentarios aprobados.')
     aprobar_comentarios.short_description = 'Aprobar comentarios seleccionados'
     
     def rechazar_comentarios(self, request, queryset):
         queryset.update(approved=False)
+        DashboardMetricsPublisher.request_refresh()
         self.message_user(request, f'{queryset.count()} comentarios rechazados.')
     rechazar_comentarios.short_description = 'Rechazar comentarios seleccionados'
 
@@ -159,7 +159,9 @@ class PostListAPIView(BaseAPIView, generics.ListCreateAPIView):
         return PostSerializer
 
 class PostDetailAPIView(BaseAPIView, generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.filter(status='published').select_related('autor', 'categoria').prefetch_related('comentarios')
+    queryset = Post.objects.filter(status='published').select_related(
+        'autor', 'categoria', 'contenido_render'
+    ).prefetch_related('comentarios')
     serializer_class = PostDetailSerializer
     lookup_field = 'pk'
     permission_classes = [IsAuthorOrReadOnly]
@@ -391,7 +393,9 @@ class CommentDetailAPIView(BaseAPIView, generics.RetrieveUpdateDestroyAPIView):
 def featured_posts(request):
     """Get featured posts"""
     try:
-        posts = Post.objects.filter(status='published', featured=True)[:6]
+        posts = Post.objects.filter(status='published', featured=True).select_related(
+            'autor', 'categoria', 'contenido_render'
+        )[:6]
         serializer = PostSerializer(posts, many=True, context={'request': request})
         return StandardAPIResponse.success(serializer.data)
     except Exception as e:
@@ -1195,7 +1199,7 @@ def get_post_by_slug(request, slug):
         except (ValueError, IndexError):
             return StandardAPIResponse.not_found('Invalid post slug format')
         
-        post = Post.objects.select_related('autor', 'categoria').prefetch_related(
+        post = Post.objects.select_related('autor', 'categoria', 'contenido_render').prefetch_related(
             'comentarios__usuario'
         ).get(id=post_id, status='published')
         
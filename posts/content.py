@@ -0,0 +1,302 @@
+"""
+Procesamiento del HTML de los posts al guardar
+
+TinyMCE deja en ``Post.contenido`` etiquetas ``<img>`` que apuntan al
+archivo original (o incluso imágenes en base64 incrustadas). Al guardar:
+
+1. ``extract_inline_images`` convierte cada ``data:image/...;base64`` en un
+   ``MediaFile`` real (deduplicado por contenido) y reemplaza el ``src``.
+2. ``render_content`` reescribe las imágenes locales con ``srcset``/``sizes``
+   (``<picture>`` cuando hay varios formatos), ``width``/``height`` para
+   evitar saltos de maquetación y ``loading="lazy"``.
+
+3. ``build_render`` sanea ese HTML, da ``id`` a los encabezados y arma la
+   tabla de contenidos (``posts.sanitizer``). El resultado es un
+   ``PostRender`` identificado por el hash del HTML de entrada, así que solo
+   se procesa una vez por revisión y los detalles lo sirven sin analizar
+   nada en cada petición.
+
+Mientras alguna imagen espera sus versiones redimensionadas el post queda
+marcado con ``contenido_html_pending`` y la etapa de procesamiento lo vuelve
+a renderizar al terminar (``refresh_pending_content``).
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlparse
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+DATA_URI_RE = re.compile(r'^data:image/(png|jpe?g|gif|webp);base64,(.+)$', re.IGNORECASE | re.DOTALL)
+
+# Cambiar al modificar el saneado o la reescritura para invalidar los renders
+RENDER_VERSION = 1
+
+# Formatos de las versiones, del más eficiente al de respaldo
+SOURCE_FORMATS = [('avif', 'image/avif'), ('webp', 'image/webp')]
+FALLBACK_FORMAT = 'jpeg'
+
+
+class _TagParser(HTMLParser):
+    """Lee los atributos de una sola etiqueta de apertura"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.attrs = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.attrs is None:
+            self.attrs = attrs
+
+    handle_startendtag = handle_starttag
+
+
+def parse_tag_attrs(tag):
+    """Atributos de una etiqueta ``<img ...>`` como diccionario ordenado"""
+    parser = _TagParser()
+    parser.feed(tag)
+    parser.close()
+    return {name.lower(): value for name, value in (parser.attrs or [])}
+
+
+def build_tag(name, attrs):
+    """Construir una etiqueta de apertura escapando los valores"""
+    parts = [name]
+    for attr, value in attrs.items():
+        parts.append(attr if value is None else f'{attr}="{escape(str(value), quote=True)}"')
+    return f"<{' '.join(parts)}>"
+
+
+def media_name_from_url(url):
+    """
+    Nombre en el storage de una URL bajo MEDIA_URL (relativa o absoluta)
+
+    Returns:
+        El nombre, o None si la URL no apunta a un archivo local
+    """
+    media_path = urlparse(settings.MEDIA_URL).path or '/'
+    path = urlparse(url or '').path
+    if not path.startswith(media_path):
+        return None
+    return unquote(path[len(media_path):]) or None
+
+
+def _decode_data_uri(src):
+    match = DATA_URI_RE.match((src or '').strip())
+    if not match:
+        return None, None
+    extension = match.group(1).lower().replace('jpeg', 'jpg')
+    try:
+        data = base64.b64decode(match.group(2), validate=False)
+        # Solo se aceptan datos que Pillow reconoce como imagen
+        Image.open(io.BytesIO(data)).verify()
+    except (binascii.Error, ValueError, OSError, Image.DecompressionBombError):
+        return None, None
+    return data, extension
+
+
+def extract_inline_images(html, user):
+    """
+    Guardar como archivos las imágenes incrustadas en base64
+
+    Args:
+        html: Contenido del post
+        user: Autor al que se asignan los archivos creados
+
+    Returns:
+        HTML con las imágenes apuntando a sus URLs en MEDIA_URL
+    """
+    if not html or 'data:image' not in html:
+        return html
+
+    from media_files.blobs import create_media_file
+
+    max_size = getattr(settings, 'MEDIA_FILE_SETTINGS', {}).get('MAX_FILE_SIZE', 10 * 1024 * 1024)
+
+    def replace(match):
+        attrs = parse_tag_attrs(match.group(0))
+        data, extension = _decode_data_uri(attrs.get('src'))
+        if data is None:
+            return match.group(0)
+        if len(data) > max_size:
+            logger.warning(f"Imagen incrustada de {len(data)} bytes descartada por superar el límite")
+            return match.group(0)
+
+        filename = f"inline-{hashlib.sha256(data).hexdigest()[:16]}.{extension}"
+        media_file = create_media_file(
+            SimpleUploadedFile(filename, data),
+            filename,
+            file_size=len(data),
+            mime_type=f"image/{'jpeg' if extension == 'jpg' else extension}",
+            uploaded_by=user,
+            alt_text=(attrs.get('alt') or '')[:255]
+        )
+        attrs['src'] = media_file.file.url
+        return build_tag('img', attrs)
+
+    return IMG_TAG_RE.sub(replace, html)
+
+
+def _srcset(variants):
+    from django.core.files.storage import default_storage
+    return ', '.join(f"{default_storage.url(variant['path'])} {variant['width']}w" for variant in variants)
+
+
+def _int_attr(value):
+    try:
+        return int(str(value).strip().rstrip('px'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rewrite_image(attrs, renditions):
+    """Etiqueta ``<img>``/``<picture>`` responsive para una imagen con versiones"""
+    from django.core.files.storage import default_storage
+
+    intrinsic_width, intrinsic_height = renditions['width'], renditions['height']
+    width = _int_attr(attrs.get('width'))
+    height = _int_attr(attrs.get('height'))
+    if width and not height:
+        height = round(intrinsic_height * width / intrinsic_width)
+    elif height and not width:
+        width = round(intrinsic_width * height / intrinsic_height)
+    elif not width:
+        width, height = intrinsic_width, intrinsic_height
+
+    formats = renditions.get('formats', {})
+    fallback = formats.get(FALLBACK_FORMAT) or next(iter(formats.values()), [])
+    sizes = f'(max-width: {width}px) 100vw, {width}px'
+
+    if fallback:
+        # Versión más pequeña que cubre el ancho mostrado
+        src_variant = next((variant for variant in fallback if variant['width'] >= width), fallback[-1])
+        attrs['src'] = default_storage.url(src_variant['path'])
+        attrs['srcset'] = _srcset(fallback)
+        attrs['sizes'] = sizes
+    attrs['width'] = width
+    attrs['height'] = height
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    img = build_tag('img', attrs)
+
+    sources = [
+        f'<source type="{mime_type}" srcset="{escape(_srcset(formats[output_format]))}" sizes="{sizes}">'
+        for output_format, mime_type in SOURCE_FORMATS
+        if formats.get(output_format) and formats.get(output_format) is not fallback
+    ]
+    if not sources:
+        return img
+    return f"<picture>{''.join(sources)}{img}</picture>"
+
+
+def render_content(html):
+    """
+    Reescribir las imágenes del contenido para servirlo
+
+    Returns:
+        Tupla ``(html, pending)``; ``pending`` indica que alguna imagen local
+        aún no tiene versiones y el render debe repetirse más tarde
+    """
+    from media_files.models import MediaFile
+
+    if not html or '<img' not in html.lower():
+        return html or '', False
+
+    tags = [(match, parse_tag_attrs(match.group(0))) for match in IMG_TAG_RE.finditer(html)]
+    names = {media_name_from_url(attrs.get('src')) for _, attrs in tags} - {None}
+
+    # Una sola consulta para todas las imágenes del post
+    media = {}
+    for name, renditions, status in MediaFile.objects.filter(file__in=names).values_list(
+        'file', 'renditions', 'processing_status'
+    ):
+        if name not in media or renditions.get('formats'):
+            media[name] = (renditions, status)
+
+    pending = False
+    output = []
+    position = 0
+    for match, attrs in tags:
+        output.append(html[position:match.start()])
+        position = match.end()
+
+        name = media_name_from_url(attrs.get('src'))
+        renditions, status = media.get(name, ({}, None))
+        if renditions.get('formats') and renditions.get('source') == name:
+            output.append(_rewrite_image(attrs, renditions))
+            continue
+
+        pending = pending or status == 'pending'
+        attrs.setdefault('loading', 'lazy')
+        attrs.setdefault('decoding', 'async')
+        output.append(build_tag('img', attrs))
+
+    output.append(html[position:])
+    return ''.join(output), pending
+
+
+def build_render(html):
+    """
+    Obtener (o crear) el render saneado de un contenido
+
+    Returns:
+        Tupla ``(PostRender, pending)``
+    """
+    from .models import PostRender
+    from .sanitizer import sanitize_html
+
+    html, pending = render_content(html)
+    content_hash = hashlib.sha256(f'{RENDER_VERSION}:{html}'.encode()).hexdigest()
+
+    render = PostRender.objects.filter(content_hash=content_hash).first()
+    if render is None:
+        sanitized, toc, anchors = sanitize_html(html)
+        render, _ = PostRender.objects.get_or_create(
+            content_hash=content_hash,
+            defaults={'html': sanitized, 'toc': toc, 'anchors': anchors}
+        )
+    return render, pending
+
+
+def prune_renders(render_ids):
+    """Borrar los renders que ya no usa ningún post"""
+    from .models import PostRender
+    return PostRender.objects.filter(pk__in=render_ids, posts__isnull=True).delete()[0]
+
+
+def refresh_pending_content(names):
+    """
+    Volver a renderizar los posts que esperaban versiones de estas imágenes
+
+    Args:
+        names: Nombres en el storage de las imágenes recién procesadas
+
+    Returns:
+        Número de posts actualizados
+    """
+    from .models import Post
+
+    updated = 0
+    replaced = set()
+    for name in set(names):
+        posts = Post.objects.filter(contenido_html_pending=True, contenido__contains=name)
+        for post in posts.only('pk', 'contenido', 'contenido_render'):
+            render, pending = build_render(post.contenido)
+            if post.contenido_render_id and post.contenido_render_id != render.pk:
+                replaced.add(post.contenido_render_id)
+            updated += Post.objects.filter(pk=post.pk, contenido=post.contenido).update(
+                contenido_render=render,
+                contenido_html_pending=pending
+            )
+    if replaced:
+        prune_renders(replaced)
+    return updated
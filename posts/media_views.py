@@ -3,8 +3,6 @@ import os
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -12,9 +10,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-import uuid
-from PIL import Image
-import io
+from media_files.blobs import create_media_file
 
 
 class MediaUploadView(View):
@@ -97,62 +93,30 @@ class MediaUploadView(View):
         return {'valid': True}
     
     def process_and_save_file(self, uploaded_file, user):
-        """Procesar y guardar archivo"""
-        # Generar nombre único
-        file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-        unique_filename = f"uploads/{user.id}/{uuid.uuid4()}{file_extension}"
-        
-        # Optimizar imagen si es necesario
-        if uploaded_file.content_type.startswith('image/') and uploaded_file.content_type != 'image/svg+xml':
-            processed_file = self.optimize_image(uploaded_file)
-        else:
-            processed_file = ContentFile(uploaded_file.read())
-        
-        # Guardar archivo
-        file_path = default_storage.save(unique_filename, processed_file)
-        file_url = default_storage.url(file_path)
+        """Guardar el archivo original y encolar su procesamiento"""
+        # Guardar el original tal cual (deduplicado por contenido); las
+        # versiones optimizadas las genera el comando process_media fuera
+        # del ciclo de la petición
+        media_file = create_media_file(
+            uploaded_file,
+            uploaded_file.name,
+            file_size=uploaded_file.size,
+            mime_type=uploaded_file.content_type,
+            uploaded_by=user
+        )
+        file_path = media_file.file.name
+        file_url = media_file.file.url
         
         return {
+            'id': media_file.id,
             'filename': uploaded_file.name,
             'path': file_path,
             'url': file_url,
+            'processing_status': media_file.processing_status,
             'size': uploaded_file.size,
             'content_type': uploaded_file.content_type,
             'uploaded_by': user.username
         }
-    
-    def optimize_image(self, uploaded_file):
-        """Optimizar imagen para web"""
-        try:
-            # Abrir imagen con PIL
-            image = Image.open(uploaded_file)
-            
-            # Convertir a RGB si es necesario
-            if image.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                if image.mode == 'P':
-                    image = image.convert('RGBA')
-                background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                image = background
-            
-            # Redimensionar si es muy grande
-            max_width = 1920
-            max_height = 1080
-            
-            if image.width > max_width or image.height > max_height:
-                image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            # Guardar imagen optimizada
-            output = io.BytesIO()
-            image.save(output, format='JPEG', quality=85, optimize=True)
-            output.seek(0)
-            
-            return ContentFile(output.read())
-            
-        except Exception as e:
-            # Si falla la optimización, usar archivo original
-            uploaded_file.seek(0)
-            return ContentFile(uploaded_file.read())
 
 
 @api_view(['POST'])
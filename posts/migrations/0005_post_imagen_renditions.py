@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_comentario_approved_comentario_fecha_actualizacion_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='imagen_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas de la imagen (WebP/JPEG)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_imagen_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='contenido_html',
+            field=models.TextField(blank=True, editable=False, help_text='Contenido listo para servir (imágenes responsive y lazy)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='contenido_html_pending',
+            field=models.BooleanField(default=False, editable=False, help_text='Alguna imagen del contenido aún no tiene versiones redimensionadas'),
+        ),
+    ]
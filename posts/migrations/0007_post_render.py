@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_contenido_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRender',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('html', models.TextField()),
+                ('toc', models.JSONField(blank=True, default=list, help_text='Encabezados en orden: nivel, texto y ancla')),
+                ('anchors', models.JSONField(blank=True, default=dict, help_text='Ancla -> texto del encabezado')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='contenido_html',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='contenido_render',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Render saneado del contenido (imágenes responsive, tabla de contenidos)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.postrender'),
+        ),
+    ]
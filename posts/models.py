@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 from django.core.exceptions import ValidationError
 from tinymce.models import HTMLField
+from media_files.renditions import supports_renditions
 import os
 
 
@@ -53,6 +54,18 @@ class Categoria(models.Model):
 Category = Categoria
 
 
+class PostRender(models.Model):
+    """Render saneado del contenido de un post, identificado por su hash"""
+    content_hash = models.CharField(max_length=64, unique=True)
+    html = models.TextField()
+    toc = models.JSONField(default=list, blank=True, help_text='Encabezados en orden: nivel, texto y ancla')
+    anchors = models.JSONField(default=dict, blank=True, help_text='Ancla -> texto del encabezado')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.content_hash[:12]
+
+
 class Post(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Borrador'),
@@ -78,10 +91,79 @@ class Post(models.Model):
     featured = models.BooleanField(default=False, help_text='Marcar como artículo destacado')
     meta_title = models.CharField(max_length=200, blank=True, help_text='Título SEO')
     meta_description = models.TextField(max_length=300, blank=True, help_text='Descripción SEO')
+    imagen_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Versiones redimensionadas de la imagen (WebP/JPEG)'
+    )
+    contenido_render = models.ForeignKey(
+        'PostRender',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='posts',
+        help_text='Render saneado del contenido (imágenes responsive, tabla de contenidos)'
+    )
+    contenido_html_pending = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text='Alguna imagen del contenido aún no tiene versiones redimensionadas'
+    )
     
     def __str__(self):
         return self.titulo
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado guardado: las señales comparan contra él sin otra consulta
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        previous_render_id = None
+        if update_fields is None or 'contenido' in update_fields:
+            previous_render_id = self.contenido_render_id
+            self.render_contenido()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'contenido_render', 'contenido_html_pending'}
+        super().save(*args, **kwargs)
+        if update_fields is None or 'status' in update_fields:
+            self._loaded_status = self.status
+        
+        if previous_render_id and previous_render_id != self.contenido_render_id:
+            from .content import prune_renders
+            prune_renders([previous_render_id])
+    
+    def render_contenido(self):
+        """Extraer imágenes base64 y obtener el render del contenido"""
+        from .content import build_render, extract_inline_images
+        self.contenido = extract_inline_images(self.contenido, self.autor)
+        self.contenido_render, self.contenido_html_pending = build_render(self.contenido)
+    
+    def get_render(self):
+        """Render del contenido; los posts anteriores se renderizan una sola vez"""
+        if self.contenido_render_id is None:
+            from .content import build_render
+            self.contenido_render, self.contenido_html_pending = build_render(self.contenido)
+            Post.objects.filter(pk=self.pk, contenido=self.contenido).update(
+                contenido_render=self.contenido_render,
+                contenido_html_pending=self.contenido_html_pending
+            )
+        return self.contenido_render
+    
+    def imagen_needs_processing(self):
+        """Indica si la imagen actual aún no tiene versiones responsive"""
+        return (
+            bool(self.imagen)
+            and supports_renditions(self.imagen.name)
+            and self.imagen_renditions.get('source') != self.imagen.name
+        )
+    
     @property
     def title(self):
         return self.titulo
@@ -154,6 +236,20 @@ class Comentario(models.Model):
     def __str__(self):
         return f'Comentario de {self.usuario.username} en {self.post.titulo}'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Aprobación guardada: las señales comparan contra ella sin otra consulta
+        if 'approved' in field_names:
+            instance._loaded_approved = values[field_names.index('approved')]
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'approved' in update_fields:
+            self._loaded_approved = self.approved
+    
     @property
     def content(self):
         return self.contenido
@@ -0,0 +1,188 @@
+"""
+Saneado del HTML de los posts con lista blanca
+
+Recorre el HTML una sola vez con ``html.parser`` y deja solo etiquetas,
+atributos, esquemas de URL y propiedades CSS permitidos. En la misma pasada
+asigna un ``id`` único a cada encabezado y construye la tabla de contenidos.
+El resultado está bien formado: las etiquetas abiertas se cierran al final.
+"""
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from django.utils.text import slugify
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img',
+    'ins', 'li', 'mark', 'ol', 'p', 'picture', 'pre', 's', 'small', 'source',
+    'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th',
+    'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img', 'source'}
+# Etiquetas que se eliminan junto con todo su contenido
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+GLOBAL_ATTRIBUTES = {'class', 'style', 'title', 'lang', 'dir'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'target', 'rel'},
+    'abbr': {'title'},
+    'img': {'src', 'srcset', 'sizes', 'alt', 'width', 'height', 'loading', 'decoding'},
+    'source': {'srcset', 'sizes', 'type', 'media'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start', 'type'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+ALLOWED_CSS_PROPERTIES = {
+    'text-align', 'color', 'background-color', 'font-weight', 'font-style',
+    'text-decoration', 'padding-left', 'margin-left', 'float', 'width', 'height',
+    'border', 'border-collapse', 'vertical-align',
+}
+UNSAFE_CSS_RE = re.compile(r'url\s*\(|expression\s*\(|javascript:|@import|\\', re.IGNORECASE)
+
+
+def is_safe_url(url):
+    """URL relativa o con un esquema permitido (sin javascript:, data:, ...)"""
+    # Los navegadores ignoran espacios y controles dentro del esquema
+    normalized = re.sub(r'[\x00-\x20]+', '', url or '')
+    try:
+        return urlparse(normalized).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+def clean_style(style):
+    """Conservar solo las declaraciones CSS permitidas"""
+    declarations = []
+    for declaration in (style or '').split(';'):
+        prop, _, value = declaration.partition(':')
+        prop, value = prop.strip().lower(), value.strip()
+        if prop in ALLOWED_CSS_PROPERTIES and value and not UNSAFE_CSS_RE.search(value):
+            declarations.append(f'{prop}: {value}')
+    return '; '.join(declarations)
+
+
+class _Sanitizer(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.drop_depth = 0
+        self.heading = None
+        self.toc = []
+        self.anchors = {}
+
+    def _emit(self, text):
+        if self.heading is not None:
+            self.heading['parts'].append(text)
+        else:
+            self.output.append(text)
+
+    def _clean_attrs(self, tag, attrs):
+        allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = {}
+        for name, value in attrs:
+            name = name.lower()
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not is_safe_url(value):
+                continue
+            if name == 'srcset' and not all(is_safe_url(candidate.split()[0]) for candidate in value.split(',') if candidate.strip()):
+                continue
+            if name == 'style':
+                value = clean_style(value)
+                if not value:
+                    continue
+            cleaned[name] = value
+
+        if tag == 'a' and cleaned.get('target') == '_blank':
+            cleaned['rel'] = 'noopener noreferrer'
+        return cleaned
+
+    def handle_starttag(self, tag, attrs):
+        if self.drop_depth or tag in DROP_CONTENT_TAGS:
+            if tag in DROP_CONTENT_TAGS:
+                self.drop_depth += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+
+        attrs = self._clean_attrs(tag, attrs)
+        if tag in HEADING_TAGS and self.heading is None:
+            # El id se asigna al cerrar, cuando se conoce el texto
+            self.heading = {'tag': tag, 'attrs': attrs, 'parts': [], 'text': []}
+            self.open_tags.append(tag)
+            return
+
+        parts = [tag] + [f'{name}="{escape(value, quote=True)}"' for name, value in attrs.items()]
+        self._emit(f"<{' '.join(parts)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.drop_depth = max(0, self.drop_depth - 1)
+            return
+        if self.drop_depth or tag not in self.open_tags:
+            return
+
+        # Cerrar también las etiquetas que quedaron abiertas dentro
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            if self.heading is not None and open_tag == self.heading['tag']:
+                self._close_heading()
+            else:
+                self._emit(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.drop_depth:
+            return
+        if self.heading is not None:
+            self.heading['text'].append(data)
+        self._emit(escape(data, quote=False))
+
+    def _close_heading(self):
+        heading, self.heading = self.heading, None
+        text = ' '.join(''.join(heading['text']).split())
+        anchor = slugify(text) or 'seccion'
+        base, suffix = anchor, 2
+        while anchor in self.anchors:
+            anchor = f'{base}-{suffix}'
+            suffix += 1
+        self.anchors[anchor] = text
+        self.toc.append({'level': int(heading['tag'][1]), 'text': text, 'anchor': anchor})
+
+        attrs = dict(heading['attrs'], id=anchor)
+        parts = [heading['tag']] + [f'{name}="{escape(value, quote=True)}"' for name, value in attrs.items()]
+        self.output.append(f"<{' '.join(parts)}>{''.join(heading['parts'])}</{heading['tag']}>")
+
+    def result(self):
+        self.close()
+        while self.open_tags:
+            self.handle_endtag(self.open_tags[-1])
+        return ''.join(self.output)
+
+
+def sanitize_html(html):
+    """
+    Sanear el HTML de un post y extraer sus encabezados
+
+    Returns:
+        Tupla ``(html, toc, anchors)``: HTML saneado con ``id`` en los
+        encabezados, lista ``[{'level', 'text', 'anchor'}]`` en orden y
+        diccionario ``{anchor: texto}``
+    """
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html or '')
+    return sanitizer.result(), sanitizer.toc, sanitizer.anchors
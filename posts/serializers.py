@@ -28,12 +28,17 @@ class PostSerializer(PostBasicSerializer, SEOSerializer):
     meta_data = serializers.SerializerMethodField()
     engagement = serializers.SerializerMethodField()
     content_preview = serializers.SerializerMethodField()
+    content_html = serializers.SerializerMethodField()
+    
+    # El contenido se sanea al renderizarlo (posts.sanitizer): se escribe
+    # contenido, pero solo se publica el HTML renderizado (content_html)
+    html_fields = ['contenido']
     
     class Meta:
         model = Post
         fields = [
-            'id', 'titulo', 'slug', 'excerpt', 'contenido', 'content_preview',
-            'author', 'category', 'image_url', 'is_featured', 'status',
+            'id', 'titulo', 'slug', 'excerpt', 'contenido', 'content_html', 'content_preview',
+            'author', 'category', 'image_url', 'image_renditions', 'is_featured', 'status',
             'published_at', 'reading_time', 'comments_count',
             'meta_title', 'meta_description', 'canonical_url',
             'tags', 'meta_data', 'engagement',
@@ -41,9 +46,14 @@ class PostSerializer(PostBasicSerializer, SEOSerializer):
         ]
         read_only_fields = [
             'id', 'slug', 'excerpt', 'content_preview', 'author', 'category',
-            'image_url', 'reading_time', 'comments_count', 'tags',
+            'image_url', 'image_renditions', 'reading_time', 'comments_count', 'tags',
             'meta_data', 'engagement', 'created_at', 'updated_at'
         ]
+        extra_kwargs = {'contenido': {'write_only': True}}
+    
+    def get_content_html(self, obj):
+        """Contenido saneado con imágenes responsive, renderizado al guardar"""
+        return obj.get_render().html
     
     def get_tags(self, obj):
         """Obtener tags del post (placeholder por ahora)"""
@@ -155,6 +165,9 @@ class CommentSerializer(CommentBasicSerializer):
 class PostCreateUpdateSerializer(BaseModelSerializer, SEOSerializer):
     """Serializer for creating and updating posts"""
     
+    # El contenido se sanea al renderizarlo (posts.sanitizer)
+    html_fields = ['contenido']
+    
     class Meta:
         model = Post
         fields = [
@@ -289,11 +302,11 @@ class PostListSerializer(PostBasicSerializer):
         model = Post
         fields = [
             'id', 'titulo', 'slug', 'excerpt', 'author', 'category',
-            'image_url', 'is_featured', 'status', 'published_at',
+            'image_url', 'image_renditions', 'is_featured', 'status', 'published_at',
             'reading_time', 'comments_count', 'created_at', 'updated_at'
         ]
         read_only_fields = [
-            'id', 'slug', 'excerpt', 'author', 'category', 'image_url',
+            'id', 'slug', 'excerpt', 'author', 'category', 'image_url', 'image_renditions',
             'reading_time', 'comments_count', 'created_at', 'updated_at'
         ]
 
@@ -303,13 +316,17 @@ class PostDetailSerializer(PostSerializer):
     related_posts = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
     breadcrumbs = serializers.SerializerMethodField()
+    toc = serializers.SerializerMethodField()
     
-    class Meta:
-        model = Post
+    class Meta(PostSerializer.Meta):
         fields = PostSerializer.Meta.fields + [
-            'related_posts', 'comments', 'breadcrumbs'
+            'toc', 'related_posts', 'comments', 'breadcrumbs'
         ]
     
+    def get_toc(self, obj):
+        """Tabla de contenidos a partir de los encabezados"""
+        return obj.get_render().toc
+    
     def get_related_posts(self, obj):
         """Obtener posts relacionados"""
         related = Post.objects.filter(
@@ -0,0 +1,210 @@
+import base64
+import io
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from PIL import Image
+from media_files.models import MediaFile
+from media_files.processing import process_pending_media
+from posts.content import render_content
+from posts.models import Post, PostRender
+from posts.sanitizer import sanitize_html
+from posts.serializers import PostCreateUpdateSerializer, PostDetailSerializer
+
+User = get_user_model()
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_data_uri(size=(800, 400)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(output, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(output.getvalue()).decode()
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ContentRenderTest(TestCase):
+    """Pruebas del procesamiento del HTML de los posts al guardar"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='autor',
+            email='autor@example.com',
+            password='testpass123'
+        )
+
+    def create_post(self, contenido):
+        return Post.objects.create(titulo='Post con imágenes', contenido=contenido, autor=self.user)
+
+    def test_base64_images_become_media_files(self):
+        """Las imágenes incrustadas se guardan como MediaFile y se reemplaza el src"""
+        post = self.create_post(f'<p>Intro</p><img alt="Mapa" src="{make_data_uri()}">')
+
+        media_file = MediaFile.objects.get()
+        self.assertNotIn('data:image', post.contenido)
+        self.assertIn(f'src="{media_file.file.url}"', post.contenido)
+        self.assertEqual(media_file.alt_text, 'Mapa')
+        self.assertEqual(media_file.uploaded_by, self.user)
+
+    def test_render_waits_for_renditions(self):
+        """El render se completa cuando la etapa de procesamiento termina"""
+        post = self.create_post(f'<p>Intro</p><img alt="Mapa" src="{make_data_uri()}">')
+        self.assertTrue(post.contenido_html_pending)
+        self.assertIn('loading="lazy"', post.contenido_render.html)
+        self.assertNotIn('srcset', post.contenido_render.html)
+
+        process_pending_media(workers=0)
+
+        post.refresh_from_db()
+        self.assertFalse(post.contenido_html_pending)
+        self.assertIn('<picture><source type="image/webp"', post.contenido_render.html)
+        self.assertIn('width="800" height="400"', post.contenido_render.html)
+        self.assertIn('alt="Mapa"', post.contenido_render.html)
+        self.assertIn('_640w.jpg 640w', post.contenido_render.html)
+
+    def test_display_size_from_attributes(self):
+        """Un ancho fijado en el editor elige la versión y calcula el alto"""
+        post = self.create_post(f'<img src="{make_data_uri()}" width="300">')
+        process_pending_media(workers=0)
+        post.refresh_from_db()
+
+        self.assertIn('width="300"', post.contenido_render.html)
+        self.assertIn('height="150"', post.contenido_render.html)
+        self.assertIn('_320w.jpg"', post.contenido_render.html)
+        self.assertIn('sizes="(max-width: 300px) 100vw, 300px"', post.contenido_render.html)
+
+    def test_external_images_untouched(self):
+        """Las imágenes externas solo reciben carga diferida"""
+        html, pending = render_content('<p>Texto</p><img src="https://example.com/a.png" alt="A &amp; B">')
+        self.assertFalse(pending)
+        self.assertEqual(
+            html,
+            '<p>Texto</p><img src="https://example.com/a.png" alt="A &amp; B" loading="lazy" decoding="async">'
+        )
+
+    def test_detail_serializer_renders_old_posts_once(self):
+        """Los posts sin render lo generan en la primera lectura"""
+        post = self.create_post('<p>Contenido anterior al render</p><img src="/media/x.png">')
+        Post.objects.filter(pk=post.pk).update(contenido_render=None)
+        post = Post.objects.select_related('contenido_render').get(pk=post.pk)
+
+        data = PostDetailSerializer(post).data
+        self.assertIn('loading="lazy"', data['content_html'])
+        self.assertEqual(Post.objects.get(pk=post.pk).contenido_render.html, data['content_html'])
+
+        post = Post.objects.select_related('contenido_render').get(pk=post.pk)
+        with self.assertNumQueries(0):
+            PostDetailSerializer(post).get_content_html(post)
+
+
+class SanitizerTest(TestCase):
+    """Pruebas del saneado, la tabla de contenidos y los renders por hash"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='autor',
+            email='autor@example.com',
+            password='testpass123'
+        )
+
+    def test_removes_dangerous_markup(self):
+        """Scripts, manejadores y URLs peligrosas desaparecen; lo demás se conserva"""
+        html, _, _ = sanitize_html(
+            '<p onclick="x()" style="color: red; background: url(evil.png)">Hola '
+            '<a href=" javascript:alert(1)">a</a> <a href="/ok" target="_blank">b</a></p>'
+            '<script>alert(1)</script><iframe src="x"><p>dentro</p></iframe>'
+            '<img src="data:image/png;base64,AAAA" alt="x"><blink>texto</blink>'
+        )
+        self.assertEqual(
+            html,
+            '<p style="color: red">Hola <a>a</a> '
+            '<a href="/ok" target="_blank" rel="noopener noreferrer">b</a></p>'
+            '<img alt="x">texto'
+        )
+
+    def test_closes_open_tags(self):
+        """El resultado queda bien formado aunque la entrada no lo esté"""
+        html, _, _ = sanitize_html('<ul><li><strong>uno</li></ul><p>sin cerrar')
+        self.assertEqual(html, '<ul><li><strong>uno</strong></li></ul><p>sin cerrar</p>')
+
+    def test_heading_anchors_and_toc(self):
+        """Los encabezados reciben ids únicos y forman la tabla de contenidos"""
+        html, toc, anchors = sanitize_html(
+            '<h2 id="viejo">Introducción <em>rápida</em></h2><p>x</p><h3>Detalles</h3><h2>Introducción rápida</h2>'
+        )
+        self.assertIn('<h2 id="introduccion-rapida">Introducción <em>rápida</em></h2>', html)
+        self.assertIn('<h2 id="introduccion-rapida-2">', html)
+        self.assertEqual([item['anchor'] for item in toc], ['introduccion-rapida', 'detalles', 'introduccion-rapida-2'])
+        self.assertEqual([item['level'] for item in toc], [2, 3, 2])
+        self.assertEqual(anchors['detalles'], 'Detalles')
+
+    def test_renders_shared_by_content_hash(self):
+        """Un mismo contenido se procesa una vez y los renders sin uso se borran"""
+        contenido = '<h2>Título</h2><p>Contenido suficientemente largo</p>'
+        first = Post.objects.create(titulo='Primer post', contenido=contenido, autor=self.user)
+        second = Post.objects.create(titulo='Segundo post', contenido=contenido, autor=self.user)
+        self.assertEqual(first.contenido_render_id, second.contenido_render_id)
+        self.assertEqual(PostRender.objects.count(), 1)
+
+        first.contenido = '<p>Otro contenido distinto</p>'
+        first.save()
+        second.contenido = '<p>Tercer contenido distinto</p>'
+        second.save(update_fields=['contenido'])
+        self.assertEqual(PostRender.objects.count(), 2)
+        self.assertNotIn('Título', ''.join(PostRender.objects.values_list('html', flat=True)))
+
+    def test_serializer_keeps_html_content(self):
+        """El serializer de escritura ya no altera el HTML con expresiones regulares"""
+        serializer = PostCreateUpdateSerializer(data={
+            'titulo': 'Post con código',
+            'contenido': '<p>Ejemplo: <code>href="javascript:void(0)"</code> en un texto largo</p>',
+            'status': 'draft',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertIn('javascript:void(0)', serializer.validated_data['contenido'])
+
+    def test_api_create_and_detail_use_sanitized_render(self):
+        """La API guarda el HTML sin alterar y el detalle solo publica el render saneado"""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        contenido = (
+            '<p>Ejemplo: <code>href="javascript:void(0)"</code> y <code>onload=</code> en un texto largo</p>'
+            '<svg onload=alert(1)>'
+        )
+        response = self.client.post('/api/v1/posts/', {
+            'titulo': 'Post con código',
+            'contenido': contenido,
+            'status': 'published',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        post = Post.objects.get(titulo='Post con código')
+        self.assertEqual(post.contenido, contenido)
+
+        data = self.client.get(f'/api/v1/posts/{post.pk}/').json()['data']
+        self.assertNotIn('contenido', data)
+        self.assertIn('javascript:void(0)', data['content_html'])
+        self.assertNotIn('<svg', data['content_html'])
+
+    def test_featured_posts_only_publish_sanitized_render(self):
+        """Los posts destacados no devuelven el HTML del autor sin sanear"""
+        Post.objects.create(
+            titulo='Post destacado',
+            contenido='<p>Texto destacado</p><script>alert(1)</script>',
+            autor=self.user,
+            status='published',
+            featured=True
+        )
+        data = self.client.get('/api/v1/posts/featured/').json()['data']
+
+        self.assertEqual(len(data), 1)
+        self.assertNotIn('contenido', data[0])
+        self.assertIn('Texto destacado', data[0]['content_html'])
+        self.assertNotIn('<script', str(data))
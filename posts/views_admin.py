@@ -1,12 +1,9 @@
 import json
-import os
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
-import uuid
+from media_files.blobs import create_media_file
 
 
 @csrf_exempt
@@ -31,13 +28,16 @@ def tinymce_upload(request):
             }, status=400)
         
         try:
-            # Generar nombre único para el archivo
-            file_extension = os.path.splitext(uploaded_file.name)[1]
-            unique_filename = f"tinymce/{uuid.uuid4()}{file_extension}"
-            
-            # Guardar el archivo
-            file_path = default_storage.save(unique_filename, ContentFile(uploaded_file.read()))
-            file_url = default_storage.url(file_path)
+            # Guardar como MediaFile para que tenga versiones responsive y el
+            # render del contenido pueda usarlas
+            media_file = create_media_file(
+                uploaded_file,
+                uploaded_file.name,
+                file_size=uploaded_file.size,
+                mime_type=uploaded_file.content_type,
+                uploaded_by=request.user
+            )
+            file_url = media_file.file.url
             
             return JsonResponse({
                 'location': request.build_absolute_uri(file_url)
@@ -4,7 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.tokens import UserClaimsRefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from .serializers import UserSerializer, UserRegistrationSerializer
 from django_blog.api_utils import StandardAPIResponse, HTTPStatus, ErrorMessages
@@ -31,7 +31,7 @@ def login(request):
                 status_code=HTTPStatus.UNAUTHORIZED
             )
         
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         return StandardAPIResponse.success({
             'access': str(refresh.access_token),
             'refresh': str(refresh),
@@ -54,7 +54,7 @@ def register(request):
     
     if serializer.is_valid():
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = UserClaimsRefreshToken.for_user(user)
         
         return StandardAPIResponse.success({
             'access': str(refresh.access_token),
@@ -77,7 +77,7 @@ def refresh_token(request):
     refresh_token = request.data.get('refresh')
     
     try:
-        refresh = RefreshToken(refresh_token)
+        refresh = UserClaimsRefreshToken(refresh_token)
         return StandardAPIResponse.success({
             'access': str(refresh.access_token)
         }, message='Token refreshed successfully')
@@ -200,7 +200,7 @@ def logout(request):
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = UserClaimsRefreshToken(refresh_token)
             token.blacklist()
         return StandardAPIResponse.success(message='Logged out successfully')
     except TokenError:
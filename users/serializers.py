@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
+from accounts.permissions import get_effective_permissions
 from django_blog.base_serializers import (
     BaseModelSerializer, UserBasicSerializer,
     SuccessResponseSerializer, ErrorResponseSerializer, ValidationErrorSerializer
@@ -27,24 +28,15 @@ class UserSerializer(UserBasicSerializer):
     
     def get_permissions(self, obj):
         """Obtener información de permisos del usuario"""
+        effective = get_effective_permissions(obj)
         permissions = {
             'is_staff': obj.is_staff,
             'is_superuser': obj.is_superuser,
-            'dashboard_access': False,
-            'dashboard_permissions': None
+            'dashboard_access': effective.dashboard_access,
+            'dashboard_permissions': effective.dashboard_flags() if effective.codenames or obj.is_superuser else None,
+            'codenames': sorted(effective.codenames),
         }
         
-        # Verificar permisos del dashboard si existen
-        try:
-            if hasattr(obj, 'dashboardpermission'):
-                from dashboard.serializers import DashboardPermissionSerializer
-                permissions['dashboard_access'] = True
-                permissions['dashboard_permissions'] = DashboardPermissionSerializer(
-                    obj.dashboardpermission
-                ).data
-        except Exception:
-            pass
-        
         return permissions
 
 class UserRegistrationSerializer(BaseModelSerializer):